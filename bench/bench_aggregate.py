@@ -0,0 +1,132 @@
+"""
+analyze Lambda full 모드 집계 엔진(rowwise vs columnar) 처리량 비교 벤치마크.
+
+합성 클릭(기본 100만 건, shortId 하나의 window라고 가정)을 만들어서
+aggregate() + compute_suspicious() (rowwise) 와 ClickColumns (columnar) 를 각각 돌리고
+걸린 시간과 초당 클릭 수를 출력한다. numpy가 설치돼 있으면 columnar는 numpy/fallback 둘 다 잰다.
+결과가 서로 다르면 바로 실패한다.
+
+    python bench/bench_aggregate.py --clicks 1000000
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+USER_AGENTS = [
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918N) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "curl/8.5.0",
+    "",
+]
+
+
+def load_handler():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+    for k in ("URLS_TABLE", "CLICKS_TABLE", "INSIGHTS_TABLE", "AI_TABLE"):
+        os.environ.setdefault(k, f"bench-{k.lower()}")
+    spec = importlib.util.spec_from_file_location("analyze_handler", ROOT / "lambda" / "analyze" / "handler.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def make_clicks(n: int, window_sec: int, seed: int) -> list[dict]:
+    """clicks 테이블 item 모양 그대로 (ip는 해시, UA는 소수 몇 개가 대부분, burst 그룹 약간)"""
+    r = random.Random(seed)
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    referers = ["direct", "https://www.google.com/", "https://t.co/", "https://m.naver.com/"] + [
+        f"https://blog{i}.example.com/post" for i in range(200)
+    ]
+    ips = [f"{r.getrandbits(64):016x}" for _ in range(max(1, n // 20))]
+
+    clicks = []
+    for _ in range(n):
+        ts = end - timedelta(seconds=r.randrange(window_sec))
+        clicks.append({
+            "shortId": "bench01",
+            "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "ip": r.choice(ips),
+            "userAgent": r.choice(USER_AGENTS),
+            "referer": r.choice(referers),
+        })
+    # 같은 ip+UA가 짧은 시간에 몰리는 burst 몇 개
+    for b in range(20):
+        base = end - timedelta(seconds=r.randrange(window_sec))
+        for k in range(30):
+            clicks.append({
+                "shortId": "bench01",
+                "timestamp": (base + timedelta(seconds=k)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "ip": f"burst{b:02d}",
+                "userAgent": USER_AGENTS[1],
+                "referer": "direct",
+            })
+    return clicks
+
+
+def rowwise(handler, clicks):
+    return (*handler.aggregate(clicks), handler.compute_suspicious(clicks))
+
+
+def columnar(handler, clicks):
+    cols = handler.ClickColumns(clicks)
+    return (*cols.aggregate(), cols.suspicious_count())
+
+
+def timed(fn, handler, clicks, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(handler, clicks)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clicks", type=int, default=1_000_000)
+    ap.add_argument("--window-sec", type=int, default=7 * 86400)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    handler = load_handler()
+    clicks = make_clicks(args.clicks, args.window_sec, args.seed)
+    numpy_mod = handler.np
+
+    print(f"clicks={len(clicks)} windowSec={args.window_sec} repeat={args.repeat} numpy={numpy_mod is not None}")
+
+    runs = [("rowwise", rowwise, numpy_mod)]
+    if numpy_mod is not None:
+        runs.append(("columnar(numpy)", columnar, numpy_mod))
+    runs.append(("columnar(fallback)", columnar, None))
+
+    baseline = None
+    for name, fn, np_mod in runs:
+        handler.np = np_mod
+        elapsed, result = timed(fn, handler, clicks, args.repeat)
+        if baseline is None:
+            baseline = (elapsed, result)
+        elif result != baseline[1]:
+            raise SystemExit(f"{name}: result differs from rowwise")
+        print(
+            f"{name:>18}: {elapsed * 1000:9.1f}ms  {len(clicks) / elapsed:12,.0f} clicks/s  "
+            f"x{baseline[0] / elapsed:5.1f}  suspicious={result[-1]}"
+        )
+    handler.np = numpy_mod
+
+
+if __name__ == "__main__":
+    sys.exit(main())
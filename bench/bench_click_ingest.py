@@ -0,0 +1,111 @@
+"""
+redirect Lambda 클릭 적재 방식(sync vs async) 지연시간 비교 벤치마크.
+
+DynamoDB 대신 고정 지연(기본 8ms)을 흉내내는 in-memory 테이블을 꽂아서
+handler.lambda_handler를 반복 호출하고 p50/p95/p99(ms)를 출력한다.
+
+    python bench/bench_click_ingest.py --requests 300 --ddb-latency-ms 8
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class StandInTable:
+    """get_item/put_item/update_item만 흉내내는 DynamoDB Table 대용"""
+
+    def __init__(self, latency_sec: float, items: dict | None = None):
+        self.latency_sec = latency_sec
+        self.items = items or {}
+        self.writes = 0
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(self.latency_sec)
+        item = self.items.get(Key["shortId"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(self.latency_sec)
+        self.writes += 1
+        return {}
+
+    def update_item(self, **kwargs):
+        time.sleep(self.latency_sec)
+        self.writes += 1
+        return {}
+
+
+class Ctx:
+    aws_request_id = "bench"
+
+
+def load_handler():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+    spec = importlib.util.spec_from_file_location("redirect_handler", ROOT / "lambda" / "redirect" / "handler.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    # 벤치 출력이 로그로 덮이지 않게
+    mod.log_json = lambda *a, **k: None
+    return mod
+
+
+def make_event(short_id: str) -> dict:
+    return {
+        "routeKey": "GET /{shortId}",
+        "pathParameters": {"shortId": short_id},
+        "headers": {"user-agent": "Mozilla/5.0 (iPhone)", "referer": "https://example.com/"},
+        "requestContext": {"http": {"method": "GET", "path": f"/{short_id}", "sourceIp": "203.0.113.7"}},
+    }
+
+
+def run(handler, mode: str, requests: int, latency_sec: float) -> list[float]:
+    handler.CLICK_INGEST_MODE = mode
+    handler.urls_table = StandInTable(latency_sec, {"bench01": {"shortId": "bench01", "originalUrl": "https://example.com"}})
+    handler.clicks_table = StandInTable(latency_sec)
+
+    event = make_event("bench01")
+    samples = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        resp = handler.lambda_handler(event, Ctx())
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert resp["statusCode"] in (301, 302), resp
+
+    # async 모드: 버퍼가 다 비워질 때까지 대기 (쓰기 누락 없는지 확인)
+    deadline = time.time() + 30
+    while handler._click_buffer.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.01)
+    return samples
+
+
+def pct(samples: list[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--ddb-latency-ms", type=float, default=8.0)
+    args = ap.parse_args()
+
+    handler = load_handler()
+    latency_sec = args.ddb_latency_ms / 1000
+
+    print(f"requests={args.requests} ddbLatencyMs={args.ddb_latency_ms}")
+    for mode in ("sync", "async"):
+        samples = run(handler, mode, args.requests, latency_sec)
+        print(
+            f"{mode:>5}: p50={pct(samples, 0.50):7.2f}ms  p95={pct(samples, 0.95):7.2f}ms  "
+            f"p99={pct(samples, 0.99):7.2f}ms  mean={statistics.mean(samples):7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+클릭 timestamp 파싱 마이크로벤치마크 (strptime/fromisoformat vs 고정 형식 슬라이스 파서).
+
+합성 timestamp("YYYY-MM-DDTHH:MM:SSZ", 기본 100만 개, 7일 범위)로
+- analyze: KST 시/날짜 (strptime + astimezone vs click_epoch + kst_hour/kst_day)
+- analyze: KST 5분 슬롯 (예전 to_5min_slot vs 지금 to_5min_slot)
+- stats  : UTC 시/날짜 (parse_iso vs click_hour_day)
+를 각각 재서 timestamp당 ns와 배수를 출력한다. 결과가 예전 방식과 다르면 바로 실패한다.
+
+    python bench/bench_timestamps.py --count 1000000
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+KST = timezone(timedelta(hours=9))
+
+
+def load_module(name: str, rel_path: str):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+    for k in ("URLS_TABLE", "CLICKS_TABLE", "INSIGHTS_TABLE", "AI_TABLE"):
+        os.environ.setdefault(k, f"bench-{k.lower()}")
+    spec = importlib.util.spec_from_file_location(name, ROOT / rel_path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def make_timestamps(n: int, window_sec: int, seed: int) -> list[str]:
+    r = random.Random(seed)
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [(end - timedelta(seconds=r.randrange(window_sec))).strftime("%Y-%m-%dT%H:%M:%SZ") for _ in range(n)]
+
+
+# ---- 예전 방식 (비교 기준) ----
+
+def strptime_kst(timestamps):
+    out = []
+    for ts in timestamps:
+        dt_kst = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).astimezone(KST)
+        out.append((f"{dt_kst.hour:02d}", dt_kst.strftime("%Y-%m-%d")))
+    return out
+
+
+def strptime_5min_slot(timestamps):
+    out = []
+    for ts in timestamps:
+        dt_kst = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).astimezone(KST)
+        out.append(f"{dt_kst.hour:02d}:{(dt_kst.minute // 5) * 5:02d}")
+    return out
+
+
+def fromisoformat_utc(stats, timestamps):
+    out = []
+    for ts in timestamps:
+        dt = stats.parse_iso(ts)
+        out.append((str(dt.hour), dt.date().isoformat()))
+    return out
+
+
+# ---- 고정 형식 파서 ----
+
+def fast_kst(analyze, timestamps):
+    out = []
+    for ts in timestamps:
+        epoch = analyze.click_epoch(ts)
+        out.append((analyze.kst_hour(epoch), analyze.kst_day(epoch)))
+    return out
+
+
+def fast_5min_slot(analyze, timestamps):
+    return [analyze.to_5min_slot(ts) for ts in timestamps]
+
+
+def fast_utc(stats, timestamps):
+    return [stats.click_hour_day(ts) for ts in timestamps]
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--count", type=int, default=1_000_000)
+    ap.add_argument("--window-sec", type=int, default=7 * 86400)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    analyze = load_module("analyze_handler", "lambda/analyze/handler.py")
+    stats = load_module("stats_handler", "lambda/stats/handler.py")
+    timestamps = make_timestamps(args.count, args.window_sec, args.seed)
+
+    cases = [
+        ("analyze kst hour/day", lambda: strptime_kst(timestamps), lambda: fast_kst(analyze, timestamps)),
+        ("analyze 5min slot", lambda: strptime_5min_slot(timestamps), lambda: fast_5min_slot(analyze, timestamps)),
+        ("stats utc hour/day", lambda: fromisoformat_utc(stats, timestamps), lambda: fast_utc(stats, timestamps)),
+    ]
+
+    print(f"timestamps={len(timestamps)} windowSec={args.window_sec}")
+    for name, baseline, fast in cases:
+        base_sec, expected = timed(baseline)
+        fast_sec, got = timed(fast)
+        if got != expected:
+            raise SystemExit(f"{name}: fast parser result differs")
+        n = len(timestamps)
+        print(
+            f"{name:>21}: before={base_sec / n * 1e9:7.0f}ns  after={fast_sec / n * 1e9:7.0f}ns  "
+            f"x{base_sec / fast_sec:5.1f}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
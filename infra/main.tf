@@ -25,6 +25,8 @@ module "dynamodb" {
   source             = "./modules/dynamodb"
   project_name       = var.project_name
   urls_ttl_attribute = "expiresAt"
+
+  clicks_stream_enabled = true
 }
 
 module "iam" {
@@ -35,6 +37,24 @@ module "iam" {
   clicks_table_arn   = module.dynamodb.clicks_table_arn
   insights_table_arn = module.dynamodb.insights_table_arn
   ai_table_arn       = module.dynamodb.ai_table_arn
+  counters_table_arn = module.dynamodb.counters_table_arn
+  rollups_table_arn  = module.dynamodb.rollups_table_arn
+  active_table_arn   = module.dynamodb.active_table_arn
+
+  title_cache_table_arn = module.dynamodb.title_cache_table_arn
+  url_index_table_arn   = module.dynamodb.url_index_table_arn
+  enable_click_queue = true
+  click_queue_arn    = aws_sqs_queue.click_events.arn
+
+  enable_click_ingest_failures = true
+
+  enable_title_enrich = true
+
+  enable_clicks_stream = true
+  clicks_stream_arn    = module.dynamodb.clicks_stream_arn
+
+  enable_redirect_map  = var.edge_redirect_enabled
+  redirect_map_kvs_arn = var.edge_redirect_enabled ? module.edge_redirect[0].kvs_arn : ""
 
   enable_bedrock     = true
   bedrock_model_arns = ["*"] # 나중에 모델 ARN으로 좁혀도 됨
@@ -53,6 +73,7 @@ module "lambda_shorten" {
   source_dir = "${path.module}/../lambda/shorten"
   handler    = "handler.lambda_handler"
   runtime    = "python3.11"
+  timeout    = 30 # POST /shorten/batch (API Gateway integration timeout 30s)
 
   environment = {
     URLS_TABLE          = module.dynamodb.urls_table_name
@@ -61,6 +82,31 @@ module "lambda_shorten" {
     MAX_RETRIES         = "5"
     TITLE_FETCH_TIMEOUT = "2.5"
     MAX_HTML_BYTES      = "262144"
+
+    # title: sync(응답 전에 fetch) | async(도메인 임시 title -> 자기 자신 비동기 invoke로 갱신)
+    TITLE_FETCH_MODE = "async"
+
+    # title 캐시 (정규화 URL 7일, timeout/non-HTML 도메인 negative 10분)
+    TITLE_CACHE_TABLE      = module.dynamodb.title_cache_table_name
+    TITLE_CACHE_ENABLED    = "true"
+    TITLE_CACHE_TTL_SEC    = "604800"
+    TITLE_NEGATIVE_TTL_SEC = "600"
+
+    # 같은 URL이면 기존 shortId 반환 (url-index 조회 1번)
+    URL_INDEX_TABLE        = module.dynamodb.url_index_table_name
+    SHORTEN_DEDUPE_ENABLED = "false"
+
+    # shortId 발급: random(랜덤+충돌 재시도) | block(counters 테이블에서 구간 임대 후 메모리에서 발급)
+    # block은 id_permute_key가 있을 때만 (키 없이 쓰면 shortId가 연속 번호라 전부 열거 가능)
+    COUNTERS_TABLE = module.dynamodb.counters_table_name
+    SHORT_ID_MODE  = var.id_permute_key != "" ? "block" : "random"
+    ID_BLOCK_SIZE  = "1000"
+    ID_PERMUTE_KEY = var.id_permute_key
+
+    # POST /shorten/batch: 최대 개수, title 동시 fetch 수 / 시간 예산(넘기면 도메인 title)
+    SHORTEN_BATCH_MAX               = "500"
+    SHORTEN_BATCH_TITLE_CONCURRENCY = "16"
+    SHORTEN_BATCH_TITLE_BUDGET_SEC  = "10"
   }
 }
 
@@ -85,6 +131,151 @@ module "lambda_redirect" {
     URLS_TABLE      = module.dynamodb.urls_table_name
     CLICKS_TABLE    = module.dynamodb.clicks_table_name
     REDIRECT_STATUS = "301"
+
+    # warm container LRU 캐시 (shortId -> originalUrl)
+    URL_CACHE_ENABLED          = "true"
+    URL_CACHE_MAX_ENTRIES      = "5000"
+    URL_CACHE_MAX_BYTES        = "8388608"
+    URL_CACHE_TTL_SEC          = "300"
+    URL_CACHE_NEGATIVE_TTL_SEC = "30"
+
+    # 클릭 적재 방식: sync | async | sqs | log (async/sqs/log는 리다이렉트 경로에서 DynamoDB 쓰기 제거)
+    # log: "redirect handled" 로그 줄 -> 구독 필터(redirect_click_logs) -> click_ingest
+    CLICK_INGEST_MODE = "sync"
+    CLICK_QUEUE_URL   = aws_sqs_queue.click_events.url
+
+    # hot shortId clickCount shard 분산 (counterShards는 analyze가 클릭 속도 보고 늘림)
+    COUNTERS_TABLE           = module.dynamodb.counters_table_name
+    SHARDED_COUNTERS_ENABLED = "false"
+
+    # active 인덱스 (analyze가 클릭 있었던 shortId만 집계) - shard 수는 analyze와 같아야 함
+    ACTIVE_TABLE         = module.dynamodb.active_table_name
+    ACTIVE_INDEX_ENABLED = "true"
+    ACTIVE_INDEX_SHARDS  = "4"
+
+    # 클릭에 UA 분류(device)를 같이 저장 (analyze/click_ingest와 같은 규칙)
+    CLICK_STORE_DEVICE = "true"
+  }
+}
+
+# =========================
+# 클릭 이벤트 큐 (CLICK_INGEST_MODE=sqs)
+# redirect -> SQS -> click_ingest lambda -> DynamoDB
+# =========================
+resource "aws_sqs_queue" "click_events_dlq" {
+  name                      = "${var.project_name}-click-events-dlq"
+  message_retention_seconds = 1209600 # 14일
+
+  tags = {
+    Project = var.project_name
+  }
+}
+
+resource "aws_sqs_queue" "click_events" {
+  name                       = "${var.project_name}-click-events"
+  visibility_timeout_seconds = 180 # click_ingest timeout(30s)의 6배 (AWS 권장)
+  message_retention_seconds  = 345600
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.click_events_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = {
+    Project = var.project_name
+  }
+}
+
+module "lambda_click_ingest" {
+  source = "./modules/lambda"
+
+  project_name  = var.project_name
+  function_name = "${var.project_name}-click-ingest"
+  role_arn      = module.iam.lambda_role_arn
+
+  source_dir = "${path.module}/../lambda/click_ingest"
+  handler    = "handler.lambda_handler"
+  runtime    = "python3.11"
+
+  timeout     = 30
+  memory_size = 256
+
+  environment = {
+    URLS_TABLE               = module.dynamodb.urls_table_name
+    CLICKS_TABLE             = module.dynamodb.clicks_table_name
+    COUNTERS_TABLE           = module.dynamodb.counters_table_name
+    SHARDED_COUNTERS_ENABLED = "false"
+    ACTIVE_TABLE             = module.dynamodb.active_table_name
+    ACTIVE_INDEX_ENABLED     = "true"
+    ACTIVE_INDEX_SHARDS      = "4"
+
+    # 클릭에 UA 분류(device)를 같이 저장 -> analyze가 다시 분류하지 않음
+    CLICK_STORE_DEVICE = "true"
+
+    # 로그 구독 경로에서 못 더한 clickCount delta
+    CLICK_FAILURE_QUEUE_URL = aws_sqs_queue.click_ingest_failures.url
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "click_events" {
+  event_source_arn                   = aws_sqs_queue.click_events.arn
+  function_name                      = module.lambda_click_ingest.arn
+  # 배치를 크게 모아서 BatchWriteItem(25건) + shortId별 ADD 1회로 처리
+  batch_size                         = 1000
+  maximum_batching_window_in_seconds = 10
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# =========================
+# 로그 기반 클릭 적재 (redirect CLICK_INGEST_MODE=log)
+# redirect "redirect handled" 로그 -> 구독 필터 -> click_ingest (awslogs 배치)
+# sync/async/sqs 모드 줄은 패턴에서 빠짐 (이미 다른 경로로 적재되므로 중복 방지)
+# =========================
+# Lambda가 첫 invoke 때 만드는 로그 그룹을 미리 관리 (없으면 구독 필터 생성이 ResourceNotFoundException)
+resource "aws_cloudwatch_log_group" "redirect" {
+  name              = "/aws/lambda/${module.lambda_redirect.lambda_function_name}"
+  retention_in_days = 14
+}
+
+resource "aws_lambda_permission" "allow_logs_click_ingest" {
+  statement_id  = "AllowCloudWatchLogsInvokeClickIngest"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda_click_ingest.lambda_function_name
+  principal     = "logs.amazonaws.com"
+  source_arn    = "${aws_cloudwatch_log_group.redirect.arn}:*"
+}
+
+resource "aws_cloudwatch_log_subscription_filter" "redirect_click_logs" {
+  name            = "${var.project_name}-redirect-click-logs"
+  log_group_name  = aws_cloudwatch_log_group.redirect.name
+  filter_pattern  = "{ ($.message = \"redirect handled\") && ($.clickIngestMode = \"log\") }"
+  destination_arn = module.lambda_click_ingest.arn
+
+  depends_on = [aws_lambda_permission.allow_logs_click_ingest]
+}
+
+# 로그 구독은 비동기 invoke라 batchItemFailures/DLQ redrive가 없음
+# - 재시도(2회) 또는 maximum_event_age를 넘긴 awslogs 이벤트 -> on-failure destination
+# - click_ingest가 못 더한 clickCount delta({"type":"clickCountDelta",...})도 같은 큐로
+# (destination은 함수와 같은 리전 큐, 엣지 복사본은 us-east-1 큐를 따로 둠)
+resource "aws_sqs_queue" "click_ingest_failures" {
+  name                      = "${var.project_name}-click-ingest-failures"
+  message_retention_seconds = 1209600 # 14일
+
+  tags = {
+    Project = var.project_name
+  }
+}
+
+resource "aws_lambda_function_event_invoke_config" "click_ingest" {
+  function_name                = module.lambda_click_ingest.lambda_function_name
+  maximum_event_age_in_seconds = 900
+  maximum_retry_attempts       = 2
+
+  destination_config {
+    on_failure {
+      destination = aws_sqs_queue.click_ingest_failures.arn
+    }
   }
 }
 
@@ -138,8 +329,21 @@ module "lambda_stats" {
   memory_size = 256
 
   environment = {
-    URLS_TABLE   = module.dynamodb.urls_table_name
-    CLICKS_TABLE = module.dynamodb.clicks_table_name
+    URLS_TABLE     = module.dynamodb.urls_table_name
+    CLICKS_TABLE   = module.dynamodb.clicks_table_name
+    COUNTERS_TABLE = module.dynamodb.counters_table_name
+    INSIGHTS_TABLE = module.dynamodb.insights_table_name
+
+    # clicks(raw 전체 Query) | insights(analyze 집계 + endAt 이후 클릭 tail)
+    # max age는 가장 긴 집계 주기(P#7D 1시간)보다 길게
+    # + 기간의 10% 이하일 때만 (1h는 6분 -> 5분 주기 P#1H, 그보다 늦으면 clicks fallback)
+    STATS_SOURCE                = "insights"
+    STATS_INSIGHT_MAX_AGE_SEC   = "7200"
+    STATS_INSIGHT_MAX_AGE_RATIO = "0.1"
+
+    # (shortId, period) 응답 캐시 + Cache-Control max-age
+    STATS_CACHE_ENABLED = "true"
+    STATS_CACHE_TTL_SEC = "60"
   }
 }
 
@@ -158,11 +362,40 @@ module "lambda_analyze" {
   timeout     = 60
   memory_size = 512
 
+  # job=redirect_map의 cloudfront-keyvaluestore 호출에 awscrt(botocore[crt]) 필요
+  # AGG_ENGINE=columnar는 numpy 레이어가 있으면 배열 연산, 없으면 순수 Python으로 동작
+  layers = compact([var.awscrt_layer_arn, var.numpy_layer_arn])
+
   environment = {
     URLS_TABLE     = module.dynamodb.urls_table_name
     CLICKS_TABLE   = module.dynamodb.clicks_table_name
     INSIGHTS_TABLE = module.dynamodb.insights_table_name
     AI_TABLE       = module.dynamodb.ai_table_name
+    COUNTERS_TABLE = module.dynamodb.counters_table_name
+    ROLLUPS_TABLE  = module.dynamodb.rollups_table_name
+    ACTIVE_TABLE   = module.dynamodb.active_table_name
+
+    # 집계 대상: scan(urls Scan) | active(window 안에 클릭 있었던 shortId)
+    URL_LIST_SOURCE     = "active"
+    ACTIVE_INDEX_SHARDS = "4"
+    ACTIVE_LOOKBACK_SEC = "7200"
+
+    # 집계 방식: full(window 전체 재조회) | rollup(신규 클릭만 분/시간 버킷에 누적)
+    AGG_MODE       = "full"
+    ROLLUP_LAG_SEC = "60"
+    # 가장 느린 클릭 적재 경로 상한 (sqs visibility 180s x maxReceiveCount 5, 로그 구독 maximum_event_age 900s)
+    # -> rollup 체크포인트는 이만큼 늦게 따라감
+    CLICK_INGEST_MAX_DELAY_SEC = "900"
+
+    # full 모드 집계 엔진: rowwise(클릭마다 파싱/정규식) | columnar(고유값만 파싱 + 코드 배열 집계)
+    AGG_ENGINE = "columnar"
+
+    # shortId별 조회/집계/upsert 동시 처리 수 (1이면 순차)
+    ANALYZE_CONCURRENCY = "8"
+
+    # GET /ai/latest 응답 캐시 + Cache-Control max-age (집계 스케줄 5분 주기)
+    AI_CACHE_ENABLED = "true"
+    AI_CACHE_TTL_SEC = "300"
 
     # Bedrock 호출용 (리전/모델 등)
     BEDROCK_MODEL_TREND   = "apac.amazon.nova-micro-v1:0"
@@ -171,6 +404,47 @@ module "lambda_analyze" {
     ANALYTICS_PREFIX      = "analytics"
     EXPORT_ENABLED        = "true"
     EXPORT_CHECKPOINT_KEY = "analytics/state/last_export_ts.json"
+
+    # export 방식: poll(집계 run마다 shortId별 재조회) | stream(clicks 테이블 스트림 -> fact_clicks append)
+    EXPORT_MODE                  = "stream"
+    EXPORT_STREAM_CHECKPOINT_KEY = "analytics/state/stream_export.json"
+
+    # fact_clicks: gzip JSON Lines + 매일 시간 파티션별 파일 합치기 (job=compact_fact_clicks)
+    EXPORT_FORMAT       = "jsonl.gz"
+    EXPORT_PART_SIZE_MB = "8" # 스트리밍 multipart part 크기 (메모리 상한)
+    COMPACT_MIN_OBJECTS = "2"
+
+    # hot shortId counter fan-out (shard당 목표 클릭 속도 초과 시 counterShards 증가)
+    SHARDED_COUNTERS_ENABLED     = "false"
+    COUNTER_SHARD_CLICKS_PER_SEC = "100"
+    COUNTER_SHARDS_MAX           = "32"
+
+    # 엣지 리다이렉트 맵 (clickCount 상위 shortId -> CloudFront KVS, 변경분만 반영)
+    REDIRECT_MAP_ENABLED    = var.edge_redirect_enabled ? "true" : "false"
+    REDIRECT_MAP_KVS_ARN    = var.edge_redirect_enabled ? module.edge_redirect[0].kvs_arn : ""
+    REDIRECT_MAP_MAX_KEYS   = "5000"
+    REDIRECT_MAP_MIN_CLICKS = "10"
+  }
+}
+
+# =========================
+# clicks 테이블 스트림 -> analyze (EXPORT_MODE=stream)
+# 배치를 크게 모아서 시간 파티션별 파일 1개씩, INSERT만 (TTL 삭제는 제외)
+# 실패하면 같은 위치부터 배치 그대로 재시도 (bisect하면 파일 키가 바뀌어 중복이 생김)
+# =========================
+resource "aws_lambda_event_source_mapping" "clicks_stream_export" {
+  event_source_arn                   = module.dynamodb.clicks_stream_arn
+  function_name                      = module.lambda_analyze.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 1000
+  maximum_batching_window_in_seconds = 60
+  maximum_retry_attempts             = 20
+  bisect_batch_on_function_error     = false
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({ eventName = ["INSERT"] })
+    }
   }
 }
 
@@ -256,6 +530,189 @@ resource "aws_lambda_permission" "allow_eventbridge_analyze_agg_24h_30m" {
   source_arn    = aws_cloudwatch_event_rule.analyze_agg_24h_30m.arn
 }
 
+# =========================
+# Aggregation: P#7D (1시간마다) - stats(period=7d)가 insights에서 읽을 수 있게
+# =========================
+resource "aws_cloudwatch_event_rule" "analyze_agg_7d_1h" {
+  name                = "${var.project_name}-analyze-agg-7d-1h"
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_cloudwatch_event_target" "analyze_agg_7d_1h" {
+  rule      = aws_cloudwatch_event_rule.analyze_agg_7d_1h.name
+  target_id = "analyzeAgg7d1h"
+  arn       = module.lambda_analyze.arn
+
+  input = jsonencode({
+    job       = "aggregate_only"
+    periodKey = "P#7D"
+  })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_analyze_agg_7d_1h" {
+  statement_id  = "AllowEventBridgeInvokeAnalyzeAgg7d1h"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda_analyze.lambda_function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.analyze_agg_7d_1h.arn
+}
+
+# =========================
+# fact_clicks 파티션 compaction (매일 00:20 UTC, 어제 dt=의 hr=00~23)
+# =========================
+resource "aws_cloudwatch_event_rule" "analyze_compact_daily" {
+  name                = "${var.project_name}-analyze-compact-daily"
+  schedule_expression = "cron(20 0 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "analyze_compact_daily" {
+  rule      = aws_cloudwatch_event_rule.analyze_compact_daily.name
+  target_id = "analyzeCompactDaily"
+  arn       = module.lambda_analyze.arn
+
+  input = jsonencode({
+    job = "compact_fact_clicks"
+  })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_analyze_compact_daily" {
+  statement_id  = "AllowEventBridgeInvokeAnalyzeCompactDaily"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda_analyze.lambda_function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.analyze_compact_daily.arn
+}
+
+# =========================
+# 엣지 리다이렉트 맵 갱신 (10분마다)
+# =========================
+resource "aws_cloudwatch_event_rule" "analyze_redirect_map_10m" {
+  count               = var.edge_redirect_enabled ? 1 : 0
+  name                = "${var.project_name}-analyze-redirect-map-10m"
+  schedule_expression = "rate(10 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "analyze_redirect_map_10m" {
+  count     = var.edge_redirect_enabled ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.analyze_redirect_map_10m[0].name
+  target_id = "analyzeRedirectMap10m"
+  arn       = module.lambda_analyze.arn
+
+  input = jsonencode({
+    job = "redirect_map"
+  })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_analyze_redirect_map" {
+  count         = var.edge_redirect_enabled ? 1 : 0
+  statement_id  = "AllowEventBridgeInvokeAnalyzeRedirectMap"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda_analyze.lambda_function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.analyze_redirect_map_10m[0].arn
+}
+
+# hot shortId는 CloudFront Function이 KVS 보고 바로 리다이렉트 (나머지는 기존 경로)
+module "edge_redirect" {
+  source = "./modules/edge_redirect"
+  count  = var.edge_redirect_enabled ? 1 : 0
+
+  project_name    = var.project_name
+  redirect_status = 301 # lambda_redirect REDIRECT_STATUS와 맞춤
+}
+
+# 엣지 리다이렉트 클릭: CloudFront Function 로그는 us-east-1 -> 같은 리전에 click_ingest 한 벌 더
+# (테이블은 DDB_REGION 리전 것을 그대로 씀)
+resource "aws_cloudwatch_log_group" "edge_redirect" {
+  provider          = aws.use1
+  count             = var.edge_redirect_enabled ? 1 : 0
+  name              = "/aws/cloudfront/function/${module.edge_redirect[0].function_name}"
+  retention_in_days = 14
+}
+
+module "lambda_click_ingest_edge" {
+  source = "./modules/lambda"
+  count  = var.edge_redirect_enabled ? 1 : 0
+  providers = {
+    aws = aws.use1
+  }
+
+  project_name  = var.project_name
+  function_name = "${var.project_name}-click-ingest-edge"
+  role_arn      = module.iam.lambda_role_arn
+
+  source_dir = "${path.module}/../lambda/click_ingest"
+  handler    = "handler.lambda_handler"
+  runtime    = "python3.11"
+
+  timeout     = 30
+  memory_size = 256
+
+  environment = {
+    DDB_REGION               = var.aws_region
+    URLS_TABLE               = module.dynamodb.urls_table_name
+    CLICKS_TABLE             = module.dynamodb.clicks_table_name
+    COUNTERS_TABLE           = module.dynamodb.counters_table_name
+    SHARDED_COUNTERS_ENABLED = "false"
+    ACTIVE_TABLE             = module.dynamodb.active_table_name
+    ACTIVE_INDEX_ENABLED     = "true"
+    ACTIVE_INDEX_SHARDS      = "4"
+
+    # 클릭에 UA 분류(device)를 같이 저장 -> analyze가 다시 분류하지 않음
+    CLICK_STORE_DEVICE = "true"
+
+    # 로그 구독 경로에서 못 더한 clickCount delta (us-east-1 큐)
+    CLICK_FAILURE_QUEUE_URL = aws_sqs_queue.click_ingest_failures_edge[0].url
+  }
+}
+
+resource "aws_sqs_queue" "click_ingest_failures_edge" {
+  provider                  = aws.use1
+  count                     = var.edge_redirect_enabled ? 1 : 0
+  name                      = "${var.project_name}-click-ingest-failures"
+  message_retention_seconds = 1209600 # 14일
+
+  tags = {
+    Project = var.project_name
+  }
+}
+
+resource "aws_lambda_function_event_invoke_config" "click_ingest_edge" {
+  provider                     = aws.use1
+  count                        = var.edge_redirect_enabled ? 1 : 0
+  function_name                = module.lambda_click_ingest_edge[0].lambda_function_name
+  maximum_event_age_in_seconds = 900
+  maximum_retry_attempts       = 2
+
+  destination_config {
+    on_failure {
+      destination = aws_sqs_queue.click_ingest_failures_edge[0].arn
+    }
+  }
+}
+
+resource "aws_lambda_permission" "allow_logs_click_ingest_edge" {
+  provider      = aws.use1
+  count         = var.edge_redirect_enabled ? 1 : 0
+  statement_id  = "AllowCloudWatchLogsInvokeClickIngestEdge"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda_click_ingest_edge[0].lambda_function_name
+  principal     = "logs.amazonaws.com"
+  source_arn    = "${aws_cloudwatch_log_group.edge_redirect[0].arn}:*"
+}
+
+# CloudFront Function 로그 줄은 앞에 배포/요청 ID가 붙어 JSON 패턴 대신 문자열 매칭 (나머지는 click_ingest가 거름)
+resource "aws_cloudwatch_log_subscription_filter" "edge_click_logs" {
+  provider        = aws.use1
+  count           = var.edge_redirect_enabled ? 1 : 0
+  name            = "${var.project_name}-edge-click-logs"
+  log_group_name  = aws_cloudwatch_log_group.edge_redirect[0].name
+  filter_pattern  = "\"redirect handled\""
+  destination_arn = module.lambda_click_ingest_edge[0].arn
+
+  depends_on = [aws_lambda_permission.allow_logs_click_ingest_edge]
+}
+
 
 #========================
 # frontend 
@@ -283,6 +740,8 @@ module "frontend" {
   www_domain_name = ""
 
   bucket_name = "shortify-cloud-frontend-jh"
+
+  viewer_request_function_arn = var.edge_redirect_enabled ? module.edge_redirect[0].function_arn : ""
 }
 
 module "oidc" {
@@ -373,6 +832,7 @@ module "monitoring_ops" {
     redirect = module.lambda_redirect.lambda_function_name
     stats    = module.lambda_stats.lambda_function_name
     analyze  = module.lambda_analyze.lambda_function_name
+    ingest   = module.lambda_click_ingest.lambda_function_name
   }
 
   # Errors 알람 대상 (우선)
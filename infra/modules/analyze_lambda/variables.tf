@@ -36,3 +36,8 @@ variable "environment" {
   type    = map(string)
   default = {}
 }
+
+variable "layers" {
+  type    = list(string)
+  default = []
+}
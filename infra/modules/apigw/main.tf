@@ -29,6 +29,12 @@ resource "aws_apigatewayv2_route" "shorten" {
   target    = "integrations/${aws_apigatewayv2_integration.shorten.id}"
 }
 
+resource "aws_apigatewayv2_route" "shorten_batch" {
+  api_id    = aws_apigatewayv2_api.this.id
+  route_key = "POST /shorten/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.shorten.id}"
+}
+
 resource "aws_apigatewayv2_stage" "this" {
   api_id      = aws_apigatewayv2_api.this.id
   name        = var.stage_name
@@ -30,6 +30,10 @@ resource "aws_dynamodb_table" "clicks" {
   hash_key     = "shortId"
   range_key    = "timestamp"
 
+  # analyze EXPORT_MODE=stream: 새 클릭(INSERT)을 스트림으로 받아 fact_clicks에 append
+  stream_enabled   = var.clicks_stream_enabled
+  stream_view_type = var.clicks_stream_enabled ? "NEW_IMAGE" : null
+
   attribute {
     name = "shortId"
     type = "S"
@@ -102,3 +106,127 @@ resource "aws_dynamodb_table" "ai" {
     Name    = "${var.project_name}-ai"
   }
 }
+
+# sharded click counter 테이블
+# - hot shortId의 clickCount 증가를 "{shortId}#{n}" 아이템 N개로 분산 (파티션 쓰기 한도 회피)
+# - 읽을 때 urls.clickCount + 0..counterShards-1 합산
+resource "aws_dynamodb_table" "counters" {
+  name         = "${var.project_name}-counters"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "counterKey"
+
+  attribute {
+    name = "counterKey"
+    type = "S"
+  }
+
+  lifecycle {
+    prevent_destroy = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Name    = "${var.project_name}-counters"
+  }
+}
+
+# 증분 집계 rollup 테이블 (analyze AGG_MODE=rollup)
+# - SK bucket: "M#YYYY-MM-DDTHH:MM"(분) / "H#YYYY-MM-DDTHH"(시간), UTC
+# - 체크포인트 아이템: shortId="#ROLLUP", bucket="CHECKPOINT"
+resource "aws_dynamodb_table" "rollups" {
+  name         = "${var.project_name}-rollups"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "shortId"
+  range_key    = "bucket"
+
+  attribute {
+    name = "shortId"
+    type = "S"
+  }
+
+  attribute {
+    name = "bucket"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Name    = "${var.project_name}-rollups"
+  }
+}
+
+# active shortId 인덱스 (analyze URL_LIST_SOURCE=active)
+# - PK bucket: "YYYY-MM-DDTHH#{shard}" (UTC 시간 버킷, shard = crc32(shortId) % ACTIVE_INDEX_SHARDS)
+# - SK shortId: 그 시간에 클릭이 1건 이상 있었던 shortId
+resource "aws_dynamodb_table" "active" {
+  name         = "${var.project_name}-active"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "bucket"
+  range_key    = "shortId"
+
+  attribute {
+    name = "bucket"
+    type = "S"
+  }
+
+  attribute {
+    name = "shortId"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Name    = "${var.project_name}-active"
+  }
+}
+
+# shorten title 캐시
+# - cacheKey: "U#{sha256(정규화 URL)}"(페이지 title) / "D#{host}"(timeout/non-HTML 도메인 negative)
+resource "aws_dynamodb_table" "title_cache" {
+  name         = "${var.project_name}-title-cache"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cacheKey"
+
+  attribute {
+    name = "cacheKey"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Project = var.project_name
+    Name    = "${var.project_name}-title-cache"
+  }
+}
+
+# shorten dedupe 인덱스 (SHORTEN_DEDUPE_ENABLED)
+# - urlHash: sha256(정규화 originalUrl) -> shortId (urls와 TransactWriteItems로 같이 생성)
+resource "aws_dynamodb_table" "url_index" {
+  name         = "${var.project_name}-url-index"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "urlHash"
+
+  attribute {
+    name = "urlHash"
+    type = "S"
+  }
+
+  tags = {
+    Project = var.project_name
+    Name    = "${var.project_name}-url-index"
+  }
+}
@@ -18,6 +18,10 @@ output "clicks_table_arn" {
   value = aws_dynamodb_table.clicks.arn
 }
 
+output "clicks_stream_arn" {
+  value = aws_dynamodb_table.clicks.stream_arn
+}
+
 output "insights_table_arn" {
   value = aws_dynamodb_table.insights.arn
 }
@@ -29,3 +33,43 @@ output "ai_table_name" {
 output "ai_table_arn" {
   value = aws_dynamodb_table.ai.arn
 }
+
+output "counters_table_name" {
+  value = aws_dynamodb_table.counters.name
+}
+
+output "counters_table_arn" {
+  value = aws_dynamodb_table.counters.arn
+}
+
+output "rollups_table_name" {
+  value = aws_dynamodb_table.rollups.name
+}
+
+output "rollups_table_arn" {
+  value = aws_dynamodb_table.rollups.arn
+}
+
+output "active_table_name" {
+  value = aws_dynamodb_table.active.name
+}
+
+output "active_table_arn" {
+  value = aws_dynamodb_table.active.arn
+}
+
+output "title_cache_table_name" {
+  value = aws_dynamodb_table.title_cache.name
+}
+
+output "title_cache_table_arn" {
+  value = aws_dynamodb_table.title_cache.arn
+}
+
+output "url_index_table_name" {
+  value = aws_dynamodb_table.url_index.name
+}
+
+output "url_index_table_arn" {
+  value = aws_dynamodb_table.url_index.arn
+}
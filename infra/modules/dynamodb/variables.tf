@@ -6,3 +6,8 @@ variable "urls_ttl_attribute" {
   type    = string
   default = "expiresAt"
 }
+
+variable "clicks_stream_enabled" {
+  type    = bool
+  default = false
+}
@@ -0,0 +1,20 @@
+# 엣지 리다이렉트: analyze(job=redirect_map)가 hot shortId -> originalUrl을 KVS에 올리고
+# CloudFront Function이 viewer-request에서 바로 리다이렉트 (없으면 통과)
+resource "aws_cloudfront_key_value_store" "this" {
+  name    = "${var.project_name}-redirect-map"
+  comment = "hot shortId -> originalUrl (analyze job=redirect_map)"
+}
+
+resource "aws_cloudfront_function" "redirect" {
+  name    = "${var.project_name}-edge-redirect"
+  runtime = "cloudfront-js-2.0"
+  comment = "hot shortId redirect from KeyValueStore"
+  publish = true
+
+  code = templatefile("${path.module}/redirect.js.tftpl", {
+    kvs_id          = element(split("/", aws_cloudfront_key_value_store.this.arn), 1) # ARN 끝 KVS ID
+    redirect_status = var.redirect_status
+  })
+
+  key_value_store_associations = [aws_cloudfront_key_value_store.this.arn]
+}
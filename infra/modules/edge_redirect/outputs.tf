@@ -0,0 +1,11 @@
+output "kvs_arn" {
+  value = aws_cloudfront_key_value_store.this.arn
+}
+
+output "function_arn" {
+  value = aws_cloudfront_function.redirect.arn
+}
+
+output "function_name" {
+  value = aws_cloudfront_function.redirect.name
+}
@@ -0,0 +1,9 @@
+variable "project_name" {
+  type = string
+}
+
+variable "redirect_status" {
+  description = "redirect Lambda REDIRECT_STATUS와 같은 값 (301 | 302)"
+  type        = number
+  default     = 301
+}
@@ -43,6 +43,15 @@ resource "aws_cloudfront_distribution" "cdn" {
       query_string = true
       cookies { forward = "none" }
     }
+
+    # 엣지 리다이렉트 (hot shortId만 처리, 나머지는 그대로 S3/SPA)
+    dynamic "function_association" {
+      for_each = var.viewer_request_function_arn != "" ? [var.viewer_request_function_arn] : []
+      content {
+        event_type   = "viewer-request"
+        function_arn = function_association.value
+      }
+    }
   }
 
   # SPA 라우팅용 (Next export / SPA)
@@ -26,4 +26,10 @@ variable "www_domain_name" {
 
 variable "bucket_name" {
   type = string
-}
\ No newline at end of file
+}
+
+variable "viewer_request_function_arn" {
+  description = "default behavior에 붙일 CloudFront Function (빈 값이면 없음)"
+  type        = string
+  default     = ""
+}
@@ -26,18 +26,18 @@ data "aws_iam_policy_document" "dynamodb_access" {
     sid    = "UrlsTableAccess"
     effect = "Allow"
     actions = concat(
-      ["dynamodb:PutItem", "dynamodb:GetItem", "dynamodb:UpdateItem", "dynamodb:Scan"],
+      ["dynamodb:PutItem", "dynamodb:GetItem", "dynamodb:UpdateItem", "dynamodb:Scan", "dynamodb:BatchGetItem"],
       var.enable_delete_item ? ["dynamodb:DeleteItem"] : []
     )
     resources = [var.urls_table_arn]
   }
 
-  # clicks: Put/Query (GetItem 제외)
+  # clicks: Put/BatchWrite/Query (GetItem 제외)
   statement {
     sid    = "ClicksTableAccess"
     effect = "Allow"
     actions = concat(
-      ["dynamodb:PutItem", "dynamodb:Query"],
+      ["dynamodb:PutItem", "dynamodb:BatchWriteItem", "dynamodb:Query"],
       var.enable_delete_item ? ["dynamodb:DeleteItem"] : []
     )
     resources = [var.clicks_table_arn]
@@ -66,6 +66,67 @@ data "aws_iam_policy_document" "dynamodb_access" {
     resources = [var.ai_table_arn]
   }
 
+  # counters: sharded clickCount (redirect/ingest: Update, stats/analyze: BatchGet)
+  statement {
+    sid    = "CountersTableAccess"
+    effect = "Allow"
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:UpdateItem",
+      "dynamodb:BatchGetItem"
+    ]
+    resources = [var.counters_table_arn]
+  }
+
+  # rollups: analyze 증분 집계 버킷 + 체크포인트
+  statement {
+    sid    = "RollupsTableAccess"
+    effect = "Allow"
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+      "dynamodb:Query"
+    ]
+    resources = [var.rollups_table_arn]
+  }
+
+  # active: 시간 버킷별 클릭 있었던 shortId (redirect/ingest: Put/BatchWrite, analyze: Query)
+  statement {
+    sid    = "ActiveTableAccess"
+    effect = "Allow"
+    actions = [
+      "dynamodb:PutItem",
+      "dynamodb:BatchWriteItem",
+      "dynamodb:Query"
+    ]
+    resources = [var.active_table_arn]
+  }
+
+  # title-cache: shorten title 캐시 (URL/도메인 키 BatchGet + Put)
+  statement {
+    sid    = "TitleCacheTableAccess"
+    effect = "Allow"
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:BatchGetItem"
+    ]
+    resources = [var.title_cache_table_arn]
+  }
+
+  # url-index: shorten dedupe (urlHash -> shortId, urls와 트랜잭션 Put)
+  statement {
+    sid    = "UrlIndexTableAccess"
+    effect = "Allow"
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem"
+    ]
+    resources = [var.url_index_table_arn]
+  }
+
 
 }
 
@@ -80,6 +141,151 @@ resource "aws_iam_role_policy_attachment" "attach_dynamodb_access" {
 }
 
 # Lambda 로그(CloudWatch Logs) 권한: 운영/디버깅 필수
+# =========================
+# 클릭 이벤트 큐 (redirect: Send / click_ingest: Receive/Delete)
+# =========================
+data "aws_iam_policy_document" "click_queue" {
+  count = var.enable_click_queue ? 1 : 0
+
+  statement {
+    sid    = "ClickQueueAccess"
+    effect = "Allow"
+    actions = [
+      "sqs:SendMessage",
+      "sqs:ReceiveMessage",
+      "sqs:DeleteMessage",
+      "sqs:GetQueueAttributes"
+    ]
+    resources = [var.click_queue_arn]
+  }
+}
+
+resource "aws_iam_policy" "click_queue" {
+  count  = var.enable_click_queue ? 1 : 0
+  name   = "${var.project_name}-click-queue"
+  policy = data.aws_iam_policy_document.click_queue[0].json
+}
+
+resource "aws_iam_role_policy_attachment" "attach_click_queue" {
+  count      = var.enable_click_queue ? 1 : 0
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.click_queue[0].arn
+}
+
+# =========================
+# click_ingest 실패 큐 (로그 구독 on-failure destination + 못 더한 clickCount delta)
+# 리전마다 같은 이름 (엣지 복사본은 us-east-1)
+# =========================
+data "aws_iam_policy_document" "click_ingest_failures" {
+  count = var.enable_click_ingest_failures ? 1 : 0
+
+  statement {
+    sid       = "ClickIngestFailuresSend"
+    effect    = "Allow"
+    actions   = ["sqs:SendMessage"]
+    resources = ["arn:aws:sqs:*:*:${var.project_name}-click-ingest-failures"]
+  }
+}
+
+resource "aws_iam_policy" "click_ingest_failures" {
+  count  = var.enable_click_ingest_failures ? 1 : 0
+  name   = "${var.project_name}-click-ingest-failures"
+  policy = data.aws_iam_policy_document.click_ingest_failures[0].json
+}
+
+resource "aws_iam_role_policy_attachment" "attach_click_ingest_failures" {
+  count      = var.enable_click_ingest_failures ? 1 : 0
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.click_ingest_failures[0].arn
+}
+
+# =========================
+# title 비동기 보강 (shorten -> shorten, InvocationType=Event)
+# =========================
+data "aws_iam_policy_document" "title_enrich" {
+  count = var.enable_title_enrich ? 1 : 0
+
+  statement {
+    sid       = "ShortenSelfInvoke"
+    effect    = "Allow"
+    actions   = ["lambda:InvokeFunction"]
+    resources = ["arn:aws:lambda:*:*:function:${var.project_name}-shorten*"]
+  }
+}
+
+resource "aws_iam_policy" "title_enrich" {
+  count  = var.enable_title_enrich ? 1 : 0
+  name   = "${var.project_name}-title-enrich"
+  policy = data.aws_iam_policy_document.title_enrich[0].json
+}
+
+resource "aws_iam_role_policy_attachment" "attach_title_enrich" {
+  count      = var.enable_title_enrich ? 1 : 0
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.title_enrich[0].arn
+}
+
+# =========================
+# analyze(job=redirect_map) -> CloudFront KeyValueStore (엣지 리다이렉트 맵)
+# =========================
+data "aws_iam_policy_document" "redirect_map" {
+  count = var.enable_redirect_map ? 1 : 0
+
+  statement {
+    sid    = "RedirectMapKvs"
+    effect = "Allow"
+    actions = [
+      "cloudfront-keyvaluestore:DescribeKeyValueStore",
+      "cloudfront-keyvaluestore:ListKeys",
+      "cloudfront-keyvaluestore:UpdateKeys",
+    ]
+    resources = [var.redirect_map_kvs_arn]
+  }
+}
+
+resource "aws_iam_policy" "redirect_map" {
+  count  = var.enable_redirect_map ? 1 : 0
+  name   = "${var.project_name}-redirect-map"
+  policy = data.aws_iam_policy_document.redirect_map[0].json
+}
+
+resource "aws_iam_role_policy_attachment" "attach_redirect_map" {
+  count      = var.enable_redirect_map ? 1 : 0
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.redirect_map[0].arn
+}
+
+# =========================
+# analyze(EXPORT_MODE=stream) <- clicks 테이블 DynamoDB Streams
+# =========================
+data "aws_iam_policy_document" "clicks_stream" {
+  count = var.enable_clicks_stream ? 1 : 0
+
+  statement {
+    sid    = "ClicksStreamRead"
+    effect = "Allow"
+    actions = [
+      "dynamodb:DescribeStream",
+      "dynamodb:GetRecords",
+      "dynamodb:GetShardIterator",
+      "dynamodb:ListStreams",
+    ]
+    resources = [var.clicks_stream_arn]
+  }
+}
+
+resource "aws_iam_policy" "clicks_stream" {
+  count  = var.enable_clicks_stream ? 1 : 0
+  name   = "${var.project_name}-clicks-stream"
+  policy = data.aws_iam_policy_document.clicks_stream[0].json
+}
+
+resource "aws_iam_role_policy_attachment" "attach_clicks_stream" {
+  count      = var.enable_clicks_stream ? 1 : 0
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.clicks_stream[0].arn
+}
+
 resource "aws_iam_role_policy_attachment" "attach_lambda_basic" {
   role       = aws_iam_role.lambda_exec.name
   policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
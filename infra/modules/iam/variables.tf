@@ -36,8 +36,73 @@ variable "ai_table_arn" {
   type = string
 }
 
+variable "counters_table_arn" {
+  type = string
+}
+
+variable "rollups_table_arn" {
+  type = string
+}
+
+variable "active_table_arn" {
+  type = string
+}
+
+variable "title_cache_table_arn" {
+  type = string
+}
+
+variable "url_index_table_arn" {
+  type = string
+}
+
+# redirect(CLICK_INGEST_MODE=sqs) -> SQS -> click_ingest
+variable "enable_click_queue" {
+  type    = bool
+  default = false
+}
+
+variable "click_queue_arn" {
+  type    = string
+  default = ""
+}
+
+# click_ingest(로그 구독) -> on-failure destination / clickCount delta 큐
+variable "enable_click_ingest_failures" {
+  type    = bool
+  default = false
+}
+
 variable "enable_ai_summary_bedrock" {
   description = "Attach additional Bedrock invoke policy for AI Slack summary Lambda (Claude Sonnet)"
   type        = bool
   default     = false
-}
\ No newline at end of file
+}
+
+# shorten(TITLE_FETCH_MODE=async) -> 자기 자신 비동기 invoke (job=enrich_title)
+variable "enable_title_enrich" {
+  type    = bool
+  default = false
+}
+
+# analyze(job=redirect_map) -> CloudFront KeyValueStore
+variable "enable_redirect_map" {
+  type    = bool
+  default = false
+}
+
+variable "redirect_map_kvs_arn" {
+  type    = string
+  default = ""
+}
+
+# analyze(EXPORT_MODE=stream) <- clicks 테이블 스트림
+variable "enable_clicks_stream" {
+  type    = bool
+  default = false
+}
+
+variable "clicks_stream_arn" {
+  type    = string
+  default = ""
+}
@@ -58,9 +58,20 @@ data "aws_iam_policy_document" "analyze_export_s3" {
   statement {
     sid       = "AllowRWAnalyticsObjects"
     effect    = "Allow"
-    actions   = ["s3:PutObject", "s3:GetObject"]
+    actions   = ["s3:PutObject", "s3:GetObject", "s3:AbortMultipartUpload"]
     resources = ["${aws_s3_bucket.analytics.arn}/analytics/*"]
   }
+
+  # compaction: 합친 뒤 원본 run 파일 삭제 + 끝난 manifest 삭제
+  statement {
+    sid     = "AllowDeleteFactClicks"
+    effect  = "Allow"
+    actions = ["s3:DeleteObject"]
+    resources = [
+      "${aws_s3_bucket.analytics.arn}/analytics/fact_clicks/*",
+      "${aws_s3_bucket.analytics.arn}/analytics/state/compaction/*",
+    ]
+  }
 }
 
 resource "aws_iam_policy" "analyze_export_s3" {
@@ -103,7 +114,7 @@ resource "aws_glue_catalog_database" "shortify" {
   name = "${var.project_name}_analytics"
 }
 
-# (4) Glue Table: fact_clicks (JSON Lines)
+# (4) Glue Table: fact_clicks (JSON Lines, .jsonl.gz는 확장자 보고 압축 해제)
 resource "aws_glue_catalog_table" "fact_clicks" {
   name          = "fact_clicks"
   database_name = aws_glue_catalog_database.shortify.name
@@ -24,4 +24,34 @@ variable "slack_webhook_url_ai_summary" {
   description = "Slack Incoming Webhook URL for AI summary alert channel"
   type        = string
   sensitive   = true
-}
\ No newline at end of file
+}
+
+variable "id_permute_key" {
+  description = "Secret key for permuting block-allocated shortIds. Empty keeps SHORT_ID_MODE=random"
+  type        = string
+  sensitive   = true
+  default     = ""
+
+  validation {
+    condition     = var.id_permute_key == "" || length(var.id_permute_key) >= 16
+    error_message = "id_permute_key must be empty (random shortIds) or at least 16 characters."
+  }
+}
+
+variable "edge_redirect_enabled" {
+  description = "Serve hot shortIds from a CloudFront Function + KeyValueStore (analyze job=redirect_map)"
+  type        = bool
+  default     = false
+}
+
+variable "awscrt_layer_arn" {
+  description = "Lambda layer with botocore[crt] for analyze (cloudfront-keyvaluestore needs SigV4A)"
+  type        = string
+  default     = ""
+}
+
+variable "numpy_layer_arn" {
+  description = "Optional Lambda layer with numpy for analyze AGG_ENGINE=columnar (e.g. AWSSDKPandas-Python311)"
+  type        = string
+  default     = ""
+}
@@ -1,18 +1,33 @@
 # lambda/analyze/handler.py
 import os
+import gzip
+import hashlib
+import io
 import json
+import math
+import random
 import re
+import threading
+import time
 import uuid
 import boto3
 import urllib.request
 import urllib.error
 from datetime import datetime, timedelta, timezone
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import urlparse
 from decimal import Decimal, ROUND_HALF_UP
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 
+try:
+    import numpy as np  # 선택: 레이어로 붙어 있으면 AGG_ENGINE=columnar가 배열 연산 사용
+except ImportError:
+    np = None
+
 DDB = boto3.resource("dynamodb")
 CW = boto3.client("cloudwatch")
 S3 = boto3.client("s3")
@@ -21,6 +36,24 @@ ANALYTICS_BUCKET = os.getenv("ANALYTICS_BUCKET", "")
 ANALYTICS_PREFIX = os.getenv("ANALYTICS_PREFIX", "analytics").strip("/")  # "analytics"
 EXPORT_ENABLED = os.getenv("EXPORT_ENABLED", "false").lower() == "true"
 EXPORT_CHECKPOINT_KEY = os.getenv("EXPORT_CHECKPOINT_KEY", f"{ANALYTICS_PREFIX}/state/last_export_ts.json")
+# fact_clicks 파일 형식: jsonl | jsonl.gz (Athena JsonSerDe가 .gz 확장자면 알아서 풀어서 읽음)
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "jsonl").lower()
+# export/compaction은 줄 단위로 스트리밍 -> EXPORT_PART_SIZE_MB마다 multipart UploadPart (S3 최소 5MB)
+# (전체가 한 part보다 작으면 put_object 한 번)
+EXPORT_PART_SIZE = max(5, int(os.getenv("EXPORT_PART_SIZE_MB", "8"))) * 1024 * 1024
+# poll: 집계 run마다 shortId별로 clicks 재조회 (MAX_CLICKS_PER_SID 상한)
+# stream: clicks 테이블 DynamoDB Streams 배치를 그대로 fact_clicks에 append (poll export는 건너뜀)
+EXPORT_MODE = os.getenv("EXPORT_MODE", "poll").lower()
+EXPORT_STREAM_CHECKPOINT_KEY = os.getenv(
+    "EXPORT_STREAM_CHECKPOINT_KEY", f"{ANALYTICS_PREFIX}/state/stream_export.json"
+)
+# 시간 파티션(dt=/hr=) 안의 run별 작은 파일을 하나로 합침 (job=compact_fact_clicks, 기본 어제 하루치)
+COMPACT_MIN_OBJECTS = int(os.getenv("COMPACT_MIN_OBJECTS", "2"))
+# 합친 파일이 어떤 원본을 덮는지 기록 (Athena가 읽지 않게 fact_clicks 밖에 둠)
+COMPACT_MANIFEST_PREFIX = os.getenv("COMPACT_MANIFEST_PREFIX", f"{ANALYTICS_PREFIX}/state/compaction").strip("/")
+
+# Glue fact_clicks 테이블 컬럼 순서 (monitoring 모듈 aws_glue_catalog_table과 같아야 함)
+FACT_CLICK_COLUMNS = ("ts", "shortId", "referer", "device", "isSuspect", "ipHash", "userAgent")
 
 # Bedrock Runtime (서울: ap-northeast-2에서 지원) - 모델ID는 env로 주입
 BEDROCK_RUNTIME = boto3.client("bedrock-runtime")
@@ -29,12 +62,34 @@ URLS_TABLE = os.environ["URLS_TABLE"]
 CLICKS_TABLE = os.environ["CLICKS_TABLE"]
 INSIGHTS_TABLE = os.environ["INSIGHTS_TABLE"]
 AI_TABLE = os.environ["AI_TABLE"]
+COUNTERS_TABLE = os.getenv("COUNTERS_TABLE", "url-shortener-counters")
+ROLLUPS_TABLE = os.getenv("ROLLUPS_TABLE", "url-shortener-rollups")
+ACTIVE_TABLE = os.getenv("ACTIVE_TABLE", "url-shortener-active")
 
 MODEL_TREND = os.getenv("BEDROCK_MODEL_TREND", "amazon.nova-micro-v1:0")
 MODEL_INSIGHT = os.getenv("BEDROCK_MODEL_INSIGHT", "amazon.nova-lite-v1:0")
 
 TOP_N_REFERER = int(os.getenv("TOP_N_REFERER", "5"))
 MAX_URLS_PER_RUN = int(os.getenv("MAX_URLS_PER_RUN", "200"))  # 한 번에 너무 많이 돌리지 않게
+
+# 집계 대상 shortId 목록
+# - scan  : urls 테이블 Scan (MAX_URLS_PER_RUN개, scan 순서)
+# - active: active 인덱스(redirect/click_ingest가 클릭 시 기록)에서 window 안에 클릭이 있었던 shortId만
+URL_LIST_SOURCE = os.getenv("URL_LIST_SOURCE", "scan").lower()
+ACTIVE_INDEX_SHARDS = max(1, int(os.getenv("ACTIVE_INDEX_SHARDS", "4")))  # redirect/click_ingest와 같은 값
+# window 밖으로 막 빠진 shortId도 한 번 더 집계 -> insight가 0으로 갱신됨 (스케줄 주기보다 길게)
+ACTIVE_LOOKBACK_SEC = int(os.getenv("ACTIVE_LOOKBACK_SEC", "7200"))
+MAX_ACTIVE_URLS_PER_RUN = int(os.getenv("MAX_ACTIVE_URLS_PER_RUN", "0"))  # 0이면 제한 없음
+
+# GET /ai/latest 응답 캐시 (warm container) + Cache-Control/ETag
+# - ai_only/집계 스케줄(5분/30분)보다 자주 바뀌지 않으므로 짧은 주기 기준으로 TTL
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_TTL_SEC = int(os.getenv("AI_CACHE_TTL_SEC", "300"))
+_ai_cache = {}  # periodKey -> (expiresAtMonotonic, bodyJson, etag)
+
+# 전체 shortId clicksByHour 합산 아이템 (aggregation run마다 갱신, /ai/latest는 GetItem 1번)
+# insights 테이블에 shortId="#GLOBAL"로 저장 ('#'는 shortId(base62)에 안 나옴)
+GLOBAL_INSIGHT_SHORT_ID = "#GLOBAL"
 ENABLE_AI_DEFAULT = os.getenv("ENABLE_AI_DEFAULT", "false").lower() == "true"
 
 AI_TOP_URL_N = int(os.getenv("AI_TOP_URL_N", "20"))
@@ -44,6 +99,25 @@ MAX_CLICKS_PER_SID = int(os.getenv("MAX_CLICKS_PER_SID", "1000"))
 
 KST = timezone(timedelta(hours=9))
 
+# 집계 방식
+# - full   : 매 실행마다 window 전체 클릭을 다시 query 해서 aggregate() (기존)
+# - rollup : 체크포인트 이후 신규 클릭만 분/시간 버킷(rollups 테이블)에 누적 -> window = 버킷 합
+AGG_MODE = os.getenv("AGG_MODE", "full").lower()
+# full 모드 집계 엔진
+# - rowwise  : 클릭 하나씩 (기존)
+# - columnar : 문자열을 코드로 바꿔 고유값마다 한 번만 파싱/분류 -> 코드 배열로 히스토그램/burst 계산
+AGG_ENGINE = os.getenv("AGG_ENGINE", "rowwise").lower()
+# 늦게 들어오는 클릭 대기: 체크포인트보다 앞 timestamp로 나중에 적재된 클릭은 rollup에 안 들어감
+# -> 가장 느린 적재 경로(CLICK_INGEST_MAX_DELAY_SEC: sqs 재시도, 로그 구독 전달 지연 등)보다 짧게 잡지 않음
+CLICK_INGEST_MAX_DELAY_SEC = int(os.getenv("CLICK_INGEST_MAX_DELAY_SEC", "60"))
+ROLLUP_LAG_SEC = max(int(os.getenv("ROLLUP_LAG_SEC", "60")), CLICK_INGEST_MAX_DELAY_SEC)
+# 적재 구간 lease 유지 시간 (analyze timeout보다 길게). 만료되면 다음 run이 같은 구간을 이어받음
+ROLLUP_LEASE_SEC = int(os.getenv("ROLLUP_LEASE_SEC", "300"))
+ROLLUP_BOOTSTRAP_SEC = int(os.getenv("ROLLUP_BOOTSTRAP_SEC", str(7 * 86400)))  # 체크포인트 없을 때 최초 적재 범위
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "8"))  # P#7D + 여유
+ROLLUP_MAX_REFERERS_PER_BUCKET = int(os.getenv("ROLLUP_MAX_REFERERS_PER_BUCKET", "50"))
+ROLLUP_CHECKPOINT_KEY = {"shortId": "#ROLLUP", "bucket": "CHECKPOINT"}
+
 
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 ALERT_ONLY_PERIOD = os.getenv("ALERT_ONLY_PERIOD", "P#1H")
@@ -57,7 +131,45 @@ MAX_ALERTS_PER_RUN = int(os.getenv("MAX_ALERTS_PER_RUN", "5"))
 SUSP_WINDOW_SEC = int(os.getenv("SUSP_WINDOW_SEC", "60"))
 SUSP_REPEAT_THRESHOLD = int(os.getenv("SUSP_REPEAT_THRESHOLD", "10"))
 
+# hot shortId clickCount 쓰기 분산 (sharded counter)
+# - 최근 window 클릭 속도가 shard당 목표치를 넘으면 urls.counterShards를 늘림 (줄이지는 않음)
+SHARDED_COUNTERS_ENABLED = os.getenv("SHARDED_COUNTERS_ENABLED", "false").lower() == "true"
+COUNTER_SHARD_CLICKS_PER_SEC = float(os.getenv("COUNTER_SHARD_CLICKS_PER_SEC", "100"))
+COUNTER_SHARDS_MAX = int(os.getenv("COUNTER_SHARDS_MAX", "32"))
+
+# shortId별 조회/집계/upsert 병렬 처리 (1이면 기존처럼 순차)
+ANALYZE_CONCURRENCY = max(1, int(os.getenv("ANALYZE_CONCURRENCY", "1")))
+# DynamoDB throttle 시 adaptive backoff (botocore 기본 재시도 위에 한 번 더)
+DDB_THROTTLE_MAX_RETRIES = int(os.getenv("DDB_THROTTLE_MAX_RETRIES", "6"))
+DDB_THROTTLE_BASE_DELAY_SEC = float(os.getenv("DDB_THROTTLE_BASE_DELAY_SEC", "0.05"))
+DDB_THROTTLE_MAX_DELAY_SEC = float(os.getenv("DDB_THROTTLE_MAX_DELAY_SEC", "2.0"))
+DDB_THROTTLE_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+
+# 엣지 리다이렉트 맵: clickCount 상위 shortId -> originalUrl을 CloudFront KeyValueStore에 올려서
+# CloudFront Function이 Lambda 없이 바로 리다이렉트 (맵에 없는 shortId는 기존 경로)
+# - 직전에 반영한 상태를 S3 스냅샷으로 두고 바뀐 키만 UpdateKeys (스냅샷 없으면 KVS ListKeys로 현재 상태)
+# - KVS 제한: 키 512B, 값 1KB, 전체 5MB, UpdateKeys 요청당 50개
+REDIRECT_MAP_ENABLED = os.getenv("REDIRECT_MAP_ENABLED", "false").lower() == "true"
+REDIRECT_MAP_KVS_ARN = os.getenv("REDIRECT_MAP_KVS_ARN", "")
+REDIRECT_MAP_MAX_KEYS = int(os.getenv("REDIRECT_MAP_MAX_KEYS", "5000"))
+REDIRECT_MAP_MAX_BYTES = int(os.getenv("REDIRECT_MAP_MAX_BYTES", str(4 * 1024 * 1024)))  # 5MB 중 여유 1MB
+REDIRECT_MAP_MIN_CLICKS = int(os.getenv("REDIRECT_MAP_MIN_CLICKS", "10"))
+REDIRECT_MAP_SCAN_LIMIT = int(os.getenv("REDIRECT_MAP_SCAN_LIMIT", "100000"))  # URL_LIST_SOURCE=scan일 때
+REDIRECT_MAP_LOOKBACK_SEC = int(os.getenv("REDIRECT_MAP_LOOKBACK_SEC", "86400"))  # URL_LIST_SOURCE=active일 때
+REDIRECT_MAP_SNAPSHOT_KEY = os.getenv("REDIRECT_MAP_SNAPSHOT_KEY", f"{ANALYTICS_PREFIX}/redirect_map/current.json")
+KVS_MAX_KEY_BYTES = 512
+KVS_MAX_VALUE_BYTES = 1024
+KVS_UPDATE_BATCH = 50
+
+_kvs_client = None
+
 BOT_UA_PAT = re.compile(r"(bot|spider|crawler|headless|python-requests|curl|wget)", re.I)
+# UA 분류 결과 캐시 (고유 UA 수 << 클릭 수, 컨테이너 안에서 shortId/run 간 공유)
+UA_CACHE_SIZE = int(os.getenv("UA_CACHE_SIZE", "4096"))
 
 COMMON_2LEVEL_SUFFIX = {
     "co.kr", "or.kr", "go.kr", "ac.kr",
@@ -107,12 +219,22 @@ def lambda_handler(event, context):
             allowed = {"P#1MIN", "P#5MIN", "P#30MIN", "P#1H", "P#24H", "P#7D"}
             if period_key not in allowed:
                 return _resp(400, {"message": "INVALID_periodKey", "allowed": sorted(list(allowed))})
-            return _resp(200, get_latest_ai(period_key))
+            headers = {str(k).lower(): v for k, v in (event.get("headers") or {}).items()}
+            return get_latest_ai_response(period_key, headers.get("if-none-match"))
 
         return _resp(404, {"message": "NOT_FOUND"})
 
     # ---------------------------------
-    # 2) EventBridge / 수동 invoke 처리
+    # 2) clicks 테이블 DynamoDB Streams (EXPORT_MODE=stream)
+    # ---------------------------------
+    records = event.get("Records")
+    if records and records[0].get("eventSource") == "aws:dynamodb":
+        result = run_stream_export(records)
+        print(json.dumps({"type": "STREAM_EXPORT_RESULT", "result": result}, ensure_ascii=False))
+        return _resp(200, result)
+
+    # ---------------------------------
+    # 3) EventBridge / 수동 invoke 처리
     # ---------------------------------
     job = event.get("job", "aggregate_only")
 
@@ -123,6 +245,16 @@ def lambda_handler(event, context):
         print(json.dumps({"type": "AI_ONLY_RESULT", "result": result}, ensure_ascii=False))
         return _resp(200, result)
 
+    if job == "compact_fact_clicks":
+        result = run_compact_fact_clicks(event.get("dt"))
+        print(json.dumps({"type": "COMPACT_RESULT", "result": result}, ensure_ascii=False))
+        return _resp(200, result)
+
+    if job == "redirect_map":
+        result = run_redirect_map_job(full=bool(event.get("full")))
+        print(json.dumps({"type": "REDIRECT_MAP_RESULT", "result": result}, ensure_ascii=False))
+        return _resp(200, result)
+
     period_key = event.get("periodKey", "P#1H")
     result = run_aggregation(period_key)
     print(json.dumps({"type": "ANALYZE_RESULT", "result": result}, ensure_ascii=False))
@@ -197,13 +329,89 @@ def normalize_url(u: str, max_len: int = 140) -> str:
     return base[:max_len] if len(base) > max_len else base
 
 
+# ---------------- click timestamp ----------------
+# redirect click_timestamp()가 쓰는 고정 형식 "YYYY-MM-DDTHH:MM:SSZ" -> 슬라이스해서 정수 계산
+# (클릭마다 strptime + astimezone 하던 게 집계 프로파일 1위)
+# "YYYY-MM-DDTHH:MM:" 앞부분 -> epoch은 캐시 (날짜 00:00Z epoch도 따로 캐시), 클릭마다는 초만 더함
+KST_OFFSET_SEC = 9 * 3600
+_DAY_EPOCH_CACHE = {}     # "YYYY-MM-DD" -> 그 날 00:00:00Z epoch (잘못된 날짜면 None)
+_MINUTE_EPOCH_CACHE = {}  # "YYYY-MM-DDTHH:MM:" -> 그 분 00초 epoch (형식이 다르면 None)
+_KST_DAY_CACHE = {}       # KST 기준 일수 -> "YYYY-MM-DD"
+TS_DAY_CACHE_MAX = 4096
+TS_MINUTE_CACHE_MAX = 50000  # 1분 단위 약 34일치
+
+
+def _day_epoch(day: str) -> int | None:
+    epoch = _DAY_EPOCH_CACHE.get(day, -1)
+    if epoch != -1:
+        return epoch
+    try:
+        epoch = int(datetime(int(day[:4]), int(day[5:7]), int(day[8:10]), tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        epoch = None
+    if len(_DAY_EPOCH_CACHE) >= TS_DAY_CACHE_MAX:
+        _DAY_EPOCH_CACHE.clear()
+    _DAY_EPOCH_CACHE[day] = epoch
+    return epoch
+
+
+def _minute_epoch(prefix: str) -> int | None:
+    if not (
+        prefix.isascii() and prefix[4] == "-" and prefix[7] == "-" and prefix[10] == "T"
+        and prefix[13] == ":" and prefix[16] == ":"
+        and (prefix[:4] + prefix[5:7] + prefix[8:10] + prefix[11:13] + prefix[14:16]).isdigit()
+    ):
+        return None
+    day = _day_epoch(prefix[:10])
+    hh, mm = int(prefix[11:13]), int(prefix[14:16])
+    if day is None or hh > 23 or mm > 59:
+        return None
+    return day + hh * 3600 + mm * 60
+
+
+def click_epoch(ts) -> int | None:
+    """
+    클릭 timestamp -> epoch 초 (파싱 안 되면 None).
+    고정 형식이면 분 단위 앞부분은 캐시, 초만 슬라이스 -> int.
+    그 밖의 모양은 예전처럼 strptime("%Y-%m-%dT%H:%M:%SZ")로 (한 자리 숫자 등).
+    """
+    if type(ts) is str and len(ts) == 20 and ts[19] == "Z":
+        prefix = ts[:17]
+        base = _MINUTE_EPOCH_CACHE.get(prefix, -1)
+        if base == -1:
+            if len(_MINUTE_EPOCH_CACHE) >= TS_MINUTE_CACHE_MAX:
+                _MINUTE_EPOCH_CACHE.clear()
+            base = _MINUTE_EPOCH_CACHE[prefix] = _minute_epoch(prefix)
+        ss = ts[17:19]
+        if base is not None and ss.isascii() and ss.isdigit() and int(ss) < 60:
+            return base + int(ss)
+    try:
+        return int(datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def kst_hour(epoch: int) -> str:
+    return f"{(epoch + KST_OFFSET_SEC) // 3600 % 24:02d}"
+
+
+def kst_day(epoch: int) -> str:
+    day_no = (epoch + KST_OFFSET_SEC) // 86400
+    day = _KST_DAY_CACHE.get(day_no)
+    if day is None:
+        if len(_KST_DAY_CACHE) >= TS_DAY_CACHE_MAX:
+            _KST_DAY_CACHE.clear()
+        day = _KST_DAY_CACHE[day_no] = datetime.fromtimestamp(day_no * 86400, tz=timezone.utc).strftime("%Y-%m-%d")
+    return day
+
+
 def to_5min_slot(ts_iso: str) -> str:
     """KST(Asia/Seoul) 기준 5분 슬롯 -> 'HH:MM'"""
-    dt_utc = datetime.strptime(ts_iso, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-    dt_kst = dt_utc.astimezone(KST)
-
-    m = (dt_kst.minute // 5) * 5
-    return f"{dt_kst.hour:02d}:{m:02d}"
+    epoch = click_epoch(ts_iso)
+    if epoch is None:
+        raise ValueError(f"invalid timestamp: {ts_iso!r}")
+    sec = (epoch + KST_OFFSET_SEC) % 86400
+    return f"{sec // 3600:02d}:{sec % 3600 // 300 * 5:02d}"
 
 
 def now_utc():
@@ -235,6 +443,98 @@ def parse_period_key(period_key: str):
     raise ValueError(f"Unsupported periodKey: {period_key}")
 
 
+# boto3 resource는 thread-safe가 아님 -> worker thread는 자기 resource를 따로 씀
+_ddb_local = threading.local()
+
+
+def ddb():
+    if threading.current_thread() is threading.main_thread():
+        return DDB
+    res = getattr(_ddb_local, "resource", None)
+    if res is None:
+        res = boto3.session.Session().resource("dynamodb")
+        _ddb_local.resource = res
+    return res
+
+
+# worker 전체가 공유하는 throttle 지연값
+# - throttle 나면 2배로 늘리고, 성공하면 절반으로 줄임 -> 동시에 던지는 요청 속도가 같이 내려감
+_throttle_lock = threading.Lock()
+_throttle_state = {"delay": 0.0, "retries": 0}
+
+
+def ddb_call(fn, **kwargs):
+    """
+    DynamoDB 호출을 throttle-aware 하게 감싼다. (fn = table.query / table.update_item 등)
+    throttle 이외의 에러나 재시도 초과는 그대로 raise.
+    """
+    attempt = 0
+    while True:
+        delay = _throttle_state["delay"]
+        if delay > 0:
+            time.sleep(random.uniform(delay / 2, delay))
+        try:
+            resp = fn(**kwargs)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in DDB_THROTTLE_ERROR_CODES or attempt >= DDB_THROTTLE_MAX_RETRIES:
+                raise
+            with _throttle_lock:
+                _throttle_state["delay"] = min(
+                    DDB_THROTTLE_MAX_DELAY_SEC,
+                    max(DDB_THROTTLE_BASE_DELAY_SEC, _throttle_state["delay"] * 2),
+                )
+                _throttle_state["retries"] += 1
+            attempt += 1
+            continue
+
+        if _throttle_state["delay"] > 0:
+            with _throttle_lock:
+                d = _throttle_state["delay"] / 2
+                _throttle_state["delay"] = d if d >= DDB_THROTTLE_BASE_DELAY_SEC else 0.0
+        return resp
+
+
+def map_shortids(fn, url_items: list):
+    """
+    url 아이템마다 fn(u)를 실행 (ANALYZE_CONCURRENCY > 1이면 thread pool로 fan-out).
+    returns: (입력 순서대로의 결과 list, 병렬 처리 리포트)
+    """
+    busy = [0.0]
+    busy_lock = threading.Lock()
+    retries_before = _throttle_state["retries"]
+
+    def timed(u):
+        t0 = time.perf_counter()
+        try:
+            return fn(u)
+        finally:
+            dt = time.perf_counter() - t0
+            with busy_lock:
+                busy[0] += dt
+
+    workers = min(ANALYZE_CONCURRENCY, len(url_items)) or 1
+    t_start = time.perf_counter()
+    if workers <= 1:
+        results = [timed(u) for u in url_items]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(timed, url_items))
+    wall = time.perf_counter() - t_start
+
+    report = {
+        "concurrency": workers,
+        "tasks": len(url_items),
+        "wallMs": round(wall * 1000, 1),
+        "busyMs": round(busy[0] * 1000, 1),
+        # 동시에 돌고 있던 평균 작업 수 (1에 가까우면 병렬 효과 없음)
+        "achievedParallelism": round(busy[0] / wall, 2) if wall > 0 else 0.0,
+        "throttleRetries": _throttle_state["retries"] - retries_before,
+        "throttleDelayMs": round(_throttle_state["delay"] * 1000, 1),
+    }
+    return results, report
+
+
 def chunked(iterable, size):
     buf = []
     for x in iterable:
@@ -323,21 +623,25 @@ def compute_suspicious(click_items):
 
     반환: suspiciousClicks (중복 제거된 클릭 건수)
     """
+    return len(suspicious_click_keys(click_items))
+
 
+def click_key(it):
     # 클릭 1건을 유니크하게 식별할 키 (중복 카운트 방지)
-    def click_key(it):
-        return (
-            it.get("timestamp", "") or "",
-            it.get("ip", "") or "",
-            it.get("userAgent", "") or "",
-        )
+    return (
+        it.get("timestamp", "") or "",
+        it.get("ip", "") or "",
+        it.get("userAgent", "") or "",
+    )
+
 
+def suspicious_click_keys(click_items) -> set:
+    """compute_suspicious 룰에 걸린 클릭들의 click_key set"""
     suspicious = set()
 
     # 1) bot UA: 클릭 단위로 바로 suspicious 처리
     for it in click_items:
-        ua = (it.get("userAgent") or "")
-        if ua and BOT_UA_PAT.search(ua):
+        if click_device(it)[1]:
             suspicious.add(click_key(it))
 
     # 2) burst: (ip, ua) 그룹별 슬라이딩 윈도우
@@ -351,19 +655,18 @@ def compute_suspicious(click_items):
         if not (ip_hash and ua and ts):
             continue
 
-        try:
-            dt = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-        except Exception:
+        epoch = click_epoch(ts)
+        if epoch is None:
             continue
 
-        by_group[(ip_hash, ua)].append((dt, it))
+        by_group[(ip_hash, ua)].append((epoch, it))
 
     for _, pairs in by_group.items():
         pairs.sort(key=lambda x: x[0])
 
         i = 0
         for j in range(len(pairs)):
-            while pairs[j][0] - pairs[i][0] > timedelta(seconds=SUSP_WINDOW_SEC):
+            while pairs[j][0] - pairs[i][0] > SUSP_WINDOW_SEC:
                 i += 1
 
             window_size = j - i + 1
@@ -384,7 +687,7 @@ def compute_suspicious(click_items):
         # 1) CloudWatch Alarm: suspiciousRate를 커스텀 메트릭으로 올리고, Metric Math로 조건 구성
         # 2) insights에 alertLevel 필드만 저장 후 프론트에서 배지 표시
 
-    return len(suspicious)
+    return suspicious
         
 
 DEVICE_PATTERNS = {
@@ -393,19 +696,29 @@ DEVICE_PATTERNS = {
     "desktop": re.compile(r"(windows nt|macintosh|x11|linux)", re.I),
 }
 
-def classify_device(user_agent: str) -> str:
-    ua = (user_agent or "").strip()
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def classify_ua(user_agent: str) -> tuple[str, bool]:
+    """UA -> (device, isBot). 집계/suspicious/export 공통 (redirect/click_ingest의 적재 시 분류와 같은 규칙)"""
+    ua = user_agent.strip()
     if not ua:
-        return "unknown"
+        return "unknown", False
     if BOT_UA_PAT.search(ua):
-        return "bot"
+        return "bot", True
     if DEVICE_PATTERNS["tablet"].search(ua):
-        return "tablet"
+        return "tablet", False
     if DEVICE_PATTERNS["mobile"].search(ua):
-        return "mobile"
+        return "mobile", False
     if DEVICE_PATTERNS["desktop"].search(ua):
-        return "desktop"
-    return "other"
+        return "desktop", False
+    return "other", False
+
+
+def click_device(it: dict) -> tuple[str, bool]:
+    """click item -> (device, isBot). 적재 때 저장된 device(CLICK_STORE_DEVICE)가 있으면 다시 분류하지 않음"""
+    device = it.get("device")
+    if device:
+        return device, device == "bot"
+    return classify_ua(it.get("userAgent") or "")
 
 
 def aggregate(click_items):
@@ -424,20 +737,18 @@ def aggregate(click_items):
     for it in click_items:
         ts = it.get("timestamp")
         ref = it.get("referer") or "direct"
-        ua = it.get("userAgent") or ""
-        try:
-            dt_utc = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-            dt_kst = dt_utc.astimezone(KST)
-
-            by_hour[f"{dt_kst.hour:02d}"] += 1        # ✅ KST + 2자리
-            by_day[dt_kst.strftime("%Y-%m-%d")] += 1  # ✅ KST 날짜
-        except Exception:
-            pass
+        epoch = click_epoch(ts)
+        if epoch is not None:
+            by_hour[kst_hour(epoch)] += 1  # ✅ KST + 2자리
+            by_day[kst_day(epoch)] += 1    # ✅ KST 날짜
         by_ref[ref] += 1
 
-        device = classify_device(ua)    
-        by_device[device] += 1
+        by_device[click_device(it)[0]] += 1
+
+    return total, dict(by_hour), dict(by_day), compact_referers(by_ref), dict(by_device)
 
+
+def compact_referers(by_ref: Counter) -> dict:
     # Top N referer + other
     top = by_ref.most_common(TOP_N_REFERER)
     top_keys = set([k for k, _ in top])
@@ -450,14 +761,187 @@ def aggregate(click_items):
         else:
             other_sum += v
     if other_sum > 0:
-        compact_ref["other"] = other_sum
+        compact_ref["other"] = compact_ref.get("other", 0) + other_sum
+
+    return compact_ref
 
-    return total, dict(by_hour), dict(by_day), compact_ref, dict(by_device)
+
+# ---------------- columnar aggregation (AGG_ENGINE=columnar) ----------------
+
+class ClickColumns:
+    """
+    click item 리스트 -> 열(code 배열). timestamp/referer/userAgent/ip는 처음 나온 순서대로 코드를 붙이고
+    epoch 파싱은 고유값마다 한 번만 함. device는 click_device()처럼 저장된 값 우선, 없으면 classify_ua (lru_cache).
+    aggregate()/compute_suspicious()와 같은 결과 (numpy 있으면 bincount/searchsorted, 없으면 같은 코드로 루프).
+    """
+
+    def __init__(self, click_items):
+        ts_idx, ref_idx, ua_idx, ip_idx, dev_idx = {}, {}, {}, {}, {}
+        ts_codes, ref_codes, ua_codes, ip_codes, dev_codes = [], [], [], [], []
+        ua_device = {}  # device 없는 클릭용 UA -> classify_ua device
+        for it in click_items:
+            ua = it.get("userAgent") or ""
+            ts_codes.append(ts_idx.setdefault(it.get("timestamp") or "", len(ts_idx)))
+            ref_codes.append(ref_idx.setdefault(it.get("referer") or "direct", len(ref_idx)))
+            ua_codes.append(ua_idx.setdefault(ua, len(ua_idx)))
+            ip_codes.append(ip_idx.setdefault(it.get("ip") or "", len(ip_idx)))
+            device = it.get("device") or ua_device.get(ua)
+            if not device:
+                device = ua_device[ua] = classify_ua(ua)[0]
+            dev_codes.append(dev_idx.setdefault(device, len(dev_idx)))
+
+        self.total = len(ts_codes)
+        self.refs = list(ref_idx)
+        self.n_ts = len(ts_idx)
+        self.n_ua = len(ua_idx)
+        self.no_ip = ip_idx.get("", -1)
+
+        self.ts_epoch = [click_epoch(ts) for ts in ts_idx]
+        self.devices = list(dev_idx)
+        self.dev_bot = [device == "bot" for device in self.devices]  # click_device()[1]과 같음
+        self.ua_empty = ua_idx.get("", -1)
+
+        if np is not None:
+            self.epoch_ok = np.array([e is not None for e in self.ts_epoch], dtype=bool)
+            self.epoch = np.array([e if e is not None else 0 for e in self.ts_epoch], dtype=np.int64)
+            self.ts_codes = np.asarray(ts_codes, dtype=np.int64)
+            self.ref_codes = np.asarray(ref_codes, dtype=np.int64)
+            self.ua_codes = np.asarray(ua_codes, dtype=np.int64)
+            self.ip_codes = np.asarray(ip_codes, dtype=np.int64)
+            self.dev_codes = np.asarray(dev_codes, dtype=np.int64)
+        else:
+            self.ts_codes, self.ref_codes, self.ua_codes, self.ip_codes = ts_codes, ref_codes, ua_codes, ip_codes
+            self.dev_codes = dev_codes
+
+    def _counts(self, codes, n: int) -> list:
+        """코드별 등장 횟수 (index = 코드)"""
+        if np is not None:
+            return np.bincount(codes, minlength=n).tolist()
+        counts = [0] * n
+        for c, k in Counter(codes).items():
+            counts[c] = k
+        return counts
+
+    def aggregate(self):
+        """aggregate()와 같은 반환값"""
+        by_hour, by_day = self._time_bins()
+
+        # referer는 처음 나온 순서 그대로 (compact_referers의 동점 순서가 rowwise와 같도록)
+        ref_counts = self._counts(self.ref_codes, len(self.refs))
+        by_ref = Counter({ref: n for ref, n in zip(self.refs, ref_counts)})
+
+        by_device = Counter()
+        for code, n in enumerate(self._counts(self.dev_codes, len(self.devices))):
+            if n:
+                by_device[self.devices[code]] += n
+
+        return self.total, dict(by_hour), dict(by_day), compact_referers(by_ref), dict(by_device)
+
+    def _time_bins(self) -> tuple[Counter, Counter]:
+        """KST 시(00-23) / 날짜(YYYY-MM-DD)별 클릭 수 (timestamp 파싱 안 되는 클릭은 빠짐)"""
+        by_hour = Counter()
+        by_day = Counter()
+        if np is not None:
+            counts = np.bincount(self.ts_codes, minlength=self.n_ts)
+            ok = self.epoch_ok & (counts > 0)
+            kst = self.epoch[ok] + KST_OFFSET_SEC
+            weights = counts[ok]
+            for h, n in enumerate(np.bincount(kst // 3600 % 24, weights=weights, minlength=24).tolist()):
+                if n:
+                    by_hour[f"{h:02d}"] = int(n)
+            days, inverse = np.unique(kst // 86400, return_inverse=True)
+            for day, n in zip(days.tolist(), np.bincount(inverse, weights=weights).tolist()):
+                by_day[kst_day(day * 86400 - KST_OFFSET_SEC)] = int(n)
+            return by_hour, by_day
+
+        for code, n in enumerate(self._counts(self.ts_codes, self.n_ts)):
+            epoch = self.ts_epoch[code]
+            if not n or epoch is None:
+                continue
+            by_hour[kst_hour(epoch)] += n
+            by_day[kst_day(epoch)] += n
+        return by_hour, by_day
+
+    def suspicious_count(self) -> int:
+        """compute_suspicious()와 같은 값: bot(device) + (ip, UA) 그룹별 첫 burst 윈도우, click_key 기준 중복 제거"""
+        if np is not None:
+            return self._suspicious_count_np()
+
+        suspicious = set()
+        by_group = defaultdict(list)
+        for ts_c, ua_c, ip_c, dev_c in zip(self.ts_codes, self.ua_codes, self.ip_codes, self.dev_codes):
+            if self.dev_bot[dev_c]:
+                suspicious.add((ts_c, ip_c, ua_c))
+            epoch = self.ts_epoch[ts_c]
+            if epoch is None or ip_c == self.no_ip or ua_c == self.ua_empty:
+                continue
+            by_group[(ip_c, ua_c)].append((epoch, ts_c))
+
+        for (ip_c, ua_c), pairs in by_group.items():
+            pairs.sort(key=lambda x: x[0])
+            i = 0
+            for j in range(len(pairs)):
+                while pairs[j][0] - pairs[i][0] > SUSP_WINDOW_SEC:
+                    i += 1
+                if j - i + 1 >= SUSP_REPEAT_THRESHOLD:
+                    suspicious.update((pairs[k][1], ip_c, ua_c) for k in range(i, j + 1))
+                    break
+        return len(suspicious)
+
+    def _suspicious_count_np(self) -> int:
+        ts_c, ua_c, ip_c = self.ts_codes, self.ua_codes, self.ip_codes
+        epoch_ok, epoch = self.epoch_ok, self.epoch
+
+        susp = np.asarray(self.dev_bot, dtype=bool)[self.dev_codes]
+
+        cand = np.nonzero(epoch_ok[ts_c] & (ip_c != self.no_ip) & (ua_c != self.ua_empty))[0]
+        if cand.size:
+            group = ip_c[cand] * self.n_ua + ua_c[cand]
+            e = epoch[ts_c[cand]]
+            order = np.lexsort((e, group))  # 그룹 -> 시간 순 (stable, rowwise sort와 같은 순서)
+            group, e = group[order], e[order]
+
+            # 그룹마다 (전체 범위 + window)만큼 띄워서 한 줄로 -> searchsorted가 그룹 경계를 넘지 않음
+            _, gid = np.unique(group, return_inverse=True)
+            span = int(e.max() - e.min()) + SUSP_WINDOW_SEC + 1
+            line = gid * span + (e - e.min())
+            left = np.searchsorted(line, line - SUSP_WINDOW_SEC, side="left")
+            hits = np.nonzero(np.arange(line.size) - left + 1 >= SUSP_REPEAT_THRESHOLD)[0]
+            if hits.size:
+                # 그룹당 첫 burst 윈도우 [left, j]만
+                _, first = np.unique(gid[hits], return_index=True)
+                ends = hits[first]
+                mark = np.zeros(line.size + 1, dtype=np.int64)
+                np.add.at(mark, left[ends], 1)
+                np.add.at(mark, ends + 1, -1)
+                susp[cand[order[np.cumsum(mark[:-1]) > 0]]] = True
+
+        if not susp.any():
+            return 0
+        # click_key(timestamp, ip, UA) 중복 제거: 코드 3개를 int64 하나로 (넘치면 행 단위 unique)
+        n_ip = int(ip_c.max()) + 1
+        if self.n_ts * n_ip * self.n_ua < 2 ** 63:
+            return int(np.unique((ts_c[susp] * n_ip + ip_c[susp]) * self.n_ua + ua_c[susp]).size)
+        keys = np.stack((ts_c[susp], ip_c[susp], ua_c[susp]), axis=1)
+        return int(np.unique(keys, axis=0).shape[0])
+
+
+def aggregate_clicks(click_items):
+    """aggregate() + compute_suspicious() 한 번에 (AGG_ENGINE에 따라 rowwise / columnar)"""
+    if AGG_ENGINE == "columnar":
+        cols = ClickColumns(click_items)
+        return (*cols.aggregate(), cols.suspicious_count())
+    return (*aggregate(click_items), compute_suspicious(click_items))
 
 
 def fetch_clicks_for_shortid(short_id: str, start_iso: str, end_iso: str, limit: int = 0):
-    table = DDB.Table(CLICKS_TABLE)
-    items = []
+    return list(iter_clicks_for_shortid(short_id, start_iso, end_iso, limit))
+
+
+def iter_clicks_for_shortid(short_id: str, start_iso: str, end_iso: str, limit: int = 0):
+    """Query 페이지 단위로 yield (한 번에 한 페이지만 메모리에)"""
+    table = ddb().Table(CLICKS_TABLE)
+    fetched = 0
     last_key = None
 
     while True:
@@ -470,7 +954,7 @@ def fetch_clicks_for_shortid(short_id: str, start_iso: str, end_iso: str, limit:
 
         # limit 처리
         if limit and limit > 0:
-            remaining = limit - len(items)
+            remaining = limit - fetched
             if remaining <= 0:
                 break
             kwargs["Limit"] = min(1000, remaining)
@@ -478,31 +962,44 @@ def fetch_clicks_for_shortid(short_id: str, start_iso: str, end_iso: str, limit:
         if last_key:
             kwargs["ExclusiveStartKey"] = last_key
 
-        resp = table.query(**kwargs)
-        items.extend(resp.get("Items", []))
+        resp = ddb_call(table.query, **kwargs)
+        page = resp.get("Items", [])
+        fetched += len(page)
+        yield from page
         last_key = resp.get("LastEvaluatedKey")
 
         if not last_key:
             break
-        if limit and len(items) >= limit:
+        if limit and fetched >= limit:
             break
 
-    return items
-
 
 
-def list_urls(limit: int):
+def list_urls(limit: int, start_dt: datetime | None = None, end_dt: datetime | None = None):
     """
-    urls 테이블에서 shortId 목록을 가져온다.
-    규모가 커지면 Scan은 비싸짐 -> 지금 단계(개인 프로젝트/초기)에서는 단순화.
+    집계 대상 urls 아이템 목록.
+    - URL_LIST_SOURCE=active + window 지정: [start_dt, end_dt]에 클릭이 있었던 shortId 전부
+    - 그 외: urls 테이블 Scan (limit개)
     """
-    table = DDB.Table(URLS_TABLE)
+    if URL_LIST_SOURCE == "active" and start_dt and end_dt:
+        items = get_urls_by_ids(list_active_shortids(start_dt, end_dt))
+        if MAX_ACTIVE_URLS_PER_RUN > 0 and len(items) > MAX_ACTIVE_URLS_PER_RUN:
+            print(json.dumps({
+                "type": "ACTIVE_URLS_TRUNCATED",
+                "active": len(items),
+                "limit": MAX_ACTIVE_URLS_PER_RUN,
+            }, ensure_ascii=False))
+            items = sorted(items, key=lambda x: safe_int(x.get("clickCount", 0)), reverse=True)[:MAX_ACTIVE_URLS_PER_RUN]
+        return items
+
+    # 규모가 커지면 Scan은 비싸짐 -> active 인덱스 사용 권장
+    table = ddb().Table(URLS_TABLE)
     items = []
     last_key = None
 
     while len(items) < limit:
         kwargs = {
-            "ProjectionExpression": "shortId, title, clickCount, originalUrl",
+            "ProjectionExpression": "shortId, title, clickCount, originalUrl, counterShards, expiresAt",
             "Limit": min(100, limit - len(items))
         }
         if last_key:
@@ -514,13 +1011,147 @@ def list_urls(limit: int):
         if not last_key:
             break
 
+    resolve_sharded_click_counts(items)
     return items
 
 
+def list_active_shortids(start_dt: datetime, end_dt: datetime) -> list:
+    """
+    active 테이블에서 [start_dt, end_dt]에 걸친 UTC 시간 버킷 x shard를 전부 Query.
+    (시간 단위라 window 앞쪽 최대 1시간은 더 넓게 잡힘 -> 클릭 없는 shortId는 0으로 집계될 뿐)
+    """
+    buckets = []
+    hour = start_dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    while hour <= end_dt:
+        hour_key = hour.strftime("%Y-%m-%dT%H")
+        buckets.extend(f"{hour_key}#{n}" for n in range(ACTIVE_INDEX_SHARDS))
+        hour += timedelta(hours=1)
+
+    def query_bucket(bucket: str) -> list:
+        table = ddb().Table(ACTIVE_TABLE)
+        kwargs = {
+            "KeyConditionExpression": Key("bucket").eq(bucket),
+            "ProjectionExpression": "shortId",
+        }
+        sids = []
+        while True:
+            resp = ddb_call(table.query, **kwargs)
+            sids.extend(it["shortId"] for it in resp.get("Items", []) if it.get("shortId"))
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+        return sids
+
+    short_ids = set()
+    with ThreadPoolExecutor(max_workers=ANALYZE_CONCURRENCY) as pool:
+        for sids in pool.map(query_bucket, buckets):
+            short_ids.update(sids)
+
+    print(json.dumps({
+        "type": "ACTIVE_INDEX_LISTED",
+        "buckets": len(buckets),
+        "shortIds": len(short_ids),
+    }, ensure_ascii=False))
+    return sorted(short_ids)
+
+
+def get_urls_by_ids(short_ids: list) -> list:
+    """urls 테이블 BatchGetItem (100개 단위). 삭제된 shortId는 빠짐."""
+    items = []
+    for batch in chunked(short_ids, 100):
+        request = {URLS_TABLE: {
+            "Keys": [{"shortId": sid} for sid in batch],
+            "ProjectionExpression": "shortId, title, clickCount, originalUrl, counterShards, expiresAt",
+        }}
+        for attempt in range(5):
+            resp = ddb().batch_get_item(RequestItems=request)
+            items.extend(resp.get("Responses", {}).get(URLS_TABLE, []))
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05 * (2 ** attempt))
+
+    resolve_sharded_click_counts(items)
+    return items
+
+
+def resolve_sharded_click_counts(url_items: list):
+    """
+    counterShards > 1인 아이템은 clickCount에 counters 테이블 shard 합계를 더해서 덮어씀.
+    ("{shortId}#{n}" 키를 BatchGetItem 100개 단위로 조회)
+    """
+    keys = []
+    by_sid = {}
+    for u in url_items:
+        shards = safe_int(u.get("counterShards", 1))
+        sid = u.get("shortId")
+        if not sid or shards <= 1:
+            continue
+        by_sid[sid] = u
+        keys.extend({"counterKey": f"{sid}#{i}"} for i in range(shards))
+
+    if not keys:
+        return
+
+    shard_sum = Counter()
+    for batch in chunked(keys, 100):
+        request = {COUNTERS_TABLE: {"Keys": batch}}
+        for attempt in range(5):
+            resp = ddb().batch_get_item(RequestItems=request)
+            for it in resp.get("Responses", {}).get(COUNTERS_TABLE, []):
+                sid = str(it.get("counterKey", "")).rsplit("#", 1)[0]
+                shard_sum[sid] += safe_int(it.get("clickCount", 0))
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05 * (2 ** attempt))
+
+    for sid, u in by_sid.items():
+        u["clickCount"] = safe_int(u.get("clickCount", 0)) + shard_sum.get(sid, 0)
+
+
+def maybe_fan_out_counter(short_id: str, window_clicks: int, window_sec: float, current_shards: int):
+    """
+    window 클릭 속도(clicks/sec)가 COUNTER_SHARD_CLICKS_PER_SEC를 넘으면 counterShards를 늘린다.
+    - 줄이지는 않음 (읽는 쪽이 0..counterShards-1 shard를 합산하므로 줄이면 카운트 유실)
+    - 조건부 업데이트라 동시에 돌아도 큰 값만 남음
+    returns: 새 shard 수 (변경 없으면 None)
+    """
+    if not SHARDED_COUNTERS_ENABLED or window_sec <= 0 or COUNTER_SHARD_CLICKS_PER_SEC <= 0:
+        return None
+
+    rate = window_clicks / window_sec
+    desired = min(COUNTER_SHARDS_MAX, math.ceil(rate / COUNTER_SHARD_CLICKS_PER_SEC))
+    if desired <= max(1, current_shards):
+        return None
+
+    try:
+        ddb().Table(URLS_TABLE).update_item(
+            Key={"shortId": short_id},
+            UpdateExpression="SET counterShards = :n",
+            ConditionExpression="attribute_exists(shortId) AND (attribute_not_exists(counterShards) OR counterShards < :n)",
+            ExpressionAttributeValues={":n": desired},
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return None
+        raise
+
+    print(json.dumps({
+        "type": "COUNTER_FAN_OUT",
+        "sid": short_id,
+        "clicksPerSec": round(rate, 2),
+        "prevShards": current_shards,
+        "newShards": desired,
+    }, ensure_ascii=False))
+    return desired
+
+
 def upsert_insight(short_id: str, period_key: str, start_at: str, end_at: str,
                    total: int, by_hour: dict, by_day: dict, by_ref: dict, by_device: dict,
                    suspicious_clicks: int):
-    table = DDB.Table(INSIGHTS_TABLE)
+    table = ddb().Table(INSIGHTS_TABLE)
     if total == 0:
         suspicious_rate_dec = Decimal("0")
     else:
@@ -529,7 +1160,8 @@ def upsert_insight(short_id: str, period_key: str, start_at: str, end_at: str,
             rounding=ROUND_HALF_UP
         )
 
-    table.update_item(
+    ddb_call(
+        table.update_item,
         Key={"shortId": short_id, "periodKey": period_key},
         UpdateExpression="""
             SET startAt = :sa,
@@ -558,6 +1190,258 @@ def upsert_insight(short_id: str, period_key: str, start_at: str, end_at: str,
     )
     return float(suspicious_rate_dec)
 
+# -------------------------
+# rollup (AGG_MODE=rollup)
+# rollups 테이블: PK=shortId, SK=bucket
+#   - "M#YYYY-MM-DDTHH:MM" (UTC 분 버킷), "H#YYYY-MM-DDTHH" (UTC 시간 버킷)
+#   - 속성: total, susp, "r:{referer}", "d:{device}", expiresAt(TTL)
+#   - 버킷 하나는 KST 시각/날짜가 하나로 정해지므로 clicksByHour/clicksByDay는 버킷 키에서 계산
+# -------------------------
+
+def update_rollups(urls: list, end_dt: datetime) -> datetime:
+    """
+    체크포인트 이후 신규 클릭만 읽어서 분/시간 버킷에 ADD (claim -> 적재 -> commit).
+    1) 체크포인트 아이템에 lease(구간 [leaseFrom, leaseTo) + 만료 시각)를 조건부로 잡음
+       -> 동시에 도는 다른 run은 건너뜀, 앞 run이 중간에 죽어 lease가 만료됐으면 같은 구간을 이어받음
+    2) 버킷 ADD는 구간 id(rangeId)를 버킷의 appliedRanges에 같이 넣고 조건으로 막음
+       -> 이어받은 run이 같은 구간을 다시 돌아도 이미 반영된 버킷은 두 번 더해지지 않음
+    3) 전부 끝나면 lease가 그대로일 때만 lastTs = leaseTo로 commit
+    - 반환: 버킷에 반영이 끝난 시점(체크포인트). 집계 window의 끝으로 사용
+    """
+    table = ddb().Table(ROLLUPS_TABLE)
+    now_epoch = int(time.time())
+    new_end = (end_dt - timedelta(seconds=ROLLUP_LAG_SEC)).replace(microsecond=0)
+
+    state = table.get_item(Key=ROLLUP_CHECKPOINT_KEY, ConsistentRead=True).get("Item") or {}
+    ckpt = state.get("lastTs")
+    ckpt_dt = datetime.strptime(ckpt, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc) if ckpt else None
+
+    lease_until = safe_int(state.get("leaseUntil", 0))
+    if state.get("leaseTo") and lease_until > now_epoch:
+        # 다른 run이 적재 중 -> 이번 run은 이미 commit된 체크포인트까지만 사용
+        print(json.dumps({"type": "ROLLUP_SKIPPED_LEASED", "checkpoint": ckpt, "leaseTo": state.get("leaseTo")}, ensure_ascii=False))
+        if ckpt_dt is None:
+            raise RuntimeError("rollup bootstrap in progress")
+        return ckpt_dt
+
+    start_iso = ckpt or iso(new_end - timedelta(seconds=ROLLUP_BOOTSTRAP_SEC))
+    if state.get("leaseTo"):
+        # 만료된 lease = 앞 run이 중간에 실패 -> 같은 구간부터 다시 (이미 반영된 버킷은 rangeId로 건너뜀)
+        start_iso = state.get("leaseFrom") or start_iso
+        end_iso = state["leaseTo"]
+        print(json.dumps({"type": "ROLLUP_LEASE_RESUMED", "from": start_iso, "to": end_iso}, ensure_ascii=False))
+    elif ckpt and ckpt >= iso(new_end):
+        return ckpt_dt
+    else:
+        end_iso = iso(new_end)
+
+    range_id = f"{start_iso}~{end_iso}"
+    try:
+        table.update_item(
+            Key=ROLLUP_CHECKPOINT_KEY,
+            UpdateExpression="SET leaseFrom = :from, leaseTo = :to, leaseUntil = :until",
+            ConditionExpression=(
+                ("lastTs = :old" if ckpt else "attribute_not_exists(lastTs)")
+                + " AND (attribute_not_exists(leaseUntil) OR leaseUntil = :prev)"
+            ),
+            ExpressionAttributeValues={
+                ":from": start_iso,
+                ":to": end_iso,
+                ":until": now_epoch + ROLLUP_LEASE_SEC,
+                ":prev": lease_until,
+                **({":old": ckpt} if ckpt else {}),
+            },
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        # 그 사이 다른 run이 lease를 잡음
+        print(json.dumps({"type": "ROLLUP_SKIPPED_CLAIMED", "checkpoint": ckpt}, ensure_ascii=False))
+        if ckpt_dt is None:
+            raise RuntimeError("rollup bootstrap in progress")
+        return ckpt_dt
+
+    new_end = datetime.strptime(end_iso, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+    # [start, new_end) : between은 양끝 포함이라 끝은 1초 빼서 조회
+    query_end_iso = iso(new_end - timedelta(seconds=1))
+    expires_at = int((new_end + timedelta(days=ROLLUP_RETENTION_DAYS)).timestamp())
+
+    # active 인덱스 모드면 집계 window가 아니라 체크포인트 구간에 클릭이 있었던 shortId를 따로 조회
+    if URL_LIST_SOURCE == "active":
+        urls = list_urls(0, datetime.strptime(start_iso, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc), new_end)
+
+    new_clicks = 0
+    bucket_writes = 0
+    for u in urls:
+        sid = u.get("shortId")
+        if not sid:
+            continue
+        items = fetch_clicks_for_shortid(sid, start_iso, query_end_iso)
+        if not items:
+            continue
+        new_clicks += len(items)
+        for bucket, counters in build_rollup_buckets(items).items():
+            if put_rollup_bucket(table, sid, bucket, counters, expires_at, range_id):
+                bucket_writes += 1
+
+    # commit: lease가 아직 이 run 것일 때만 체크포인트 이동 (lease 만료 후 다른 run이 이어받았으면 그쪽이 commit)
+    try:
+        table.update_item(
+            Key=ROLLUP_CHECKPOINT_KEY,
+            UpdateExpression="SET lastTs = :to REMOVE leaseFrom, leaseTo, leaseUntil",
+            ConditionExpression="leaseTo = :to AND leaseUntil = :until",
+            ExpressionAttributeValues={":to": end_iso, ":until": now_epoch + ROLLUP_LEASE_SEC},
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        print(json.dumps({"type": "ROLLUP_COMMIT_LOST_LEASE", "rangeId": range_id}, ensure_ascii=False))
+
+    print(json.dumps({
+        "type": "ROLLUP_UPDATED",
+        "from": start_iso,
+        "to": end_iso,
+        "newClicks": new_clicks,
+        "bucketWrites": bucket_writes,
+    }, ensure_ascii=False))
+    return new_end
+
+
+def build_rollup_buckets(click_items: list) -> dict:
+    """신규 클릭 -> {bucket: Counter(total/susp/r:*/d:*)} (분 버킷 + 시간 버킷 둘 다)"""
+    # burst 판정은 이번 배치 안에서만 함 (체크포인트 경계에 걸친 burst는 나뉘어 덜 잡힐 수 있음)
+    suspicious = suspicious_click_keys(click_items)
+
+    buckets = defaultdict(Counter)
+    for it in click_items:
+        ts = it.get("timestamp") or ""
+        if len(ts) < 16:
+            continue
+        counters = Counter({"total": 1})
+        if click_key(it) in suspicious:
+            counters["susp"] = 1
+        counters["r:" + (it.get("referer") or "direct")] = 1
+        counters["d:" + click_device(it)[0]] = 1
+
+        buckets["M#" + ts[:16]].update(counters)   # 2026-02-23T14:22
+        buckets["H#" + ts[:13]].update(counters)   # 2026-02-23T14
+
+    return {b: cap_rollup_referers(c) for b, c in buckets.items()}
+
+
+def cap_rollup_referers(counters: Counter) -> Counter:
+    # 버킷 아이템 크기 보호: referer 종류가 너무 많으면 상위만 남기고 나머지는 r:other로
+    refs = [(k, v) for k, v in counters.items() if k.startswith("r:")]
+    if len(refs) <= ROLLUP_MAX_REFERERS_PER_BUCKET:
+        return counters
+
+    refs.sort(key=lambda kv: kv[1], reverse=True)
+    for k, v in refs[ROLLUP_MAX_REFERERS_PER_BUCKET - 1:]:
+        del counters[k]
+        counters["r:other"] += v
+    return counters
+
+
+def put_rollup_bucket(table, short_id: str, bucket: str, counters: Counter, expires_at: int, range_id: str) -> bool:
+    """returns: 이번에 반영했는지 (같은 range_id가 이미 반영된 버킷이면 False)"""
+    names = {"#applied": "appliedRanges"}
+    values = {":exp": expires_at, ":range": range_id, ":ranges": {range_id}}
+    adds = ["#applied :ranges"]
+    for i, (attr, n) in enumerate(counters.items()):
+        names[f"#a{i}"] = attr
+        values[f":a{i}"] = int(n)
+        adds.append(f"#a{i} :a{i}")
+
+    try:
+        table.update_item(
+            Key={"shortId": short_id, "bucket": bucket},
+            UpdateExpression="ADD " + ", ".join(adds) + " SET expiresAt = :exp",
+            ConditionExpression="NOT contains(#applied, :range)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def query_rollup_buckets(short_id: str, lo: str, hi: str) -> list:
+    table = ddb().Table(ROLLUPS_TABLE)
+    items = []
+    kwargs = {"KeyConditionExpression": Key("shortId").eq(short_id) & Key("bucket").between(lo, hi)}
+    while True:
+        resp = ddb_call(table.query, **kwargs)
+        items.extend(resp.get("Items", []))
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        kwargs["ExclusiveStartKey"] = last_key
+    return items
+
+
+def aggregate_from_rollups(short_id: str, start_dt: datetime, end_dt: datetime):
+    """
+    [start_dt, end_dt) window를 버킷 합으로 계산 (aggregate() + compute_suspicious()와 같은 형태로 반환)
+    - 정시 단위로 꽉 차는 구간은 시간 버킷, 앞/뒤 자투리는 분 버킷
+    returns: total, by_hour, by_day, by_ref, by_device, suspicious_clicks
+    """
+    start_min = start_dt.replace(second=0, microsecond=0)
+    end_min = end_dt.replace(second=0, microsecond=0)
+
+    first_full_hour = start_min.replace(minute=0)
+    if first_full_hour < start_min:
+        first_full_hour += timedelta(hours=1)
+    last_hour = end_min.replace(minute=0)
+
+    def m_key(dt):
+        return "M#" + dt.strftime("%Y-%m-%dT%H:%M")
+
+    def h_key(dt):
+        return "H#" + dt.strftime("%Y-%m-%dT%H")
+
+    rows = []
+    if first_full_hour < last_hour:
+        rows += query_rollup_buckets(short_id, h_key(first_full_hour), h_key(last_hour - timedelta(hours=1)))
+        if start_min < first_full_hour:
+            rows += query_rollup_buckets(short_id, m_key(start_min), m_key(first_full_hour - timedelta(minutes=1)))
+        if last_hour < end_min:
+            rows += query_rollup_buckets(short_id, m_key(last_hour), m_key(end_min - timedelta(minutes=1)))
+    elif start_min < end_min:
+        rows += query_rollup_buckets(short_id, m_key(start_min), m_key(end_min - timedelta(minutes=1)))
+
+    total = 0
+    suspicious_clicks = 0
+    by_hour = Counter()
+    by_day = Counter()
+    by_ref = Counter()
+    by_device = Counter()
+
+    for it in rows:
+        bucket = str(it.get("bucket") or "")
+        n = safe_int(it.get("total", 0))
+        if n <= 0:
+            continue
+        total += n
+        suspicious_clicks += safe_int(it.get("susp", 0))
+
+        # 버킷 시작 시각(UTC) -> KST 시/날짜
+        epoch = click_epoch(bucket[2:] + (":00Z" if bucket.startswith("M#") else ":00:00Z"))
+        if epoch is not None:
+            by_hour[kst_hour(epoch)] += n
+            by_day[kst_day(epoch)] += n
+
+        for k, v in it.items():
+            if k.startswith("r:"):
+                by_ref[k[2:]] += safe_int(v)
+            elif k.startswith("d:"):
+                by_device[k[2:]] += safe_int(v)
+
+    return total, dict(by_hour), dict(by_day), compact_referers(by_ref), dict(by_device), suspicious_clicks
+
+
 def safe_json_obj(raw_text: str):
     if raw_text is None:
         return None
@@ -587,7 +1471,7 @@ def put_ai_result(period_key: str, ai_trend: dict | None, ai_insight: dict | Non
     if ai_trend is None and ai_insight is None:
         return
 
-    table = DDB.Table(AI_TABLE)
+    table = ddb().Table(AI_TABLE)
     gen = iso(now_utc())
 
     item = {
@@ -606,13 +1490,13 @@ def _scan_all_insights_for_period(period_key: str):
     INSIGHTS_TABLE에서 periodKey가 같은 모든 shortId 아이템을 scan으로 가져온다.
     (초기/개인프로젝트 규모 전제. 커지면 GSI 권장)
     """
-    table = DDB.Table(INSIGHTS_TABLE)
+    table = ddb().Table(INSIGHTS_TABLE)
     items = []
     last_key = None
 
     while True:
         kwargs = {
-            "FilterExpression": Attr("periodKey").eq(period_key),
+            "FilterExpression": Attr("periodKey").eq(period_key) & Attr("shortId").ne(GLOBAL_INSIGHT_SHORT_ID),
             "ProjectionExpression": "periodKey, clicksByHour",
         }
         if last_key:
@@ -637,20 +1521,27 @@ def build_global_hourly_timebins(period_key: str):
 
     # hour(0~23) 합산
     summed = Counter()
-
     for it in rows:
-        by_hour = it.get("clicksByHour") or {}
-        if not isinstance(by_hour, dict):
+        add_hourly_clicks(summed, it.get("clicksByHour"))
+
+    return hourly_time_bins(summed)
+
+
+def add_hourly_clicks(summed: Counter, by_hour):
+    """clicksByHour({"06": 3, ...})를 hour(int) 기준으로 summed에 더한다."""
+    if not isinstance(by_hour, dict):
+        return
+    for h, c in by_hour.items():
+        try:
+            hh = int(h)  # "6" -> 6
+            cc = int(c)
+            if 0 <= hh <= 23:
+                summed[hh] += cc
+        except Exception:
             continue
-        for h, c in by_hour.items():
-            try:
-                hh = int(h)  # "6" -> 6
-                cc = int(c)
-                if 0 <= hh <= 23:
-                    summed[hh] += cc
-            except Exception:
-                continue
 
+
+def hourly_time_bins(summed: Counter) -> list:
     # 프론트 차트용: 0~23 전부 채워서 반환(빈 시간대 0)
     time_bins = []
     for hh in range(24):
@@ -662,12 +1553,41 @@ def build_global_hourly_timebins(period_key: str):
     return time_bins
 
 
+def put_global_insight(period_key: str, start_at: str, end_at: str, summed: Counter, short_ids: int):
+    ddb().Table(INSIGHTS_TABLE).put_item(Item={
+        "shortId": GLOBAL_INSIGHT_SHORT_ID,
+        "periodKey": period_key,
+        "startAt": start_at,
+        "endAt": end_at,
+        "timeBins": hourly_time_bins(summed),
+        "shortIdCount": int(short_ids),
+        "generatedAt": iso(now_utc()),
+    })
+
+
+def get_global_hourly_timebins(period_key: str):
+    """
+    run_aggregation이 저장해 둔 global 아이템을 GetItem.
+    아직 없으면(배포 직후 등) 예전처럼 insights scan 합산으로 fallback.
+    """
+    resp = ddb().Table(INSIGHTS_TABLE).get_item(
+        Key={"shortId": GLOBAL_INSIGHT_SHORT_ID, "periodKey": period_key},
+        ProjectionExpression="timeBins",
+    )
+    time_bins = (resp.get("Item") or {}).get("timeBins")
+    if isinstance(time_bins, list):
+        return [{"time": str(b.get("time")), "clicks": int(b.get("clicks", 0))} for b in time_bins]
+
+    print(json.dumps({"type": "GLOBAL_INSIGHT_MISS", "periodKey": period_key}, ensure_ascii=False))
+    return build_global_hourly_timebins(period_key)
+
+
 def get_latest_ai(period_key: str = "P#30MIN") -> dict:
     """
     ai 테이블에서 periodKey의 최신 1건을 가져온다.
     (PK=periodKey, SK=aiGeneratedAt)
     """
-    table = DDB.Table(AI_TABLE)
+    table = ddb().Table(AI_TABLE)
 
     resp = table.query(
         KeyConditionExpression=Key("periodKey").eq(period_key),
@@ -685,9 +1605,9 @@ def get_latest_ai(period_key: str = "P#30MIN") -> dict:
 
     item = items[0]
 
-    # ✅ (1) 차트 데이터: INSIGHTS_TABLE에서 periodKey 기준 전체 shortId 합산
+    # ✅ (1) 차트 데이터: 전체 shortId clicksByHour 합산 (aggregation run이 미리 저장)
     chart_period_key = "P#24H"
-    time_bins = build_global_hourly_timebins(chart_period_key)
+    time_bins = get_global_hourly_timebins(chart_period_key)
     # ✅ (2) 추천 데이터: AI가 준 top3만 사용 (clicks 붙이지 않음)
     raw_ai_insight = item.get("aiInsight") or {}
     top3 = []
@@ -728,6 +1648,45 @@ def get_latest_ai(period_key: str = "P#30MIN") -> dict:
     }
 
 
+def get_latest_ai_response(period_key: str, if_none_match=None):
+    now_mono = time.monotonic()
+    entry = _ai_cache.get(period_key) if AI_CACHE_ENABLED else None
+    cache_hit = bool(entry and entry[0] > now_mono)
+
+    if cache_hit:
+        expires_at, body_json, etag = entry
+    else:
+        body_json = json.dumps(get_latest_ai(period_key), ensure_ascii=False, default=_json_default)
+        etag = '"' + hashlib.sha256(body_json.encode("utf-8")).hexdigest()[:32] + '"'
+        expires_at = now_mono + AI_CACHE_TTL_SEC
+        if AI_CACHE_ENABLED:
+            _ai_cache[period_key] = (expires_at, body_json, etag)
+
+    print(json.dumps({"type": "AI_LATEST_CACHE", "periodKey": period_key, "cacheHit": cache_hit}, ensure_ascii=False))
+
+    resp = _resp(200, {})
+    resp["headers"]["Cache-Control"] = f"public, max-age={max(0, int(expires_at - now_mono))}"
+    resp["headers"]["ETag"] = etag
+    if _etag_matches(if_none_match, etag):
+        resp["statusCode"] = 304
+        resp["body"] = ""
+    else:
+        resp["body"] = body_json
+    return resp
+
+
+def _etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in str(if_none_match).split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
 def _get_query(event: dict, key: str, default=None):
     q = (event or {}).get("queryStringParameters") or {}
     v = q.get(key)
@@ -749,8 +1708,8 @@ def run_ai_job(ai_period_key: str, source_period_key: str):
     start_iso = iso(start_dt)
     end_iso = iso(end_dt)
 
-    # 2) URL 목록 로드 (초기 단계니까 scan 기반)
-    urls = list_urls(MAX_URLS_PER_RUN)
+    # 2) URL 목록 로드 (scan 또는 active 인덱스)
+    urls = list_urls(MAX_URLS_PER_RUN, start_dt, end_dt)
 
     # 3) 전역 집계
     top_url_clicks = Counter()  # normalizedUrl -> clicks
@@ -766,32 +1725,44 @@ def run_ai_job(ai_period_key: str, source_period_key: str):
     # 비용 방지: shortId당 클릭 로그 상한
     per_sid_limit = MAX_CLICKS_PER_SID if MAX_CLICKS_PER_SID > 0 else 0
 
-    for u in urls_sorted:
+    def collect_one(u):
         sid = u.get("shortId")
         if not sid:
-            continue
+            return None
 
         click_items = fetch_clicks_for_shortid(sid, start_iso, end_iso, limit=per_sid_limit)
         if not click_items:
-            continue
-
-        total_clicks_all += len(click_items)
-
-        # 도메인 집계 (Trend 입력용)
-        ou = normalize_url(u.get("originalUrl", ""))
-        if ou:
-            top_url_clicks[ou] += len(click_items)
+            return None
 
         # 5분 슬롯 집계 (Insight 입력용)
+        bins = Counter()
         for it in click_items:
             ts = it.get("timestamp")
             if not ts:
                 continue
             try:
                 slot = to_5min_slot(ts)  # "HH:MM" (KST)
-                time_bins[slot] += 1
+                bins[slot] += 1
             except Exception:
                 pass
+        return len(click_items), bins
+
+    results, parallelism = map_shortids(collect_one, urls_sorted)
+    print(json.dumps({"type": "ANALYZE_PARALLELISM", "job": "ai", **parallelism}, ensure_ascii=False))
+
+    for u, r in zip(urls_sorted, results):
+        if not r:
+            continue
+        n, bins = r
+
+        total_clicks_all += n
+
+        # 도메인 집계 (Trend 입력용)
+        ou = normalize_url(u.get("originalUrl", ""))
+        if ou:
+            top_url_clicks[ou] += n
+
+        time_bins.update(bins)
 
     # 데이터 없으면 AI 호출 스킵
     if total_clicks_all == 0 or not top_url_clicks or not time_bins:
@@ -803,6 +1774,7 @@ def run_ai_job(ai_period_key: str, source_period_key: str):
             "totalClicksSourceWindow": total_clicks_all,
             "skipped": True,
             "reason": "NO_DATA",
+            "parallelism": parallelism,
         }
 
     # 4) AI 입력 Top-N 생성
@@ -939,7 +1911,8 @@ def run_ai_job(ai_period_key: str, source_period_key: str):
         "raw": {
             "trend": ai_output.get("trend_raw"),
             "insight": ai_output.get("insight_raw"),
-        }
+        },
+        "parallelism": parallelism,
     }
 
 def safe_int(x):
@@ -955,36 +1928,35 @@ def run_aggregation(period_key: str):
     start_iso = iso(start_dt)
     end_iso = iso(end_dt)
 
-    urls = list_urls(MAX_URLS_PER_RUN)
+    urls = list_urls(MAX_URLS_PER_RUN, start_dt - timedelta(seconds=ACTIVE_LOOKBACK_SEC), end_dt)
 
     
 
     # ✅ 0) S3 Export (신규 클릭만) - 스키마 변경 없이 fact_clicks 생성
-    if EXPORT_ENABLED and ANALYTICS_BUCKET and period_key == "P#1H":
+    if EXPORT_ENABLED and EXPORT_MODE == "poll" and ANALYTICS_BUCKET and period_key == "P#1H":
         try:
             last_ts = load_export_checkpoint()
             export_start = last_ts or start_iso  # ✅ 첫 실행은 현재 집계 window만 export
             run_id = f"{iso(end_dt).replace(':','').replace('-','')}-{uuid.uuid4().hex[:8]}"
 
-            export_records = []
-
-            # urls는 이미 scan 결과이므로 여기서 shortId만 돌면 됨
-            for u in urls:
-                sid = u.get("shortId")
-                if not sid:
-                    continue
+            # scan이면 urls 그대로, active 인덱스면 export 구간에 클릭이 있었던 shortId만 다시 조회
+            export_urls = urls
+            if URL_LIST_SOURCE == "active":
+                export_start_dt = datetime.strptime(export_start, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+                export_urls = list_urls(0, export_start_dt, end_dt)
 
-                # 신규 클릭만
-                items = fetch_clicks_for_shortid(sid, export_start, end_iso, limit=MAX_CLICKS_PER_SID)
-                if not items:
-                    continue
+            def iter_export_records():
+                for u in export_urls:
+                    sid = u.get("shortId")
+                    if not sid:
+                        continue
 
-                for it in items:
-                    export_records.append(click_to_fact_record(sid, it))
+                    # 신규 클릭만 (페이지 단위로 바로 직렬화 -> 메모리는 part 버퍼만큼)
+                    for it in iter_clicks_for_shortid(sid, export_start, end_iso, limit=MAX_CLICKS_PER_SID):
+                        yield click_to_fact_record(sid, it)
 
             # 파일 저장(데이터 없으면 파일은 생략)
-            if export_records:
-                export_fact_clicks_jsonl(export_records, end_dt=end_dt, run_id=run_id)
+            export_fact_clicks_jsonl(iter_export_records(), end_dt=end_dt, run_id=run_id)
 
             # ✅ 데이터 없더라도 체크포인트는 앞으로 이동(재조회 방지)
             save_export_checkpoint(end_iso)
@@ -992,7 +1964,19 @@ def run_aggregation(period_key: str):
         except Exception as e:
             # export 실패가 집계/insights 업데이트를 막지 않게
             print(json.dumps({"type": "S3_EXPORT_ERROR", "error": str(e)}, ensure_ascii=False))
-    
+
+    # ✅ rollup 모드: 신규 클릭만 버킷에 반영 -> window는 버킷 합으로 계산
+    #    (실패하면 이번 run은 full 모드로 fallback)
+    use_rollup = AGG_MODE == "rollup"
+    if use_rollup:
+        try:
+            end_dt = update_rollups(urls, end_dt)
+            start_dt = end_dt - duration
+            start_iso = iso(start_dt)
+            end_iso = iso(end_dt)
+        except Exception as e:
+            print(json.dumps({"type": "ROLLUP_ERROR", "error": str(e)}, ensure_ascii=False))
+            use_rollup = False
 
     urls_sorted = sorted(urls, key=lambda x: safe_int(x.get("clickCount", 0)), reverse=True)
 
@@ -1015,16 +1999,53 @@ def run_aggregation(period_key: str):
                 "error": str(e)
             }, ensure_ascii=False))
             alert_state = {}
-    
 
-    for u in urls_sorted:
+    # shortId별 조회 -> 집계 -> upsert는 worker에서 (ANALYZE_CONCURRENCY)
+    # Slack 알림/alert_state는 공유 상태라 결과를 모은 뒤 순서대로 처리
+    def aggregate_one(u):
         sid = u.get("shortId")
         if not sid:
-            continue
+            return None
+
+        if use_rollup:
+            total, by_hour, by_day, by_ref, by_device, suspicious_clicks = aggregate_from_rollups(sid, start_dt, end_dt)
+        else:
+            click_items = fetch_clicks_for_shortid(sid, start_iso, end_iso)
+            total, by_hour, by_day, by_ref, by_device, suspicious_clicks = aggregate_clicks(click_items)
+
+        print("DEBUG_AGG_RESULT", sid, period_key, total, by_hour, by_day, by_ref, by_device)
+
+        upsert_insight(
+            short_id=sid,
+            period_key=period_key,
+            start_at=start_iso,
+            end_at=end_iso,
+            total=total,
+            by_hour=by_hour,
+            by_day=by_day,
+            by_ref=by_ref,
+            by_device=by_device,
+            suspicious_clicks=suspicious_clicks,
+        )
 
-        click_items = fetch_clicks_for_shortid(sid, start_iso, end_iso)
-        total, by_hour, by_day, by_ref, by_device = aggregate(click_items)
-        suspicious_clicks = compute_suspicious(click_items)
+        # hot shortId면 clickCount 쓰기 shard fan-out (짧은 window 기준 클릭 속도로 판단)
+        if duration <= timedelta(hours=1):
+            try:
+                maybe_fan_out_counter(sid, total, duration.total_seconds(), safe_int(u.get("counterShards", 1)))
+            except Exception as e:
+                print(json.dumps({"type": "COUNTER_FAN_OUT_ERROR", "sid": sid, "error": str(e)}, ensure_ascii=False))
+
+        return sid, total, suspicious_clicks, by_hour
+
+    results, parallelism = map_shortids(aggregate_one, urls_sorted)
+    print(json.dumps({"type": "ANALYZE_PARALLELISM", "job": "aggregate", "periodKey": period_key, **parallelism}, ensure_ascii=False))
+
+    global_by_hour = Counter()
+    for r in results:
+        if not r:
+            continue
+        sid, total, suspicious_clicks, by_hour = r
+        add_hourly_clicks(global_by_hour, by_hour)
 
         print(json.dumps({
             "type": "SUSP_CHECK",
@@ -1132,24 +2153,15 @@ def run_aggregation(period_key: str):
                     "last_alerted": last_alerted
                 }, ensure_ascii=False))
 
-        print("DEBUG_AGG_RESULT", sid, period_key, total, by_hour, by_day, by_ref, by_device)
-
-        upsert_insight(
-            short_id=sid,
-            period_key=period_key,
-            start_at=start_iso,
-            end_at=end_iso,
-            total=total,
-            by_hour=by_hour,
-            by_day=by_day,
-            by_ref=by_ref,
-            by_device=by_device,
-            suspicious_clicks=suspicious_clicks,
-        )
-
         total_clicks_all += total
         processed += 1
     
+    # ✅ /ai/latest 차트용 전체 합산 (이번 run에서 집계한 shortId 기준)
+    try:
+        put_global_insight(period_key, start_iso, end_iso, global_by_hour, processed)
+    except Exception as e:
+        print(json.dumps({"type": "GLOBAL_INSIGHT_SAVE_ERROR", "periodKey": period_key, "error": str(e)}, ensure_ascii=False))
+
         # ✅ P#1H 알림 상태 저장
     if period_key == ALERT_ONLY_PERIOD:
         try:
@@ -1181,6 +2193,8 @@ def run_aggregation(period_key: str):
         "endAt": end_iso,
         "processedUrls": processed,
         "totalClicksWindow": total_clicks_all,
+        "aggMode": "rollup" if use_rollup else "full",
+        "parallelism": parallelism,
     }
 
 def _json_default(o):
@@ -1248,9 +2262,8 @@ def click_to_fact_record(short_id: str, it: dict) -> dict:
     ua = it.get("userAgent") or ""
     ip_hash = it.get("ip") or ""
 
-    device = classify_device(ua)
     # ✅ 최소 버전: bot UA면 suspect 처리 (burst 룰까지 이벤트 단위로 찍는 건 나중에 확장 가능)
-    is_suspect = bool(ua and BOT_UA_PAT.search(ua))
+    device, is_suspect = click_device(it)
 
     return {
         "ts": ts,                 # ISO string (Z)
@@ -1264,10 +2277,109 @@ def click_to_fact_record(short_id: str, it: dict) -> dict:
     }
 
 
-def export_fact_clicks_jsonl(records: list[dict], end_dt: datetime, run_id: str):
+def fact_click_line(record: dict) -> str:
+    # 컬럼 순서/구성 고정 (없는 컬럼은 null)
+    return json.dumps({c: record.get(c) for c in FACT_CLICK_COLUMNS}, ensure_ascii=False)
+
+
+def fact_clicks_prefix(dt: str, hr: str) -> str:
+    return f"{ANALYTICS_PREFIX}/fact_clicks/dt={dt}/hr={hr}/"
+
+
+class S3LineWriter:
     """
-    S3에 JSON Lines로 저장:
-    s3://{bucket}/{prefix}/fact_clicks/dt=YYYY-MM-DD/hr=HH/run_id.jsonl
+    줄 단위 S3 업로드 (gz=True면 스트리밍 gzip).
+    버퍼가 EXPORT_PART_SIZE를 넘을 때마다 multipart UploadPart -> 메모리는 part 하나 크기로 고정.
+    한 줄도 안 쓰고 close하면 파일을 만들지 않음.
+    """
+
+    def __init__(self, key: str, gz: bool):
+        self.key = key
+        self.gz = gz
+        self.content_type = "application/gzip" if gz else "application/x-ndjson"
+        self.lines = 0
+        self.bytes = 0
+        self._buf = io.BytesIO()
+        # mtime=0: 같은 내용이면 같은 바이트
+        self._gz = gzip.GzipFile(fileobj=self._buf, mode="wb", compresslevel=6, mtime=0) if gz else None
+        self._upload_id = None
+        self.parts = []
+
+    def write_line(self, line: str):
+        data = (line + "\n").encode("utf-8")
+        if self._gz:
+            self._gz.write(data)
+        else:
+            self._buf.write(data)
+        self.lines += 1
+        if self._buf.tell() >= EXPORT_PART_SIZE:
+            self._upload_part()
+
+    def _take_buffer(self) -> bytes:
+        chunk = self._buf.getvalue()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return chunk
+
+    def _upload_part(self):
+        chunk = self._take_buffer()
+        if self._upload_id is None:
+            self._upload_id = S3.create_multipart_upload(
+                Bucket=ANALYTICS_BUCKET, Key=self.key, ContentType=self.content_type,
+            )["UploadId"]
+        part_no = len(self.parts) + 1
+        resp = S3.upload_part(
+            Bucket=ANALYTICS_BUCKET, Key=self.key, UploadId=self._upload_id, PartNumber=part_no, Body=chunk,
+        )
+        self.parts.append({"ETag": resp["ETag"], "PartNumber": part_no})
+        self.bytes += len(chunk)
+
+    def close(self) -> bool:
+        """returns: 파일을 만들었는지"""
+        if self._gz:
+            self._gz.close()
+        if not self.lines:
+            return False
+
+        if self._upload_id is None:
+            body = self._take_buffer()
+            S3.put_object(Bucket=ANALYTICS_BUCKET, Key=self.key, Body=body, ContentType=self.content_type)
+            self.bytes += len(body)
+            return True
+
+        # 마지막 part는 5MB 미만이어도 됨
+        if self._buf.tell():
+            self._upload_part()
+        S3.complete_multipart_upload(
+            Bucket=ANALYTICS_BUCKET, Key=self.key, UploadId=self._upload_id, MultipartUpload={"Parts": self.parts},
+        )
+        return True
+
+    def abort(self):
+        if self._upload_id is not None:
+            try:
+                S3.abort_multipart_upload(Bucket=ANALYTICS_BUCKET, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                print(json.dumps({"type": "S3_MULTIPART_ABORT_ERROR", "key": self.key, "error": str(e)}, ensure_ascii=False))
+            self._upload_id = None
+
+
+def write_lines_to_s3(key: str, lines, gz: bool) -> S3LineWriter:
+    writer = S3LineWriter(key, gz)
+    try:
+        for line in lines:
+            writer.write_line(line)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    return writer
+
+
+def export_fact_clicks_jsonl(records, end_dt: datetime, run_id: str):
+    """
+    S3에 JSON Lines로 저장 (EXPORT_FORMAT=jsonl.gz면 gzip), records는 iterable (스트리밍):
+    s3://{bucket}/{prefix}/fact_clicks/dt=YYYY-MM-DD/hr=HH/run_id.jsonl[.gz]
     """
     if not (ANALYTICS_BUCKET and ANALYTICS_PREFIX):
         return
@@ -1275,24 +2387,398 @@ def export_fact_clicks_jsonl(records: list[dict], end_dt: datetime, run_id: str)
     dt = end_dt.strftime("%Y-%m-%d")
     hr = end_dt.strftime("%H")
 
-    key = f"{ANALYTICS_PREFIX}/fact_clicks/dt={dt}/hr={hr}/{run_id}.jsonl"
-    body = "\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\n"
-
-    S3.put_object(
-        Bucket=ANALYTICS_BUCKET,
-        Key=key,
-        Body=body.encode("utf-8"),
-        ContentType="application/x-ndjson",
-    )
+    gz = EXPORT_FORMAT == "jsonl.gz"
+    key = fact_clicks_prefix(dt, hr) + f"{run_id}.jsonl" + (".gz" if gz else "")
+    writer = write_lines_to_s3(key, (fact_click_line(r) for r in records), gz)
+    if not writer.lines:
+        return
 
     print(json.dumps({
         "type": "S3_EXPORT_OK",
         "bucket": ANALYTICS_BUCKET,
         "key": key,
-        "records": len(records),
+        "records": writer.lines,
+        "bytes": writer.bytes,
+        "parts": len(writer.parts) or 1,
     }, ensure_ascii=False))
 
 
+# ---------------- stream export (EXPORT_MODE=stream) ----------------
+
+_STREAM_DESERIALIZER = TypeDeserializer()
+
+
+def stream_click_item(record: dict) -> dict | None:
+    """INSERT 레코드의 NewImage -> click item (TTL 삭제 등 나머지는 None)"""
+    if record.get("eventName") != "INSERT":
+        return None
+    image = (record.get("dynamodb") or {}).get("NewImage")
+    if not image:
+        return None
+    return {k: _STREAM_DESERIALIZER.deserialize(v) for k, v in image.items()}
+
+
+def click_partition(ts: str) -> tuple[str, str] | None:
+    # "2026-01-02T03:04:05Z" -> ("2026-01-02", "03")
+    if len(ts) < 13 or ts[10] != "T":
+        return None
+    return ts[:10], ts[11:13]
+
+
+def save_stream_checkpoint(last_seq: str, last_event_ts: str | None, records: int):
+    # 재시도/위치 관리는 이벤트 소스 매핑이 하고, 여기는 어디까지 내보냈는지(지연 확인용)만 남김
+    _s3_put_json(ANALYTICS_BUCKET, EXPORT_STREAM_CHECKPOINT_KEY, {
+        "lastSequenceNumber": last_seq,
+        "lastEventTs": last_event_ts,
+        "records": records,
+        "updatedAt": iso(now_utc()),
+    })
+
+
+def run_stream_export(records: list) -> dict:
+    """
+    clicks 테이블 스트림 배치 -> 클릭 timestamp 기준 dt=/hr= 파티션에 append (shortId별 재조회 없음).
+    파일 이름은 파티션별 첫 SequenceNumber (seq-{n}.jsonl[.gz]):
+    같은 위치부터 재시도된 배치는 같은 키에 덮어쓰므로 중복이 생기지 않음.
+    실패하면 예외 -> 이벤트 소스 매핑이 체크포인트를 넘기지 않고 같은 위치부터 다시 보냄.
+    """
+    if not (EXPORT_ENABLED and EXPORT_MODE == "stream" and ANALYTICS_BUCKET):
+        # poll 모드와 같이 돌면 같은 클릭이 두 번 export됨
+        return {"ok": False, "reason": "EXPORT_MODE_NOT_STREAM", "records": len(records)}
+
+    t0 = time.time()
+    by_partition = defaultdict(list)  # (dt, hr) -> [fact record]
+    first_seq = {}  # (dt, hr) -> 그 파티션에 들어간 첫 레코드의 SequenceNumber
+    skipped = 0
+    last_seq = None
+    last_created = None
+    for r in records:
+        meta = r.get("dynamodb") or {}
+        last_seq = meta.get("SequenceNumber") or last_seq
+        last_created = meta.get("ApproximateCreationDateTime") or last_created
+
+        item = stream_click_item(r)
+        sid = item and item.get("shortId")
+        part = click_partition(str(item.get("timestamp") or "")) if sid else None
+        if not part:
+            skipped += 1
+            continue
+        first_seq.setdefault(part, meta.get("SequenceNumber") or "0")
+        by_partition[part].append(click_to_fact_record(sid, item))
+
+    gz = EXPORT_FORMAT == "jsonl.gz"
+    exported = 0
+    keys = []
+    for (dt, hr), recs in sorted(by_partition.items()):
+        key = fact_clicks_prefix(dt, hr) + f"seq-{first_seq[(dt, hr)]}.jsonl" + (".gz" if gz else "")
+        writer = write_lines_to_s3(key, (fact_click_line(rec) for rec in recs), gz)
+        exported += writer.lines
+        keys.append(key)
+
+    last_event_ts = iso(datetime.fromtimestamp(float(last_created), tz=timezone.utc)) if last_created else None
+    lag_sec = max(0.0, time.time() - float(last_created)) if last_created else 0.0
+    if last_seq:
+        save_stream_checkpoint(last_seq, last_event_ts, exported)
+
+    try:
+        put_custom_metrics(
+            namespace="UrlShortener/Analytics",
+            metrics={"StreamExportRecords": exported, "StreamExportLagSec": lag_sec},
+            dims=[{"Name": "ExportMode", "Value": "stream"}],
+        )
+    except Exception as e:
+        print(json.dumps({"type": "STREAM_EXPORT_METRIC_ERROR", "error": str(e)}, ensure_ascii=False))
+
+    return {
+        "ok": True,
+        "records": len(records),
+        "exported": exported,
+        "skipped": skipped,
+        "partitions": len(keys),
+        "keys": keys,
+        "lastSequenceNumber": last_seq,
+        "lastEventTs": last_event_ts,
+        "lagSec": round(lag_sec, 1),
+        "elapsedMs": int((time.time() - t0) * 1000),
+    }
+
+
+def list_s3_keys(prefix: str) -> list[dict]:
+    objects = []
+    kwargs = {"Bucket": ANALYTICS_BUCKET, "Prefix": prefix}
+    while True:
+        resp = S3.list_objects_v2(**kwargs)
+        objects.extend(resp.get("Contents") or [])
+        if not resp.get("IsTruncated"):
+            return objects
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+
+def read_fact_click_lines(key: str):
+    body = S3.get_object(Bucket=ANALYTICS_BUCKET, Key=key)["Body"]
+    raw_lines = gzip.GzipFile(fileobj=body, mode="rb") if key.endswith(".gz") else body.iter_lines()
+    for raw in raw_lines:
+        line = raw.decode("utf-8").strip()
+        if not line:
+            continue
+        # 예전 파일도 현재 컬럼 순서로 다시 씀
+        yield fact_click_line(json.loads(line))
+
+
+def compaction_manifest_prefix(dt: str, hr: str) -> str:
+    return f"{COMPACT_MANIFEST_PREFIX}/dt={dt}/hr={hr}/"
+
+
+def delete_s3_keys(keys: list[str], prefix: str):
+    """DeleteObjects 1000개 단위. 하나라도 에러면 raise (지우다 만 원본이 남으면 중복)"""
+    errors = []
+    for batch in chunked(keys, 1000):
+        resp = S3.delete_objects(Bucket=ANALYTICS_BUCKET, Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True})
+        errors.extend(resp.get("Errors") or [])
+    if errors:
+        print(json.dumps({"type": "COMPACT_DELETE_ERROR", "prefix": prefix, "errors": errors[:5]}, ensure_ascii=False))
+        raise RuntimeError(f"compaction delete failed: {len(errors)} keys under {prefix}")
+
+
+def settle_compaction_manifests(dt: str, hr: str, existing: set) -> int:
+    """
+    이전 compaction이 남긴 manifest 정리 (existing = 지금 파티션에 있는 키).
+    - 합친 파일이 있음: 원본은 이미 그 안에 들어감 -> 남은 원본 삭제 후 manifest 삭제
+    - 합친 파일이 없음: 쓰기 전에 죽은 것 -> 원본이 그대로 유효, manifest만 삭제
+    returns: 이번에 지운 (이미 합쳐진) 원본 수
+    """
+    deleted = 0
+    for m in list_s3_keys(compaction_manifest_prefix(dt, hr)):
+        manifest = json.loads(S3.get_object(Bucket=ANALYTICS_BUCKET, Key=m["Key"])["Body"].read().decode("utf-8"))
+        if manifest["key"] in existing:
+            leftover = [k for k in manifest["sources"] if k in existing]
+            if leftover:
+                delete_s3_keys(leftover, fact_clicks_prefix(dt, hr))
+                existing.difference_update(leftover)
+                deleted += len(leftover)
+        S3.delete_object(Bucket=ANALYTICS_BUCKET, Key=m["Key"])
+    return deleted
+
+
+def compact_fact_clicks_partition(dt: str, hr: str) -> dict | None:
+    """
+    dt=/hr= 파티션의 파일들을 compacted-{n}.jsonl.gz 하나로 합치고 원본 삭제.
+    순서: manifest(합칠 파일 키 + 원본 키 목록) -> 합친 파일 -> 원본 삭제 -> manifest 삭제.
+    중간에 죽거나 삭제가 실패하면 다음 실행이 manifest를 보고 이미 합쳐진 원본을 다시 합치지 않고 지움.
+    새 파일을 먼저 쓰고 지우므로 그 사이 잠깐은 Athena에서 중복으로 보일 수 있음.
+    """
+    prefix = fact_clicks_prefix(dt, hr)
+    objects = [o for o in list_s3_keys(prefix) if o["Key"].endswith((".jsonl", ".jsonl.gz"))]
+    existing = {o["Key"] for o in objects}
+    settled = settle_compaction_manifests(dt, hr, existing)
+    objects = [o for o in objects if o["Key"] in existing]
+    if len(objects) < COMPACT_MIN_OBJECTS:
+        return {"hr": hr, "objects": 0, "records": 0, "bytesIn": 0, "bytesOut": 0, "settled": settled} if settled else None
+
+    def iter_lines():
+        for o in sorted(objects, key=lambda x: x["Key"]):
+            yield from read_fact_click_lines(o["Key"])
+
+    name = f"compacted-{uuid.uuid4().hex[:8]}"
+    key = prefix + name + ".jsonl.gz"
+    sources = sorted(existing)
+    manifest_key = compaction_manifest_prefix(dt, hr) + name + ".json"
+    _s3_put_json(ANALYTICS_BUCKET, manifest_key, {"key": key, "sources": sources, "createdAt": iso(now_utc())})
+
+    writer = write_lines_to_s3(key, iter_lines(), gz=True)
+    if not writer.lines:
+        # 전부 빈 파일이면 합친 파일이 안 생김 -> 원본만 지움
+        print(json.dumps({"type": "COMPACT_EMPTY", "prefix": prefix, "objects": len(sources)}, ensure_ascii=False))
+    delete_s3_keys(sources, prefix)
+    S3.delete_object(Bucket=ANALYTICS_BUCKET, Key=manifest_key)
+
+    return {
+        "hr": hr,
+        "objects": len(objects),
+        "records": writer.lines,
+        "bytesIn": sum(int(o.get("Size", 0)) for o in objects),
+        "bytesOut": writer.bytes,
+        "key": key,
+        "settled": settled,
+    }
+
+
+def run_compact_fact_clicks(dt: str | None = None) -> dict:
+    """job=compact_fact_clicks: dt(YYYY-MM-DD, 기본 어제 UTC)의 시간 파티션 24개를 각각 합침"""
+    if not ANALYTICS_BUCKET:
+        return {"ok": False, "reason": "ANALYTICS_BUCKET_NOT_SET"}
+    dt = dt or (now_utc() - timedelta(days=1)).strftime("%Y-%m-%d")
+    datetime.strptime(dt, "%Y-%m-%d")  # 형식 검증
+
+    t0 = time.time()
+    partitions = []
+    errors = []
+    for h in range(24):
+        hr = f"{h:02d}"
+        try:
+            r = compact_fact_clicks_partition(dt, hr)
+            if r:
+                partitions.append(r)
+        except Exception as e:
+            errors.append({"hr": hr, "error": str(e)})
+
+    return {
+        "ok": not errors,
+        "dt": dt,
+        "partitions": partitions,
+        "objectsIn": sum(p["objects"] for p in partitions),
+        "records": sum(p["records"] for p in partitions),
+        "bytesIn": sum(p["bytesIn"] for p in partitions),
+        "bytesOut": sum(p["bytesOut"] for p in partitions),
+        "errors": errors,
+        "elapsedMs": int((time.time() - t0) * 1000),
+    }
+
+
+# ---------------- edge redirect map ----------------
+
+def kvs():
+    """
+    cloudfront-keyvaluestore는 SigV4A 서명이라 botocore[crt](awscrt)가 있어야 함
+    (Lambda 기본 런타임에는 없음 -> analyze에 awscrt 레이어를 붙여야 동작)
+    """
+    global _kvs_client
+    if _kvs_client is None:
+        _kvs_client = boto3.client("cloudfront-keyvaluestore", region_name="us-east-1")
+    return _kvs_client
+
+
+def build_redirect_map(now: datetime) -> tuple[dict, int]:
+    """
+    clickCount 내림차순으로 KVS 제한(키/값/전체 크기, 최대 키 수) 안에 들어가는 만큼.
+    expiresAt이 있는 URL은 만료 처리를 origin(redirect Lambda)에서 하도록 제외.
+    returns: ({shortId: originalUrl}, 후보 수)
+    """
+    if URL_LIST_SOURCE == "active":
+        items = list_urls(0, now - timedelta(seconds=REDIRECT_MAP_LOOKBACK_SEC), now)
+    else:
+        items = list_urls(REDIRECT_MAP_SCAN_LIMIT)
+
+    candidates = [
+        u for u in items
+        if u.get("shortId") and u.get("originalUrl") and not u.get("expiresAt")
+        and safe_int(u.get("clickCount", 0)) >= REDIRECT_MAP_MIN_CLICKS
+    ]
+    candidates.sort(key=lambda u: (-safe_int(u.get("clickCount", 0)), u["shortId"]))
+
+    entries = {}
+    total_bytes = 0
+    for u in candidates:
+        if len(entries) >= REDIRECT_MAP_MAX_KEYS:
+            break
+        sid, url = u["shortId"], u["originalUrl"]
+        size = len(sid.encode("utf-8")) + len(url.encode("utf-8"))
+        if len(sid.encode("utf-8")) > KVS_MAX_KEY_BYTES or len(url.encode("utf-8")) > KVS_MAX_VALUE_BYTES:
+            continue
+        if total_bytes + size > REDIRECT_MAP_MAX_BYTES:
+            break
+        entries[sid] = url
+        total_bytes += size
+    return entries, len(candidates)
+
+
+def load_redirect_snapshot() -> dict | None:
+    if not (ANALYTICS_BUCKET and REDIRECT_MAP_SNAPSHOT_KEY):
+        return None
+    obj = _s3_get_json(ANALYTICS_BUCKET, REDIRECT_MAP_SNAPSHOT_KEY)
+    if isinstance(obj, dict) and obj.get("kvsArn") == REDIRECT_MAP_KVS_ARN and isinstance(obj.get("entries"), dict):
+        return obj["entries"]
+    return None
+
+
+def save_redirect_snapshot(entries: dict, now: datetime):
+    if not (ANALYTICS_BUCKET and REDIRECT_MAP_SNAPSHOT_KEY):
+        return
+    _s3_put_json(ANALYTICS_BUCKET, REDIRECT_MAP_SNAPSHOT_KEY, {
+        "kvsArn": REDIRECT_MAP_KVS_ARN,
+        "updatedAt": iso(now),
+        "keys": len(entries),
+        "entries": entries,
+    })
+
+
+def list_kvs_entries() -> dict:
+    entries = {}
+    kwargs = {"KvsARN": REDIRECT_MAP_KVS_ARN, "MaxResults": 50}
+    while True:
+        resp = kvs().list_keys(**kwargs)
+        for it in resp.get("Items", []):
+            entries[it["Key"]] = it["Value"]
+        token = resp.get("NextToken")
+        if not token:
+            return entries
+        kwargs["NextToken"] = token
+
+
+def run_redirect_map_job(full: bool = False) -> dict:
+    """
+    job=redirect_map: hot shortId 맵을 KVS에 증분 반영 (full=True면 KVS 현재 상태와 직접 비교)
+    """
+    if not (REDIRECT_MAP_ENABLED and REDIRECT_MAP_KVS_ARN):
+        return {"ok": False, "reason": "REDIRECT_MAP_DISABLED"}
+
+    t0 = time.time()
+    now = now_utc()
+    desired, candidates = build_redirect_map(now)
+
+    current = None if full else load_redirect_snapshot()
+    source = "snapshot"
+    if current is None:
+        current = list_kvs_entries()
+        source = "kvs"
+
+    # 삭제 먼저 (전체 크기 제한에 여유를 만들고 나서 추가)
+    ops = [("delete", sid, None) for sid in sorted(current) if sid not in desired]
+    ops += [("put", sid, url) for sid, url in desired.items() if current.get(sid) != url]
+
+    applied = dict(current)
+    batches = 0
+    error = None
+    try:
+        if ops:
+            etag = kvs().describe_key_value_store(KvsARN=REDIRECT_MAP_KVS_ARN)["ETag"]
+            for batch in chunked(ops, KVS_UPDATE_BATCH):
+                kwargs = {"KvsARN": REDIRECT_MAP_KVS_ARN, "IfMatch": etag}
+                puts = [{"Key": sid, "Value": url} for op, sid, url in batch if op == "put"]
+                deletes = [{"Key": sid} for op, sid, _ in batch if op == "delete"]
+                if puts:
+                    kwargs["Puts"] = puts
+                if deletes:
+                    kwargs["Deletes"] = deletes
+                etag = kvs().update_keys(**kwargs)["ETag"]
+                for op, sid, url in batch:
+                    if op == "put":
+                        applied[sid] = url
+                    else:
+                        applied.pop(sid, None)
+                batches += 1
+    except Exception as e:
+        # 반영된 배치까지만 스냅샷에 남김 -> 다음 실행에서 나머지를 다시 diff
+        error = str(e)
+        print(json.dumps({"type": "REDIRECT_MAP_UPDATE_ERROR", "error": error}, ensure_ascii=False))
+
+    if ops or source == "kvs":
+        save_redirect_snapshot(applied, now)
+
+    return {
+        "ok": error is None,
+        "candidates": candidates,
+        "keys": len(applied),
+        "bytes": sum(len(k.encode("utf-8")) + len(v.encode("utf-8")) for k, v in applied.items()),
+        "puts": sum(1 for op, _, _ in ops if op == "put"),
+        "deletes": sum(1 for op, _, _ in ops if op == "delete"),
+        "updateBatches": batches,
+        "baseline": source,
+        "error": error,
+        "elapsedMs": int((time.time() - t0) * 1000),
+    }
+
+
 def send_slack(text: str) -> bool:
     webhook_url = os.getenv("SLACK_WEBHOOK_URL", "").strip()
 
@@ -1347,12 +2833,10 @@ def iso_to_kst_display(ts_iso: str) -> str:
     """
     if not ts_iso:
         return "-"
-    try:
-        dt_utc = datetime.strptime(ts_iso, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-        dt_kst = dt_utc.astimezone(KST)
-        return dt_kst.strftime("%Y-%m-%d %H:%M:%S KST")
-    except Exception:
+    epoch = click_epoch(ts_iso)
+    if epoch is None:
         return ts_iso
+    return datetime.fromtimestamp(epoch, tz=KST).strftime("%Y-%m-%d %H:%M:%S KST")
     
 
 def load_alert_state() -> dict:
@@ -0,0 +1,467 @@
+import base64
+import gzip
+import json
+import os
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+
+import boto3
+
+# 엣지(CloudFront Function) 로그는 us-east-1에 쌓여서 그쪽에 같은 코드를 한 벌 더 배포
+# -> 테이블이 있는 리전을 DDB_REGION으로 지정
+dynamodb = boto3.resource("dynamodb", region_name=os.environ.get("DDB_REGION") or None)
+URLS_TABLE = os.environ.get("URLS_TABLE", "url-shortener-urls")
+CLICKS_TABLE = os.environ.get("CLICKS_TABLE", "url-shortener-clicks")
+ACTIVE_TABLE = os.environ.get("ACTIVE_TABLE", "url-shortener-active")
+
+urls_table = dynamodb.Table(URLS_TABLE)
+counters_table = dynamodb.Table(os.environ.get("COUNTERS_TABLE", "url-shortener-counters"))
+
+# 로그 구독(비동기 invoke) 경로에서 못 더한 clickCount delta를 넣는 큐
+# (함수의 on-failure destination과 같은 큐, 같은 리전. 없으면 로그만)
+CLICK_FAILURE_QUEUE_URL = os.environ.get("CLICK_FAILURE_QUEUE_URL", "")
+sqs = boto3.client("sqs")
+
+# redirect가 실어 보낸 counterShards > 1이면 counters 테이블 shard로 분산
+SHARDED_COUNTERS_ENABLED = os.environ.get("SHARDED_COUNTERS_ENABLED", "false").lower() == "true"
+
+# active 인덱스 (redirect와 같은 키 규칙: bucket="YYYY-MM-DDTHH#{shard}", SK shortId)
+ACTIVE_INDEX_ENABLED = os.environ.get("ACTIVE_INDEX_ENABLED", "false").lower() == "true"
+ACTIVE_INDEX_SHARDS = max(1, int(os.environ.get("ACTIVE_INDEX_SHARDS", "4")))
+ACTIVE_INDEX_RETENTION_DAYS = int(os.environ.get("ACTIVE_INDEX_RETENTION_DAYS", "15"))
+ACTIVE_TOUCH_CACHE_MAX = 50000
+
+# 컨테이너가 이미 기록한 (bucket, shortId)
+_active_touched = set()
+
+# CloudWatch Logs 구독(awslogs)으로 들어오는 "redirect handled" 줄 중 클릭으로 볼 것
+# - redirect Lambda CLICK_INGEST_MODE=log (clickIngestMode="log")
+# - 엣지 리다이렉트 CloudFront Function (source="edge")
+CLICK_LOG_MESSAGE = "redirect handled"
+
+# 클릭에 device(UA 분류 결과)를 같이 저장 (redirect가 이미 실어 보냈으면 그대로)
+CLICK_STORE_DEVICE = os.environ.get("CLICK_STORE_DEVICE", "false").lower() == "true"
+UA_CACHE_SIZE = int(os.environ.get("UA_CACHE_SIZE", "4096"))
+BOT_UA_PAT = re.compile(r"(bot|spider|crawler|headless|python-requests|curl|wget)", re.I)
+DEVICE_PATTERNS = {
+    "mobile": re.compile(r"(iphone|ipod|android.*mobile|windows phone|blackberry|opera mini)", re.I),
+    "tablet": re.compile(r"(ipad|android(?!.*mobile)|tablet)", re.I),
+    "desktop": re.compile(r"(windows nt|macintosh|x11|linux)", re.I),
+}
+
+# BatchWriteItem은 요청당 최대 25건
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get("BATCH_WRITE_MAX_RETRIES", "5"))
+BATCH_WRITE_BASE_DELAY_SEC = float(os.environ.get("BATCH_WRITE_BASE_DELAY_SEC", "0.05"))
+
+
+def lambda_handler(event, context):
+    """
+    SQS -> click_ingest
+    - redirect Lambda(CLICK_INGEST_MODE=sqs)가 보낸 클릭 이벤트를 배치로 적재
+    - clicks 테이블: BatchWriteItem 25건 단위 (UnprocessedItems 재시도)
+    - urls 테이블: shortId별 clickCount 증가를 배치당 ADD 1회로 합침
+    - 실패한 레코드만 batchItemFailures로 돌려서 재시도 (ReportBatchItemFailures)
+    - Kinesis는 받지 않음: 부분 실패 시 실패 지점 이후 레코드가 전부 다시 와서
+      이미 ADD한 clickCount가 두 번 더해짐 (SQS는 실패한 메시지만 다시 옴)
+    """
+    if "awslogs" in event:
+        return ingest_log_events(event, context)
+
+    start = time.time()
+    records = event.get("Records") or []
+    if any("kinesis" in r for r in records):
+        raise ValueError("click_ingest supports SQS records only (kinesis batchItemFailures would double count clickCount)")
+
+    clicks = []   # (recordId, click_item)
+    counter_shards = {}   # shortId -> counterShards
+    skipped = 0
+    for record in records:
+        record_id = record.get("messageId")
+        try:
+            click_item, shards = parse_click(record.get("body"))
+            clicks.append((record_id, click_item))
+            counter_shards[click_item["shortId"]] = max(shards, counter_shards.get(click_item["shortId"], 1))
+        except Exception as e:
+            # 파싱 불가 레코드는 재시도해도 똑같이 실패 -> 로그만 남기고 버림
+            skipped += 1
+            log_json("WARN", "click ingest invalid record", recordId=record_id, errorMessage=str(e))
+
+    failed_ids = set()
+
+    # 1) clicks 테이블 BatchWriteItem
+    #    같은 (shortId, timestamp) 키가 한 요청에 두 번 들어가면 ValidationException이라 키 기준으로 합침
+    #    (단건 put_item도 같은 키면 덮어쓰므로 결과는 동일)
+    by_key = {}
+    for record_id, it in clicks:
+        by_key[(it["shortId"], it["timestamp"])] = it
+
+    unprocessed_keys = batch_write_clicks(list(by_key.values()))
+    for record_id, it in clicks:
+        if (it["shortId"], it["timestamp"]) in unprocessed_keys:
+            failed_ids.add(record_id)
+
+    # 2) clickCount: 기록에 성공한 클릭만 shortId별로 합산해서 ADD 1회
+    counts = Counter(it["shortId"] for record_id, it in clicks if record_id not in failed_ids)
+    counter_failures = 0
+    for short_id, n in counts.items():
+        try:
+            add_click_count(short_id, n, counter_shards.get(short_id, 1))
+        except Exception as e:
+            counter_failures += 1
+            # 해당 shortId 레코드만 재시도 (클릭 put은 같은 키라 멱등)
+            for record_id, it in clicks:
+                if it["shortId"] == short_id:
+                    failed_ids.add(record_id)
+            log_json(
+                "ERROR",
+                "click ingest counter update failed",
+                shortId=short_id,
+                clicks=n,
+                errorType=type(e).__name__,
+                errorMessage=str(e),
+            )
+
+    # 3) active 인덱스: 기록에 성공한 클릭의 (시간 버킷, shortId)
+    #    인덱스 누락은 클릭 자체 재시도 사유가 아님 -> 실패는 로그만
+    active_touched = 0
+    if ACTIVE_INDEX_ENABLED:
+        pairs = {
+            (active_bucket(it["shortId"], it["timestamp"]), it["shortId"])
+            for record_id, it in clicks
+            if record_id not in failed_ids
+        }
+        try:
+            active_touched = touch_active(pairs)
+        except Exception as e:
+            log_json("WARN", "click ingest active index update failed", errorMessage=str(e))
+
+    log_json(
+        "INFO",
+        "click ingest handled",
+        requestId=getattr(context, "aws_request_id", None),
+        records=len(records),
+        clicks=len(clicks),
+        uniqueClickKeys=len(by_key),
+        shortIds=len(counts),
+        batchWrites=(len(by_key) + BATCH_WRITE_SIZE - 1) // BATCH_WRITE_SIZE,
+        counterUpdates=len(counts),
+        skipped=skipped,
+        unprocessedClicks=len(unprocessed_keys),
+        counterFailures=counter_failures,
+        activeTouched=active_touched,
+        failed=len(failed_ids),
+        latencyMs=int((time.time() - start) * 1000),
+    )
+    return {"batchItemFailures": [{"itemIdentifier": rid} for rid in sorted(failed_ids)]}
+
+
+def ingest_log_events(event, context):
+    """
+    CloudWatch Logs 구독 필터 -> click_ingest (awslogs.data = base64(gzip(JSON)))
+    - 로그 줄 -> click item (SQS 경로와 같은 모양), 이후 적재는 SQS 경로와 동일
+    - 부분 실패 응답이 없는 비동기 호출이라:
+      clicks 쓰기가 끝까지 실패하면 예외 -> Lambda 재시도 (clicks put은 같은 키라 멱등, 카운터는 아직 안 더함)
+      재시도까지 실패한 이벤트는 on-failure destination(SQS)으로
+      카운터 실패는 예외로 올리지 않고 delta를 CLICK_FAILURE_QUEUE_URL로 (재시도하면 이미 더한 shortId가 중복 집계됨)
+      active 실패는 로그만
+    """
+    start = time.time()
+    payload = decode_awslogs(event)
+    if payload.get("messageType") != "DATA_MESSAGE":
+        # 구독 필터 생성 시 보내는 CONTROL_MESSAGE
+        return {"ok": True, "clicks": 0}
+
+    log_events = payload.get("logEvents") or []
+    clicks = []
+    counter_shards = {}
+    skipped = 0
+    for log_event in log_events:
+        try:
+            parsed = parse_log_click(log_event.get("message") or "", log_event.get("timestamp"))
+        except Exception as e:
+            skipped += 1
+            log_json("WARN", "click ingest invalid log event", logEventId=log_event.get("id"), errorMessage=str(e))
+            continue
+        if not parsed:
+            skipped += 1
+            continue
+        click_item, shards = parsed
+        clicks.append(click_item)
+        counter_shards[click_item["shortId"]] = max(shards, counter_shards.get(click_item["shortId"], 1))
+
+    by_key = {}
+    for it in clicks:
+        by_key[(it["shortId"], it["timestamp"])] = it
+
+    unprocessed_keys = batch_write_clicks(list(by_key.values()))
+    if unprocessed_keys:
+        raise RuntimeError(f"clicks unprocessed after retries: {len(unprocessed_keys)}")
+
+    counts = Counter(it["shortId"] for it in clicks)
+    failed_deltas = []
+    for short_id, n in counts.items():
+        try:
+            add_click_count(short_id, n, counter_shards.get(short_id, 1))
+        except Exception as e:
+            failed_deltas.append({
+                "type": "clickCountDelta",
+                "shortId": short_id,
+                "clicks": n,
+                "counterShards": counter_shards.get(short_id, 1),
+                "logGroup": payload.get("logGroup"),
+                "errorType": type(e).__name__,
+                "errorMessage": str(e),
+            })
+    counter_failures = len(failed_deltas)
+    if failed_deltas:
+        send_failed_deltas(failed_deltas)
+
+    active_touched = 0
+    if ACTIVE_INDEX_ENABLED and clicks:
+        pairs = {(active_bucket(it["shortId"], it["timestamp"]), it["shortId"]) for it in clicks}
+        try:
+            active_touched = touch_active(pairs)
+        except Exception as e:
+            log_json("WARN", "click ingest active index update failed", errorMessage=str(e))
+
+    log_json(
+        "INFO",
+        "click ingest handled",
+        requestId=getattr(context, "aws_request_id", None),
+        source="awslogs",
+        logGroup=payload.get("logGroup"),
+        logEvents=len(log_events),
+        clicks=len(clicks),
+        uniqueClickKeys=len(by_key),
+        shortIds=len(counts),
+        batchWrites=(len(by_key) + BATCH_WRITE_SIZE - 1) // BATCH_WRITE_SIZE,
+        counterUpdates=len(counts),
+        skipped=skipped,
+        counterFailures=counter_failures,
+        activeTouched=active_touched,
+        latencyMs=int((time.time() - start) * 1000),
+    )
+    return {"ok": True, "clicks": len(clicks)}
+
+
+# ---------------- helpers ----------------
+
+def send_failed_deltas(deltas: list[dict]):
+    """
+    못 더한 clickCount delta -> CLICK_FAILURE_QUEUE_URL (10건씩 SendMessageBatch)
+    delta는 전부 ERROR 로그로도 남김 (queued=false면 큐에도 못 넣은 것 -> 로그 값으로 수동 보정)
+    """
+    unsent = list(deltas)
+    if CLICK_FAILURE_QUEUE_URL:
+        unsent = []
+        for start in range(0, len(deltas), 10):
+            chunk = deltas[start:start + 10]
+            try:
+                resp = sqs.send_message_batch(
+                    QueueUrl=CLICK_FAILURE_QUEUE_URL,
+                    Entries=[{"Id": str(i), "MessageBody": json.dumps(d, ensure_ascii=False)} for i, d in enumerate(chunk)],
+                )
+                unsent.extend(chunk[int(f["Id"])] for f in resp.get("Failed") or [])
+            except Exception as e:
+                log_json("WARN", "click ingest failed delta send error", errorMessage=str(e))
+                unsent.extend(chunk)
+
+    for d in deltas:
+        log_json(
+            "ERROR",
+            "click ingest counter update failed",
+            shortId=d["shortId"],
+            clicks=d["clicks"],
+            errorType=d["errorType"],
+            errorMessage=d["errorMessage"],
+            queued=d not in unsent,
+        )
+
+
+def decode_awslogs(event: dict) -> dict:
+    data = (event.get("awslogs") or {}).get("data") or ""
+    return json.loads(gzip.decompress(base64.b64decode(data)).decode("utf-8"))
+
+
+def parse_log_click(message: str, log_ts_ms=None):
+    """
+    "redirect handled" 로그 줄 -> (click_item, counterShards), 클릭이 아닌 줄은 None.
+    - Lambda: 줄 전체가 JSON
+    - CloudFront Function: "{distributionId}\t{requestId}\t{JSON}" 처럼 앞에 필드가 붙음 -> 첫 "{"부터 파싱
+    timestamp가 없으면 로그 이벤트 시각(ms)으로.
+    """
+    start = message.find("{")
+    if start < 0:
+        return None
+    obj = json.loads(message[start:])
+    if not isinstance(obj, dict) or obj.get("message") != CLICK_LOG_MESSAGE:
+        return None
+    # sync/async/sqs 모드 줄은 이미 다른 경로로 적재됨 -> 중복 집계 방지
+    if obj.get("clickIngestMode") != "log" and obj.get("source") != "edge":
+        return None
+
+    ts = obj.get("timestamp")
+    if not ts and log_ts_ms is not None:
+        ts = datetime.fromtimestamp(int(log_ts_ms) / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return parse_click({
+        "shortId": obj.get("shortId"),
+        "timestamp": ts,
+        "ip": obj.get("ipHash"),
+        "userAgent": obj.get("userAgent"),
+        "referer": obj.get("referer"),
+        "counterShards": obj.get("counterShards"),
+    })
+
+
+def parse_click(body):
+    """returns: (click_item, counterShards)"""
+    obj = json.loads(body) if isinstance(body, str) else body
+    if not isinstance(obj, dict):
+        raise ValueError("click body must be a JSON object")
+
+    short_id = obj.get("shortId")
+    ts = obj.get("timestamp")
+    if not short_id or not ts:
+        raise ValueError("shortId/timestamp missing")
+
+    click_item = {
+        "shortId": str(short_id),
+        "timestamp": str(ts),
+        "ip": str(obj.get("ip") or "unknown"),
+        "userAgent": str(obj.get("userAgent") or ""),
+        "referer": str(obj.get("referer") or "direct"),
+    }
+    if obj.get("device"):
+        click_item["device"] = str(obj["device"])
+    elif CLICK_STORE_DEVICE:
+        click_item["device"] = classify_ua(click_item["userAgent"])[0]
+    try:
+        shards = max(1, int(obj.get("counterShards") or 1))
+    except (TypeError, ValueError):
+        shards = 1
+    return click_item, shards
+
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def classify_ua(user_agent: str) -> tuple[str, bool]:
+    """UA -> (device, isBot). analyze classify_ua와 같은 규칙 (패턴 바꾸면 같이 바꿀 것)"""
+    ua = user_agent.strip()
+    if not ua:
+        return "unknown", False
+    if BOT_UA_PAT.search(ua):
+        return "bot", True
+    if DEVICE_PATTERNS["tablet"].search(ua):
+        return "tablet", False
+    if DEVICE_PATTERNS["mobile"].search(ua):
+        return "mobile", False
+    if DEVICE_PATTERNS["desktop"].search(ua):
+        return "desktop", False
+    return "other", False
+
+
+def batch_write_clicks(items: list[dict]) -> set:
+    """
+    clicks 테이블에 25건씩 BatchWriteItem.
+    UnprocessedItems는 지수 백오프(+jitter)로 재시도, 끝까지 남은 건 키 set으로 반환.
+    """
+    unprocessed_keys = set()
+
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        requests = [{"PutRequest": {"Item": it}} for it in items[start:start + BATCH_WRITE_SIZE]]
+
+        attempt = 0
+        while requests:
+            try:
+                resp = dynamodb.batch_write_item(RequestItems={CLICKS_TABLE: requests})
+                requests = (resp.get("UnprocessedItems") or {}).get(CLICKS_TABLE) or []
+            except Exception as e:
+                log_json("WARN", "click ingest batch write error", attempt=attempt, errorMessage=str(e))
+
+            if not requests:
+                break
+            attempt += 1
+            if attempt > BATCH_WRITE_MAX_RETRIES:
+                for req in requests:
+                    it = req["PutRequest"]["Item"]
+                    unprocessed_keys.add((it["shortId"], it["timestamp"]))
+                break
+            time.sleep(BATCH_WRITE_BASE_DELAY_SEC * (2 ** (attempt - 1)) * (1 + random.random()))
+
+    return unprocessed_keys
+
+
+def active_bucket(short_id: str, ts_iso: str) -> str:
+    return f"{ts_iso[:13]}#{zlib.crc32(short_id.encode('utf-8')) % ACTIVE_INDEX_SHARDS}"
+
+
+def touch_active(pairs: set) -> int:
+    """
+    (bucket, shortId) 중 이 컨테이너가 아직 안 쓴 것만 active 테이블에 BatchWriteItem.
+    returns: 기록한 아이템 수
+    """
+    new_pairs = sorted(pairs - _active_touched)
+    if not new_pairs:
+        return 0
+    if len(_active_touched) + len(new_pairs) > ACTIVE_TOUCH_CACHE_MAX:
+        _active_touched.clear()
+
+    written = 0
+    for start in range(0, len(new_pairs), BATCH_WRITE_SIZE):
+        chunk = new_pairs[start:start + BATCH_WRITE_SIZE]
+        requests = []
+        for bucket, short_id in chunk:
+            hour_start = datetime.strptime(bucket[:13], "%Y-%m-%dT%H").replace(tzinfo=timezone.utc)
+            requests.append({"PutRequest": {"Item": {
+                "bucket": bucket,
+                "shortId": short_id,
+                "expiresAt": int(hour_start.timestamp()) + 3600 + ACTIVE_INDEX_RETENTION_DAYS * 86400,
+            }}})
+
+        attempt = 0
+        while requests:
+            resp = dynamodb.batch_write_item(RequestItems={ACTIVE_TABLE: requests})
+            requests = (resp.get("UnprocessedItems") or {}).get(ACTIVE_TABLE) or []
+            if not requests:
+                break
+            attempt += 1
+            if attempt > BATCH_WRITE_MAX_RETRIES:
+                raise RuntimeError(f"active index unprocessed items: {len(requests)}")
+            time.sleep(BATCH_WRITE_BASE_DELAY_SEC * (2 ** (attempt - 1)) * (1 + random.random()))
+
+        _active_touched.update(chunk)
+        written += len(chunk)
+
+    return written
+
+
+def add_click_count(short_id: str, n: int, counter_shards: int = 1):
+    if SHARDED_COUNTERS_ENABLED and counter_shards > 1:
+        counters_table.update_item(
+            Key={"counterKey": f"{short_id}#{random.randrange(counter_shards)}"},
+            UpdateExpression="ADD clickCount :n",
+            ExpressionAttributeValues={":n": Decimal(n)},
+        )
+        return
+
+    urls_table.update_item(
+        Key={"shortId": short_id},
+        UpdateExpression="ADD clickCount :n",
+        ExpressionAttributeValues={":n": Decimal(n)},
+    )
+
+
+def log_json(level, message, **kwargs):
+    log_obj = {
+        "level": level,
+        "message": message,
+        **kwargs,
+    }
+    print(json.dumps(log_obj, ensure_ascii=False))
@@ -1,25 +1,107 @@
 import json
 import os
 import hashlib
+import queue
+import random
+import re
+import threading
 import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timezone
+from functools import lru_cache
 from decimal import Decimal
 
 
 import boto3
 
 dynamodb = boto3.resource("dynamodb")
-urls_table = dynamodb.Table(os.environ.get("URLS_TABLE", "url-shortener-urls"))
-clicks_table = dynamodb.Table(os.environ.get("CLICKS_TABLE", "url-shortener-clicks"))
+URLS_TABLE = os.environ.get("URLS_TABLE", "url-shortener-urls")
+CLICKS_TABLE = os.environ.get("CLICKS_TABLE", "url-shortener-clicks")
+COUNTERS_TABLE = os.environ.get("COUNTERS_TABLE", "url-shortener-counters")
+ACTIVE_TABLE = os.environ.get("ACTIVE_TABLE", "url-shortener-active")
+urls_table = dynamodb.Table(URLS_TABLE)
+sqs = boto3.client("sqs")
+
+# boto3 resource는 thread-safe가 아님 -> 클릭 적재 worker thread는 자기 resource를 따로 씀
+_ddb_local = threading.local()
+
+
+def ddb():
+    if threading.current_thread() is threading.main_thread():
+        return dynamodb
+    res = getattr(_ddb_local, "resource", None)
+    if res is None:
+        res = boto3.session.Session().resource("dynamodb")
+        _ddb_local.resource = res
+    return res
+
 
 # Redirect code: 301(영구) or 302(임시)
 REDIRECT_STATUS = int(os.environ.get("REDIRECT_STATUS", "301"))
 
+# Warm container 캐시 (shortId -> originalUrl)
+# - 같은 컨테이너로 들어오는 인기 링크는 DynamoDB 조회 없이 바로 리다이렉트
+# - 404도 짧게 캐시(negative cache)해서 없는 shortId 반복 조회 방지
+URL_CACHE_ENABLED = os.environ.get("URL_CACHE_ENABLED", "true").lower() == "true"
+URL_CACHE_MAX_ENTRIES = int(os.environ.get("URL_CACHE_MAX_ENTRIES", "5000"))
+URL_CACHE_MAX_BYTES = int(os.environ.get("URL_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))  # 8MB
+URL_CACHE_TTL_SEC = int(os.environ.get("URL_CACHE_TTL_SEC", "300"))
+URL_CACHE_NEGATIVE_TTL_SEC = int(os.environ.get("URL_CACHE_NEGATIVE_TTL_SEC", "30"))
+
+# shortId -> (expiresAtMonotonic, originalUrl | None, sizeBytes), 오래된 순서 -> 최근 사용 순서
+_url_cache = OrderedDict()
+_url_cache_bytes = 0
+_url_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# 엔트리당 dict/tuple 오버헤드 대략치 (정확한 값보다 상한 제어가 목적)
+_CACHE_ENTRY_OVERHEAD = 200
+
+# 클릭 적재 방식
+# - sync  : 기존 방식. 리다이렉트 전에 clicks put_item + clickCount update_item
+# - async : 메모리 버퍼에 넣고 바로 리턴, 백그라운드 스레드가 DynamoDB에 기록
+# - sqs   : 메모리 버퍼 -> 백그라운드 스레드가 SQS로 배치 전송 -> click_ingest Lambda가 기록
+# - log   : DynamoDB/SQS 호출 없음. "redirect handled" 로그 한 줄(timestamp 포함)이 곧 클릭
+#           -> CloudWatch Logs 구독 필터 -> click_ingest Lambda가 배치로 기록
+# async/sqs는 컨테이너가 회수되기 직전 버퍼에 남은 클릭은 유실될 수 있음 (리다이렉트 지연과 맞바꾼 것)
+CLICK_INGEST_MODE = os.environ.get("CLICK_INGEST_MODE", "sync").lower()
+CLICK_QUEUE_URL = os.environ.get("CLICK_QUEUE_URL", "")
+CLICK_BUFFER_MAX = int(os.environ.get("CLICK_BUFFER_MAX", "10000"))
+CLICK_FLUSH_BATCH = int(os.environ.get("CLICK_FLUSH_BATCH", "10"))  # SQS SendMessageBatch 최대 10
+
+# hot shortId의 clickCount를 counters 테이블 shard로 분산 (urls.counterShards > 1인 경우만)
+SHARDED_COUNTERS_ENABLED = os.environ.get("SHARDED_COUNTERS_ENABLED", "false").lower() == "true"
+
+# analyze job이 "이번 window에 클릭이 있었던 shortId"만 보도록 active 인덱스에 기록
+# - PK bucket = "YYYY-MM-DDTHH#{shard}" (UTC 시간 버킷), SK shortId
+# - 컨테이너마다 (bucket, shortId)당 한 번만 put (같은 시간대 반복 클릭은 스킵)
+ACTIVE_INDEX_ENABLED = os.environ.get("ACTIVE_INDEX_ENABLED", "false").lower() == "true"
+ACTIVE_INDEX_SHARDS = max(1, int(os.environ.get("ACTIVE_INDEX_SHARDS", "4")))
+ACTIVE_INDEX_RETENTION_DAYS = int(os.environ.get("ACTIVE_INDEX_RETENTION_DAYS", "15"))
+ACTIVE_TOUCH_CACHE_MAX = 50000
+
+# 클릭에 device(UA 분류 결과)를 같이 저장 -> analyze 집계/export에서 다시 분류하지 않음
+CLICK_STORE_DEVICE = os.environ.get("CLICK_STORE_DEVICE", "false").lower() == "true"
+UA_CACHE_SIZE = int(os.environ.get("UA_CACHE_SIZE", "1024"))
+BOT_UA_PAT = re.compile(r"(bot|spider|crawler|headless|python-requests|curl|wget)", re.I)
+DEVICE_PATTERNS = {
+    "mobile": re.compile(r"(iphone|ipod|android.*mobile|windows phone|blackberry|opera mini)", re.I),
+    "tablet": re.compile(r"(ipad|android(?!.*mobile)|tablet)", re.I),
+    "desktop": re.compile(r"(windows nt|macintosh|x11|linux)", re.I),
+}
+
+_active_touched = set()
+_active_touched_lock = threading.Lock()
+
+_click_buffer = queue.Queue(maxsize=CLICK_BUFFER_MAX)
+_click_worker = None
+_click_worker_lock = threading.Lock()
+
 
 def lambda_handler(event, context):
     """
     GET /{shortId}
-    - urls 테이블에서 원본 조회
+    - urls 테이블에서 원본 조회 (warm container LRU 캐시 우선)
     - clicks 테이블에 클릭 로그 저장
     - urls 테이블 clickCount 증가
     - 301/302 Redirect
@@ -62,10 +144,26 @@ def lambda_handler(event, context):
             )
             return json_response(400, {"error": "Short ID is required"})
 
-        # 1) 원본 URL 조회
-        resp = urls_table.get_item(Key={"shortId": short_id})
-        item = resp.get("Item")
-        if not item:
+        # 1) 원본 URL 조회 (warm container 캐시 -> DynamoDB)
+        cache_hit, original_url, counter_shards = url_cache_get(short_id)
+        found = cache_hit and bool(original_url)
+        if not cache_hit:
+            resp = urls_table.get_item(Key={"shortId": short_id})
+            item = resp.get("Item")
+            found = bool(item)
+            original_url = item.get("originalUrl") if item else None
+            counter_shards = int(item.get("counterShards", 1)) if item else 1
+            if not item:
+                url_cache_put(short_id, None)
+            elif original_url:
+                url_cache_put(
+                    short_id,
+                    original_url,
+                    counter_shards=counter_shards,
+                    expires_at=item.get("expiresAt"),
+                )
+
+        if not found:
             latency_ms = int((time.time() - start) * 1000)
             log_json(
                 "WARN",
@@ -80,10 +178,11 @@ def lambda_handler(event, context):
                 route=route,
                 method=method,
                 path=path,
+                cacheHit=cache_hit,
+                **url_cache_log_fields(),
             )
             return json_response(404, {"error": "URL not found"})
 
-        original_url = item.get("originalUrl")
         if not original_url:
             latency_ms = int((time.time() - start) * 1000)
             log_json(
@@ -102,22 +201,16 @@ def lambda_handler(event, context):
             )
             return json_response(500, {"error": "Invalid data: originalUrl missing"})
         # 2) 클릭 로그 + 카운트 증가 (실패해도 리다이렉트는 되게)
-        try:
-            log_click(short_id, event)
-        except Exception as e:
-            print("Failed to log click:", str(e))
+        #    - sync : 여기서 바로 DynamoDB 2회 (put_item + update_item)
+        #    - async/sqs : 버퍼에 넣기만 하고 바로 리다이렉트 (백그라운드 스레드가 처리)
+        click_start = time.time()
+        ingest_mode = record_click(short_id, event, counter_shards)
+        click_ingest_ms = int((time.time() - click_start) * 1000)
 
-        try:
-            urls_table.update_item(
-                Key={"shortId": short_id},
-                UpdateExpression="SET clickCount = if_not_exists(clickCount, :zero) + :inc",
-                ExpressionAttributeValues={
-                    ":zero": Decimal(0),
-                    ":inc": Decimal(1),
-                },
-            )
-        except Exception as e:
-            print("Failed to update clickCount:", str(e))
+        # log 모드: 아래 로그 줄을 click_ingest가 클릭으로 적재 (click item과 같은 timestamp 형식)
+        click_log_fields = {}
+        if ingest_mode == "log":
+            click_log_fields = {"timestamp": click_timestamp(), "counterShards": counter_shards}
 
         # 3) Redirect
         latency_ms = int((time.time() - start) * 1000)
@@ -134,6 +227,11 @@ def lambda_handler(event, context):
             route=route,
             method=method,
             path=path,
+            cacheHit=cache_hit,
+            **url_cache_log_fields(),
+            clickIngestMode=ingest_mode,
+            clickIngestMs=click_ingest_ms,
+            **click_log_fields,
         )
         return {
             "statusCode": REDIRECT_STATUS,
@@ -181,7 +279,249 @@ def extract_short_id(event) -> str | None:
     return None
 
 
-def log_click(short_id: str, event: dict):
+def url_cache_get(short_id: str):
+    """
+    returns: (hit, originalUrl, counterShards)
+    - hit=True, originalUrl=None  -> 404 negative cache
+    - hit=False                   -> DynamoDB 조회 필요
+    """
+    global _url_cache_bytes
+
+    if not URL_CACHE_ENABLED:
+        return False, None, 1
+
+    entry = _url_cache.get(short_id)
+    if entry is None:
+        _url_cache_stats["misses"] += 1
+        return False, None, 1
+
+    expires_at, original_url, counter_shards, size = entry
+    if expires_at <= time.monotonic():
+        # 만료 -> 제거 후 miss 처리
+        del _url_cache[short_id]
+        _url_cache_bytes -= size
+        _url_cache_stats["misses"] += 1
+        return False, None, 1
+
+    _url_cache.move_to_end(short_id)
+    _url_cache_stats["hits"] += 1
+    return True, original_url, counter_shards
+
+
+def url_cache_put(short_id: str, original_url: str | None, counter_shards: int = 1, expires_at=None):
+    global _url_cache_bytes
+
+    if not URL_CACHE_ENABLED or URL_CACHE_MAX_ENTRIES <= 0:
+        return
+
+    ttl = URL_CACHE_TTL_SEC if original_url else URL_CACHE_NEGATIVE_TTL_SEC
+    if ttl <= 0:
+        return
+
+    # urls 테이블 TTL(expiresAt, epoch sec)이 있으면 그 이후로는 캐시하지 않음
+    if expires_at is not None:
+        try:
+            ttl = min(ttl, int(expires_at) - int(time.time()))
+        except Exception:
+            pass
+        if ttl <= 0:
+            return
+
+    size = len(short_id) + len(original_url or "") + _CACHE_ENTRY_OVERHEAD
+    if size > URL_CACHE_MAX_BYTES:
+        return
+
+    old = _url_cache.pop(short_id, None)
+    if old is not None:
+        _url_cache_bytes -= old[3]
+
+    _url_cache[short_id] = (time.monotonic() + ttl, original_url, counter_shards, size)
+    _url_cache_bytes += size
+
+    # LRU eviction: 엔트리 수/바이트 상한 둘 다 지키도록
+    while _url_cache and (
+        len(_url_cache) > URL_CACHE_MAX_ENTRIES or _url_cache_bytes > URL_CACHE_MAX_BYTES
+    ):
+        _, (_, _, _, evicted_size) = _url_cache.popitem(last=False)
+        _url_cache_bytes -= evicted_size
+        _url_cache_stats["evictions"] += 1
+
+
+def url_cache_log_fields() -> dict:
+    # 컨테이너 누적값 (Logs Insights에서 컨테이너별 hit ratio 확인용)
+    return {
+        "cacheHits": _url_cache_stats["hits"],
+        "cacheMisses": _url_cache_stats["misses"],
+        "cacheEvictions": _url_cache_stats["evictions"],
+        "cacheEntries": len(_url_cache),
+        "cacheBytes": _url_cache_bytes,
+    }
+
+
+def record_click(short_id: str, event: dict, counter_shards: int = 1) -> str:
+    """
+    CLICK_INGEST_MODE에 따라 클릭 1건을 적재하고 실제 사용한 모드를 반환.
+    버퍼가 가득 찼거나 SQS 설정이 없으면 sync로 fallback.
+    """
+    mode = CLICK_INGEST_MODE
+    if mode == "log":
+        # 여기서는 아무것도 안 씀 ("redirect handled" 로그 줄이 클릭 이벤트)
+        return mode
+    if mode == "sqs" and not CLICK_QUEUE_URL:
+        mode = "sync"
+
+    click_item = build_click_item(short_id, event)
+    if counter_shards > 1:
+        # 버퍼/SQS 메시지에만 실림 (clicks 테이블에는 저장하지 않음)
+        click_item["counterShards"] = counter_shards
+
+    if mode in ("async", "sqs"):
+        try:
+            _click_buffer.put_nowait(click_item)
+            ensure_click_worker()
+            return mode
+        except queue.Full:
+            print("Click buffer full, falling back to sync write")
+        except Exception as e:
+            print("Failed to enqueue click:", str(e))
+
+    write_click(click_item)
+    return "sync"
+
+
+def write_click(click_item: dict):
+    # 클릭 로그 + 카운트 증가 (각각 실패해도 나머지는 진행)
+    # sync 모드는 main thread, async/sqs(전송 실패분)는 worker thread에서 호출 -> ddb()
+    click_item = dict(click_item)
+    counter_shards = int(click_item.pop("counterShards", 1))
+
+    try:
+        ddb().Table(CLICKS_TABLE).put_item(Item=click_item)
+    except Exception as e:
+        print("Failed to log click:", str(e))
+
+    try:
+        increment_click_count(click_item["shortId"], counter_shards)
+    except Exception as e:
+        print("Failed to update clickCount:", str(e))
+
+    try:
+        touch_active(click_item["shortId"], click_item["timestamp"])
+    except Exception as e:
+        print("Failed to touch active index:", str(e))
+
+
+def active_bucket(short_id: str, ts_iso: str) -> str:
+    # shard는 shortId 해시로 고정 -> 같은 시간대 같은 shortId는 항상 같은 아이템
+    return f"{ts_iso[:13]}#{zlib.crc32(short_id.encode('utf-8')) % ACTIVE_INDEX_SHARDS}"
+
+
+def touch_active(short_id: str, ts_iso: str):
+    if not ACTIVE_INDEX_ENABLED:
+        return
+
+    bucket = active_bucket(short_id, ts_iso)
+    with _active_touched_lock:
+        if (bucket, short_id) in _active_touched:
+            return
+        if len(_active_touched) >= ACTIVE_TOUCH_CACHE_MAX:
+            _active_touched.clear()
+
+    hour_start = datetime.strptime(ts_iso[:13], "%Y-%m-%dT%H").replace(tzinfo=timezone.utc)
+    ddb().Table(ACTIVE_TABLE).put_item(Item={
+        "bucket": bucket,
+        "shortId": short_id,
+        "expiresAt": int(hour_start.timestamp()) + 3600 + ACTIVE_INDEX_RETENTION_DAYS * 86400,
+    })
+
+    with _active_touched_lock:
+        _active_touched.add((bucket, short_id))
+
+
+def increment_click_count(short_id: str, counter_shards: int = 1):
+    """
+    - 기본: urls 아이템의 clickCount를 바로 +1
+    - counterShards > 1 (analyze가 hot shortId로 판단해 fan-out 한 경우):
+      counters 테이블의 "{shortId}#{n}" 중 랜덤 shard에 +1 -> 한 파티션에 쓰기가 몰리지 않게
+      (읽을 때는 urls.clickCount + 모든 shard 합산)
+    """
+    if SHARDED_COUNTERS_ENABLED and counter_shards > 1:
+        ddb().Table(COUNTERS_TABLE).update_item(
+            Key={"counterKey": f"{short_id}#{random.randrange(counter_shards)}"},
+            UpdateExpression="ADD clickCount :inc",
+            ExpressionAttributeValues={":inc": Decimal(1)},
+        )
+        return
+
+    ddb().Table(URLS_TABLE).update_item(
+        Key={"shortId": short_id},
+        UpdateExpression="SET clickCount = if_not_exists(clickCount, :zero) + :inc",
+        ExpressionAttributeValues={
+            ":zero": Decimal(0),
+            ":inc": Decimal(1),
+        },
+    )
+
+
+def ensure_click_worker():
+    global _click_worker
+    if _click_worker is not None and _click_worker.is_alive():
+        return
+    with _click_worker_lock:
+        if _click_worker is None or not _click_worker.is_alive():
+            _click_worker = threading.Thread(target=_click_worker_loop, name="click-ingest", daemon=True)
+            _click_worker.start()
+
+
+def _click_worker_loop():
+    # Lambda는 응답 후 프로세스를 freeze -> 다음 invocation 때 이어서 flush됨
+    while True:
+        batch = [_click_buffer.get()]
+        while len(batch) < CLICK_FLUSH_BATCH:
+            try:
+                batch.append(_click_buffer.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            flush_clicks(batch)
+        except Exception as e:
+            print("Failed to flush clicks:", str(e))
+        finally:
+            for _ in batch:
+                _click_buffer.task_done()
+
+
+def flush_clicks(batch: list[dict]):
+    if CLICK_INGEST_MODE == "sqs" and CLICK_QUEUE_URL:
+        unsent = []
+        # SendMessageBatch는 요청당 최대 10건
+        for start in range(0, len(batch), 10):
+            chunk = batch[start:start + 10]
+            try:
+                resp = sqs.send_message_batch(
+                    QueueUrl=CLICK_QUEUE_URL,
+                    Entries=[
+                        {"Id": str(i), "MessageBody": json.dumps(it, ensure_ascii=False)}
+                        for i, it in enumerate(chunk)
+                    ],
+                )
+                unsent.extend(chunk[int(f["Id"])] for f in (resp.get("Failed") or []))
+            except Exception as e:
+                print("Failed to send clicks to SQS:", str(e))
+                unsent.extend(chunk)
+
+        if not unsent:
+            return
+        # SQS 전송 실패분은 직접 기록 (유실 방지)
+        print("SQS send failed for", len(unsent), "clicks, writing directly")
+        batch = unsent
+
+    for it in batch:
+        write_click(it)
+
+
+def build_click_item(short_id: str, event: dict) -> dict:
     headers = event.get("headers") or {}
     headers_lc = {str(k).lower(): str(v) for k, v in headers.items()}
 
@@ -194,17 +534,20 @@ def log_click(short_id: str, event: dict):
     ua = headers_lc.get("user-agent", "")
     referer = headers_lc.get("referer", "direct")
 
-    ts = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
-
     click_item = {
         "shortId": short_id,
-        "timestamp": ts,
+        "timestamp": click_timestamp(),
         "ip": hash_ip(source_ip),
         "userAgent": ua,
         "referer": referer,
     }
+    if CLICK_STORE_DEVICE:
+        click_item["device"] = classify_ua(ua)[0]
+    return click_item
+
 
-    clicks_table.put_item(Item=click_item)
+def click_timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
 
 
 def hash_ip(ip: str) -> str:
@@ -213,6 +556,23 @@ def hash_ip(ip: str) -> str:
     return hashlib.sha256(ip.encode("utf-8")).hexdigest()[:16]
 
 
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def classify_ua(user_agent: str) -> tuple[str, bool]:
+    """UA -> (device, isBot). analyze classify_ua와 같은 규칙 (패턴 바꾸면 같이 바꿀 것)"""
+    ua = user_agent.strip()
+    if not ua:
+        return "unknown", False
+    if BOT_UA_PAT.search(ua):
+        return "bot", True
+    if DEVICE_PATTERNS["tablet"].search(ua):
+        return "tablet", False
+    if DEVICE_PATTERNS["mobile"].search(ua):
+        return "mobile", False
+    if DEVICE_PATTERNS["desktop"].search(ua):
+        return "desktop", False
+    return "other", False
+
+
 def json_response(status_code: int, body: dict):
     return {
         "statusCode": status_code,
@@ -1,30 +1,118 @@
+import codecs
+import hashlib
+import hmac
 import json
 import os
 import re
 import time
 import random
 import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from urllib.parse import urlparse
+from html.parser import HTMLParser
+from urllib.error import URLError
+from urllib.parse import parse_qsl, urlencode, urlparse
 from urllib.request import Request, urlopen
 
 import boto3
+from boto3.dynamodb.types import TypeSerializer
 from botocore.exceptions import ClientError
 
 # --- DynamoDB ---
 dynamodb = boto3.resource("dynamodb")
 URLS_TABLE = os.environ.get("URLS_TABLE", "url-shortener-urls")
 table = dynamodb.Table(URLS_TABLE)
+TITLE_CACHE_TABLE = os.environ.get("TITLE_CACHE_TABLE", "url-shortener-title-cache")
+URL_INDEX_TABLE = os.environ.get("URL_INDEX_TABLE", "url-shortener-url-index")
+url_index_table = dynamodb.Table(URL_INDEX_TABLE)
+counters_table = dynamodb.Table(os.environ.get("COUNTERS_TABLE", "url-shortener-counters"))
+lambda_client = boto3.client("lambda")
+
+# boto3 resource는 thread-safe가 아님 -> title worker thread는 자기 resource를 따로 씀
+_ddb_local = threading.local()
+
+
+def ddb():
+    if threading.current_thread() is threading.main_thread():
+        return dynamodb
+    res = getattr(_ddb_local, "resource", None)
+    if res is None:
+        res = boto3.session.Session().resource("dynamodb")
+        _ddb_local.resource = res
+    return res
+
 
 # --- Config ---
 BASE_URL = os.environ.get("BASE_URL", "").rstrip("/")  # e.g. https://short.url
 SHORT_ID_LEN = int(os.environ.get("SHORT_ID_LEN", "8"))
 MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "5"))
 TITLE_FETCH_TIMEOUT = float(os.environ.get("TITLE_FETCH_TIMEOUT", "2.5"))  # seconds
-MAX_HTML_BYTES = int(os.environ.get("MAX_HTML_BYTES", "262144"))  # 256KB
+MAX_HTML_BYTES = int(os.environ.get("MAX_HTML_BYTES", "262144"))  # 256KB (상한, 보통 </title>에서 멈춤)
+TITLE_READ_CHUNK = int(os.environ.get("TITLE_READ_CHUNK", "4096"))
+
+# <meta charset="..."> / <meta http-equiv content="text/html; charset=..."> (HTML 명세상 앞 1024바이트 안)
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-:.]+)""", re.IGNORECASE)
+CHARSET_PRESCAN_BYTES = 1024
+
+# title 캐시 (warm container 메모리 -> title-cache 테이블 -> 원본 fetch 순서)
+# - "U#{sha256(정규화 URL)}": 페이지 title (못 찾았으면 빈 문자열, 짧은 TTL)
+# - "D#{host}": timeout/non-HTML 도메인 negative cache -> TTL 동안 fetch 안 함
+TITLE_CACHE_ENABLED = os.environ.get("TITLE_CACHE_ENABLED", "true").lower() == "true"
+TITLE_CACHE_TTL_SEC = int(os.environ.get("TITLE_CACHE_TTL_SEC", str(7 * 86400)))
+TITLE_NEGATIVE_TTL_SEC = int(os.environ.get("TITLE_NEGATIVE_TTL_SEC", "600"))
+TITLE_CACHE_MAX_ENTRIES = int(os.environ.get("TITLE_CACHE_MAX_ENTRIES", "2000"))
+
+# 캐시 키에서 빼는 추적용 query 파라미터 (utm_*는 prefix로 처리)
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "yclid", "mc_cid", "mc_eid", "ref_src", "si"}
+
+# cacheKey -> (expiresAtMonotonic, title | None), 오래된 순서 -> 최근 사용 순서
+# (batch는 title을 thread로 동시에 가져오므로 lock)
+_title_cache = OrderedDict()
+_title_cache_lock = threading.Lock()
+
+# 같은 originalUrl이면 기존 shortId 반환 (url-index 테이블: urlHash -> shortId)
+# - 신규 생성은 urls + url-index를 TransactWriteItems로 같이 씀 (동시 요청도 하나만 생성)
+SHORTEN_DEDUPE_ENABLED = os.environ.get("SHORTEN_DEDUPE_ENABLED", "false").lower() == "true"
+
+_serializer = TypeSerializer()
+
+# title 가져오기
+# - sync : 응답 전에 원본 페이지 fetch (외부 사이트 속도가 shorten 지연에 그대로 반영)
+# - async: 도메인을 임시 title로 저장하고 바로 응답, 자기 자신을 비동기 invoke(job=enrich_title)해서 나중에 갱신
+TITLE_FETCH_MODE = os.environ.get("TITLE_FETCH_MODE", "sync").lower()
 
 BASE62_ALPHABET = string.ascii_letters + string.digits  # a-zA-Z0-9 (62 chars)
 
+# POST /shorten/batch
+# - 요청당 최대 SHORTEN_BATCH_MAX개, TransactWriteItems 청크 단위로 생성 (청크 안 충돌만 골라서 재시도)
+# - title은 SHORTEN_BATCH_TITLE_CONCURRENCY개씩 동시에, sync 모드면 SHORTEN_BATCH_TITLE_BUDGET_SEC 안에 못 가져온 건 도메인
+SHORTEN_BATCH_MAX = int(os.environ.get("SHORTEN_BATCH_MAX", "500"))
+SHORTEN_BATCH_TXN_URLS = 25  # dedupe 모드면 url당 2아이템 -> 트랜잭션 100아이템 제한 안쪽
+SHORTEN_BATCH_TITLE_CONCURRENCY = int(os.environ.get("SHORTEN_BATCH_TITLE_CONCURRENCY", "16"))
+SHORTEN_BATCH_TITLE_BUDGET_SEC = float(os.environ.get("SHORTEN_BATCH_TITLE_BUDGET_SEC", "10"))
+ENRICH_JOB_MAX_ITEMS = 100  # 비동기 invoke payload(256KB) 여유
+
+# shortId 생성 방식
+# - random: 랜덤 base62 + attribute_not_exists 충돌 시 재시도 (테이블이 찰수록 충돌 증가)
+# - block : counters 테이블 "#IDBLOCK" 원자적 ADD로 ID_BLOCK_SIZE개 구간을 받아 컨테이너 메모리에서 순서대로 발급
+#           ID_PERMUTE_KEY로 Feistel 순열을 거쳐 base62 (연속 번호 추측 방지)
+#           ID_PERMUTE_KEY가 비어 있으면 연속 번호가 그대로 드러나므로 block을 쓰지 않고 random
+SHORT_ID_MODE = os.environ.get("SHORT_ID_MODE", "random").lower()
+ID_BLOCK_SIZE = int(os.environ.get("ID_BLOCK_SIZE", "1000"))
+ID_BLOCK_COUNTER_KEY = "#IDBLOCK"
+ID_PERMUTE_KEY = os.environ.get("ID_PERMUTE_KEY", "").encode("utf-8")
+ID_FEISTEL_ROUNDS = 4
+
+# SHORT_ID_LEN자리 base62 공간(62^N)을 덮는 짝수 비트 수 -> Feistel 반쪽 크기
+ID_SPACE = 62 ** SHORT_ID_LEN
+ID_HALF_BITS = ((ID_SPACE - 1).bit_length() + 1) // 2
+
+# 컨테이너가 받은 현재 블록 [next, end)
+_id_block = {"next": 0, "end": 0}
+_id_block_lock = threading.Lock()
+
 
 def lambda_handler(event, context):
     start = time.time()
@@ -34,10 +122,35 @@ def lambda_handler(event, context):
     user_agent = get_header(headers, "user-agent")
 
     request_id = getattr(context, "aws_request_id", None)
+
+    # 비동기 title 보강 job (shorten이 자기 자신을 InvocationType=Event로 호출)
+    if event.get("job") == "enrich_title":
+        return enrich_title(event, request_id)
+
     # CORS preflight
     if event.get("requestContext", {}).get("http", {}).get("method") == "OPTIONS" or event.get("httpMethod") == "OPTIONS":
         return create_response(200, {})
 
+    if (path or "").rstrip("/").endswith("/shorten/batch"):
+        try:
+            return shorten_batch(event, context, start, request_id, route, method, path, user_agent)
+        except Exception as e:
+            print("Unhandled error:", str(e))
+            log_json(
+                "ERROR",
+                "shorten batch failed",
+                requestId=request_id,
+                statusCode=500,
+                latencyMs=int((time.time() - start) * 1000),
+                route=route,
+                method=method,
+                path=path,
+                userAgent=user_agent,
+                errorType=type(e).__name__,
+                errorMessage=str(e),
+            )
+            return create_response(500, {"error": "Internal server error"})
+
     try:
         body = parse_body(event)
         original_url = (body.get("url") or "").strip()
@@ -62,45 +175,88 @@ def lambda_handler(event, context):
                 errorMessage=err,
             )
             return create_response(400, {"error": err})
-        
 
-        # 2) Title: prefer provided, else fetch
+        # 1-1) dedupe: 이미 줄인 URL이면 url-index GetItem 1번으로 바로 응답
+        url_hash = canonical_url_hash(original_url) if SHORTEN_DEDUPE_ENABLED else None
+        existing = url_index_lookup(url_hash) if url_hash else None
+        if existing:
+            latency_ms = int((time.time() - start) * 1000)
+            log_json(
+                "INFO",
+                "shorten deduplicated",
+                requestId=request_id,
+                statusCode=200,
+                latencyMs=latency_ms,
+                route=route,
+                method=method,
+                path=path,
+                userAgent=user_agent,
+                createdShortId=existing["shortId"],
+                urlDomain=safe_domain(original_url),
+                hasProvidedTitle=bool(provided_title),
+            )
+            return create_response(200, {
+                "shortId": existing["shortId"],
+                "shortUrl": build_short_url(event, existing["shortId"]),
+                "title": existing.get("title") or domain_title(original_url),
+                "originalUrl": existing.get("originalUrl") or original_url,
+                "deduplicated": True,
+            })
+
+        # 2) Title: prefer provided, else fetch (async 모드면 나중에 enrich_title이 갱신)
         title = provided_title
+        title_pending = False
         if not title:
-            title = fetch_title_safe(original_url)
+            if TITLE_FETCH_MODE == "async":
+                # async 모드라도 캐시에 있으면 바로 사용 (외부 fetch/invoke 없음)
+                hit, title = title_cache_lookup(original_url)
+                title_pending = not hit
+            else:
+                title = fetch_title_safe(original_url)
 
-        # fallback: title이 없으면 도메인으로 채우기
+        # fallback: title이 없으면 도메인으로 채우기 (async 모드에서는 임시 title)
         if not title:
-            host = (urlparse(original_url).hostname or "").lower()
-            title = host if host else "Untitled"
+            title = domain_title(original_url)
 
 
         # 3) Create shortId + conditional put with retries
         created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
         short_id = None
+        deduplicated = False
 
         for attempt in range(MAX_RETRIES):
-            candidate = generate_base62_id(SHORT_ID_LEN)
+            candidate = generate_short_id()
 
-            item = {
-                "shortId": candidate,
-                "originalUrl": original_url,
-                "title": title,
-                "createdAt": created_at,
-                "clickCount": 0,
-            }
+            item = build_url_item(candidate, original_url, title, created_at, title_pending)
 
             try:
-                table.put_item(
-                    Item=item,
-                    ConditionExpression="attribute_not_exists(shortId)",
-                )
+                if url_hash:
+                    put_url_with_index(item, url_hash)
+                else:
+                    table.put_item(
+                        Item=item,
+                        ConditionExpression="attribute_not_exists(shortId)",
+                    )
                 short_id = candidate
                 break
             except ClientError as e:
                 if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
                     # collision -> retry
                     continue
+                if e.response["Error"]["Code"] == "TransactionCanceledException":
+                    reasons = [r.get("Code") for r in e.response.get("CancellationReasons") or []]
+                    # [1] url-index 조건 실패: 같은 URL을 다른 요청이 먼저 만듦 -> 그 shortId 사용
+                    if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                        existing = url_index_lookup(url_hash, consistent=True)
+                        if existing:
+                            short_id = existing["shortId"]
+                            title = existing.get("title") or title
+                            title_pending = False
+                            deduplicated = True
+                            break
+                    # [0] urls 조건 실패: shortId collision -> retry
+                    if reasons and reasons[0] == "ConditionalCheckFailed":
+                        continue
                 # other dynamodb error
                 print("DynamoDB error:", e)
                 latency_ms = int((time.time() - start) * 1000)
@@ -136,19 +292,19 @@ def lambda_handler(event, context):
             )
             return create_response(500, {"error": "Failed to generate unique shortId"})
 
+        # 3-1) title 비동기 보강 요청 (실패하면 예전처럼 여기서 바로 가져옴)
+        title_mode = "provided" if provided_title else TITLE_FETCH_MODE
+        if title_pending:
+            try:
+                request_title_enrichment(context, short_id, original_url)
+            except Exception as e:
+                print("title enrich invoke failed:", str(e))
+                title_mode = "sync_fallback"
+                title = enrich_title_now(short_id, original_url) or title
+                title_pending = False
+
         # 4) shortUrl
-        if BASE_URL:
-            short_url = f"{BASE_URL}/{short_id}"
-        else:
-            # API Gateway (HTTP API v2) fallback
-            domain = event.get("requestContext", {}).get("domainName")
-            stage = event.get("requestContext", {}).get("stage")
-            if domain and stage:
-                short_url = f"https://{domain}/{stage}/{short_id}"
-            elif domain:
-                short_url = f"https://{domain}/{short_id}"
-            else:
-                short_url = f"/{short_id}"  # minimal fallback
+        short_url = build_short_url(event, short_id)
 
         latency_ms = int((time.time() - start) * 1000)
         log_json(
@@ -164,14 +320,21 @@ def lambda_handler(event, context):
             createdShortId=short_id,
             urlDomain=safe_domain(original_url),
             hasProvidedTitle=bool(provided_title),
+            titleMode=title_mode,
+            deduplicated=deduplicated,
         )
 
-        return create_response(200, {
+        resp_body = {
             "shortId": short_id,
             "shortUrl": short_url,
             "title": title,
             "originalUrl": original_url
-        })
+        }
+        if title_pending:
+            resp_body["titlePending"] = True
+        if deduplicated:
+            resp_body["deduplicated"] = True
+        return create_response(200, resp_body)
 
     except ValueError:
         latency_ms = int((time.time() - start) * 1000)
@@ -242,6 +405,58 @@ def validate_url(url: str):
     return None
 
 
+def generate_short_id() -> str:
+    if SHORT_ID_MODE == "block" and ID_PERMUTE_KEY:
+        try:
+            return encode_short_id(next_block_id())
+        except Exception as e:
+            # 블록 할당 실패(counters 테이블 오류)면 랜덤으로 (충돌은 기존 재시도 루프가 처리)
+            print("id block allocation failed:", str(e))
+    return generate_base62_id(SHORT_ID_LEN)
+
+
+def next_block_id() -> int:
+    with _id_block_lock:
+        if _id_block["next"] >= _id_block["end"]:
+            resp = counters_table.update_item(
+                Key={"counterKey": ID_BLOCK_COUNTER_KEY},
+                UpdateExpression="ADD nextId :n",
+                ExpressionAttributeValues={":n": ID_BLOCK_SIZE},
+                ReturnValues="UPDATED_NEW",
+            )
+            end = int(resp["Attributes"]["nextId"])
+            _id_block["next"], _id_block["end"] = end - ID_BLOCK_SIZE, end
+            print(json.dumps({"type": "ID_BLOCK_LEASED", "start": _id_block["next"], "end": end}))
+        n = _id_block["next"]
+        _id_block["next"] += 1
+        return n
+
+
+def encode_short_id(n: int) -> str:
+    if n >= ID_SPACE:
+        raise ValueError("id space exhausted")
+    if ID_PERMUTE_KEY:
+        # 2^(2*half) 위의 순열이라 ID_SPACE 밖으로 나가면 다시 돌림 (cycle-walking -> 62^N 안에서도 1:1)
+        n = feistel_permute(n)
+        while n >= ID_SPACE:
+            n = feistel_permute(n)
+
+    chars = []
+    for _ in range(SHORT_ID_LEN):
+        n, r = divmod(n, 62)
+        chars.append(BASE62_ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+def feistel_permute(x: int) -> int:
+    mask = (1 << ID_HALF_BITS) - 1
+    left, right = x >> ID_HALF_BITS, x & mask
+    for i in range(ID_FEISTEL_ROUNDS):
+        digest = hmac.new(ID_PERMUTE_KEY, f"{i}:{right}".encode("ascii"), hashlib.sha256).digest()
+        left, right = right, left ^ (int.from_bytes(digest[:8], "big") & mask)
+    return (left << ID_HALF_BITS) | right
+
+
 def generate_base62_id(length: int) -> str:
     # cryptographically strong randomness
     try:
@@ -251,10 +466,542 @@ def generate_base62_id(length: int) -> str:
         return "".join(random.choice(BASE62_ALPHABET) for _ in range(length))
 
 
+def build_short_url(event: dict, short_id: str) -> str:
+    if BASE_URL:
+        return f"{BASE_URL}/{short_id}"
+
+    # API Gateway (HTTP API v2) fallback
+    domain = event.get("requestContext", {}).get("domainName")
+    stage = event.get("requestContext", {}).get("stage")
+    if domain and stage:
+        return f"https://{domain}/{stage}/{short_id}"
+    if domain:
+        return f"https://{domain}/{short_id}"
+    return f"/{short_id}"  # minimal fallback
+
+
+def canonical_url_hash(url: str) -> str:
+    """
+    dedupe 키: scheme/host 소문자 + 기본 포트 제거 + 빈 path는 "/".
+    query/fragment는 그대로 (utm 등이 다르면 다른 링크로 취급)
+    """
+    p = urlparse(url.strip())
+    host = (p.hostname or "").lower()
+    if p.port and not ((p.scheme == "http" and p.port == 80) or (p.scheme == "https" and p.port == 443)):
+        host = f"{host}:{p.port}"
+    canonical = f"{p.scheme.lower()}://{host}{p.path or '/'}"
+    if p.query:
+        canonical += f"?{p.query}"
+    if p.fragment:
+        canonical += f"#{p.fragment}"
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def url_index_lookup(url_hash: str, consistent: bool = False) -> dict | None:
+    return url_index_table.get_item(
+        Key={"urlHash": url_hash},
+        ConsistentRead=consistent,
+    ).get("Item")
+
+
+def put_url_with_index(item: dict, url_hash: str):
+    """urls 아이템 + url-index 아이템을 한 트랜잭션으로 (둘 다 attribute_not_exists 조건)"""
+    dynamodb.meta.client.transact_write_items(TransactItems=url_transact_puts(item, url_hash))
+
+
+def url_transact_puts(item: dict, url_hash: str | None = None) -> list[dict]:
+    puts = [{"Put": {
+        "TableName": URLS_TABLE,
+        "Item": {k: _serializer.serialize(v) for k, v in item.items()},
+        "ConditionExpression": "attribute_not_exists(shortId)",
+    }}]
+    if url_hash:
+        index_item = {
+            "urlHash": url_hash,
+            "shortId": item["shortId"],
+            "originalUrl": item["originalUrl"],
+            "title": item["title"],
+            "createdAt": item["createdAt"],
+        }
+        puts.append({"Put": {
+            "TableName": URL_INDEX_TABLE,
+            "Item": {k: _serializer.serialize(v) for k, v in index_item.items()},
+            "ConditionExpression": "attribute_not_exists(urlHash)",
+        }})
+    return puts
+
+
+def url_index_batch_lookup(url_hashes: list[str]) -> dict:
+    """urlHash -> url-index 아이템 (BatchGetItem 100개 단위)"""
+    found = {}
+    for i in range(0, len(url_hashes), 100):
+        request = {URL_INDEX_TABLE: {"Keys": [{"urlHash": h} for h in url_hashes[i:i + 100]]}}
+        for attempt in range(5):
+            resp = dynamodb.batch_get_item(RequestItems=request)
+            for it in resp.get("Responses", {}).get(URL_INDEX_TABLE, []):
+                found[it["urlHash"]] = it
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05 * (2 ** attempt))
+    return found
+
+
+# ---------------- batch ----------------
+
+def shorten_batch(event, context, start, request_id, route, method, path, user_agent):
+    """
+    POST /shorten/batch
+    body: {"items": [{"url": "...", "title": "..."}, ...]} 또는 {"urls": ["...", ...]}
+    응답: 입력 순서대로 results[] (항목별 성공/실패), 전체는 200
+    """
+    try:
+        body = parse_body(event)
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return create_response(400, {"error": "Invalid JSON body"})
+
+    raw_items = body.get("items")
+    if raw_items is None:
+        raw_items = [{"url": u} for u in (body.get("urls") or [])]
+    if not isinstance(raw_items, list) or not raw_items:
+        return create_response(400, {"error": "items is required"})
+    if len(raw_items) > SHORTEN_BATCH_MAX:
+        return create_response(400, {"error": f"Too many items (max {SHORTEN_BATCH_MAX})"})
+
+    results = [None] * len(raw_items)
+    entries = []  # 생성 대상: {index, url, title, urlHash}
+    for i, raw in enumerate(raw_items):
+        raw = raw if isinstance(raw, dict) else {"url": raw}
+        url = str(raw.get("url") or "").strip()
+        err = validate_url(url)
+        if err:
+            results[i] = {"index": i, "ok": False, "originalUrl": url, "error": err}
+            continue
+        entries.append({
+            "index": i,
+            "url": url,
+            "title": str(raw.get("title") or "").strip(),
+            "urlHash": canonical_url_hash(url) if SHORTEN_DEDUPE_ENABLED else None,
+        })
+
+    # 1) dedupe: 이미 있는 URL은 기존 shortId, 배치 안 중복 URL은 한 번만 생성
+    followers = {}  # urlHash -> 같은 URL의 뒤쪽 entry들
+    if SHORTEN_DEDUPE_ENABLED and entries:
+        existing = url_index_batch_lookup(sorted({e["urlHash"] for e in entries}))
+        first = {}
+        pending = []
+        for e in entries:
+            if e["urlHash"] in existing:
+                results[e["index"]] = batch_result(event, e, existing[e["urlHash"]], deduplicated=True)
+            elif e["urlHash"] in first:
+                followers.setdefault(e["urlHash"], []).append(e)
+            else:
+                first[e["urlHash"]] = e
+                pending.append(e)
+        entries = pending
+
+    # 2) title: 입력값 > 캐시/원본 (동시에)
+    pending_titles = resolve_batch_titles(entries)
+
+    # 3) 생성 (TransactWriteItems 청크)
+    created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for i in range(0, len(entries), SHORTEN_BATCH_TXN_URLS):
+        for e, outcome in write_batch_chunk(entries[i:i + SHORTEN_BATCH_TXN_URLS], created_at):
+            results[e["index"]] = batch_result(event, e, outcome.get("item"), outcome.get("deduplicated", False),
+                                               error=outcome.get("error"))
+
+    for url_hash, dupes in followers.items():
+        leader = next((r for r in results if r and r.get("ok") and r.get("_urlHash") == url_hash), None)
+        for e in dupes:
+            if leader:
+                results[e["index"]] = {**leader, "index": e["index"], "deduplicated": True}
+            else:
+                results[e["index"]] = {"index": e["index"], "ok": False, "originalUrl": e["url"], "error": "Create failed"}
+
+    # 4) async title 보강 (생성에 성공한 것만)
+    created_ids = {r["shortId"] for r in results if r and r.get("ok") and not r.get("deduplicated")}
+    enrich_items = [
+        {"shortId": e["shortId"], "url": e["url"]}
+        for e in pending_titles if e.get("shortId") in created_ids
+    ]
+    if enrich_items:
+        try:
+            request_title_enrichment_batch(context, enrich_items)
+        except Exception as e:
+            # 못 보내면 도메인 임시 title + titlePending으로 남음 (다음 보강 때까지)
+            print("title enrich invoke failed:", str(e))
+
+    for r in results:
+        r.pop("_urlHash", None)
+    ok = [r for r in results if r.get("ok")]
+    deduped = sum(1 for r in ok if r.get("deduplicated"))
+
+    log_json(
+        "INFO",
+        "shorten batch handled",
+        requestId=request_id,
+        statusCode=200,
+        latencyMs=int((time.time() - start) * 1000),
+        route=route,
+        method=method,
+        path=path,
+        userAgent=user_agent,
+        items=len(results),
+        created=len(ok) - deduped,
+        deduplicated=deduped,
+        failed=len(results) - len(ok),
+        titlePending=len(enrich_items),
+    )
+    return create_response(200, {
+        "results": results,
+        "created": len(ok) - deduped,
+        "deduplicated": deduped,
+        "failed": len(results) - len(ok),
+    })
+
+
+def resolve_batch_titles(entries: list[dict]) -> list[dict]:
+    """
+    title 없는 entry에 title을 채운다 (entry["title"], entry["titlePending"]).
+    - async 모드: 캐시 hit면 바로, miss면 도메인 임시 title + 나중에 보강
+    - sync 모드: 캐시/원본 fetch를 동시에, 예산 시간 넘기면 도메인
+    returns: 나중에 보강해야 하는 entry 목록 (async 모드 캐시 miss)
+    """
+    need = [e for e in entries if not e["title"]]
+    if not need:
+        return []
+
+    if TITLE_FETCH_MODE == "async":
+        resolve = title_cache_lookup
+    else:
+        resolve = lambda url: (True, fetch_title_safe(url))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, SHORTEN_BATCH_TITLE_CONCURRENCY))
+    futures = {pool.submit(resolve, e["url"]): e for e in need}
+    done, _ = wait(futures, timeout=SHORTEN_BATCH_TITLE_BUDGET_SEC)
+    # 남은 fetch는 기다리지 않음 (끝나면 캐시에만 반영됨)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    for fut, e in futures.items():
+        hit, title = fut.result() if fut in done and not fut.exception() else (False, None)
+        e["title"] = title or domain_title(e["url"])
+        e["titlePending"] = TITLE_FETCH_MODE == "async" and not hit
+
+    return [e for e in need if e["titlePending"]]
+
+
+def write_batch_chunk(chunk: list[dict], created_at: str):
+    """
+    chunk를 TransactWriteItems 한 번으로 생성. 취소되면 CancellationReasons로
+    - urls 조건 실패(shortId 충돌): 새 id로 다시
+    - url-index 조건 실패(동시에 같은 URL 생성됨): 기존 아이템으로 dedupe
+    yields: (entry, {"item": ..., "deduplicated": bool} | {"error": ...})
+    """
+    pending = list(chunk)
+    for attempt in range(MAX_RETRIES):
+        if not pending:
+            return
+        for e in pending:
+            e["shortId"] = generate_short_id()
+
+        items = []
+        txn = []
+        for e in pending:
+            item = build_url_item(e["shortId"], e["url"], e["title"], created_at, e.get("titlePending", False))
+            items.append(item)
+            txn.extend(url_transact_puts(item, e["urlHash"]))
+
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=txn)
+            for e, item in zip(pending, items):
+                yield e, {"item": item}
+            return
+        except ClientError as err:
+            if err.response["Error"]["Code"] != "TransactionCanceledException":
+                for e in pending:
+                    yield e, {"error": err.response["Error"]["Code"]}
+                return
+            reasons = [r.get("Code") for r in err.response.get("CancellationReasons") or []]
+
+        # 트랜잭션 아이템 순서: url당 [urls, (url-index)]
+        per_url = 2 if SHORTEN_DEDUPE_ENABLED else 1
+        retry = []
+        for n, e in enumerate(pending):
+            codes = reasons[n * per_url:(n + 1) * per_url]
+            if per_url == 2 and len(codes) > 1 and codes[1] == "ConditionalCheckFailed":
+                existing = url_index_lookup(e["urlHash"], consistent=True)
+                if existing:
+                    yield e, {"item": existing, "deduplicated": True}
+                    continue
+            # 충돌 난 것 + 같이 취소된 나머지 전부 다시
+            retry.append(e)
+        pending = retry
+
+    for e in pending:
+        yield e, {"error": "Failed to generate unique shortId"}
+
+
+def batch_result(event: dict, e: dict, item: dict | None, deduplicated: bool = False, error: str | None = None) -> dict:
+    if error or not item:
+        return {"index": e["index"], "ok": False, "originalUrl": e["url"], "error": error or "Create failed"}
+    result = {
+        "index": e["index"],
+        "ok": True,
+        "shortId": item["shortId"],
+        "shortUrl": build_short_url(event, item["shortId"]),
+        "title": item.get("title") or domain_title(e["url"]),
+        "originalUrl": item.get("originalUrl") or e["url"],
+        "_urlHash": e.get("urlHash"),
+    }
+    if deduplicated:
+        result["deduplicated"] = True
+    elif item.get("titlePending"):
+        result["titlePending"] = True
+    return result
+
+
+def build_url_item(short_id: str, original_url: str, title: str, created_at: str, title_pending: bool = False) -> dict:
+    """urls 테이블 아이템 (POST /shorten, /shorten/batch, importer 공통)"""
+    item = {
+        "shortId": short_id,
+        "originalUrl": original_url,
+        "title": title,
+        "createdAt": created_at,
+        "clickCount": 0,
+    }
+    if title_pending:
+        item["titlePending"] = True
+    return item
+
+
+def domain_title(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host if host else "Untitled"
+
+
+def request_title_enrichment(context, short_id: str, original_url: str):
+    request_title_enrichment_batch(context, [{"shortId": short_id, "url": original_url}])
+
+
+def request_title_enrichment_batch(context, items: list[dict]):
+    # 같은 함수(현재 버전/alias)를 비동기 호출 -> 응답 지연 없음
+    function_name = getattr(context, "invoked_function_arn", None) or os.environ["AWS_LAMBDA_FUNCTION_NAME"]
+    for i in range(0, len(items), ENRICH_JOB_MAX_ITEMS):
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps({"job": "enrich_title", "items": items[i:i + ENRICH_JOB_MAX_ITEMS]}).encode("utf-8"),
+        )
+
+
+def enrich_title(event: dict, request_id=None):
+    """job=enrich_title: {"shortId","url"} 1건 또는 {"items":[...]} 여러 건 (여러 건이면 동시에)"""
+    start = time.time()
+    items = event.get("items")
+    if items is None:
+        items = [{"shortId": event.get("shortId"), "url": event.get("url")}]
+    items = [it for it in items if isinstance(it, dict) and it.get("shortId") and it.get("url")]
+    if not items:
+        log_json("WARN", "title enrich invalid job", requestId=request_id, shortId=event.get("shortId"))
+        return {"ok": False}
+
+    def enrich_one(it):
+        try:
+            return bool(enrich_title_now(it["shortId"], it["url"]))
+        except Exception as e:
+            print("title enrich failed:", it["shortId"], str(e))
+            return False
+
+    if len(items) == 1:
+        found = [enrich_one(items[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=SHORTEN_BATCH_TITLE_CONCURRENCY) as pool:
+            found = list(pool.map(enrich_one, items))
+
+    log_json(
+        "INFO",
+        "title enriched",
+        requestId=request_id,
+        shortId=items[0]["shortId"] if len(items) == 1 else None,
+        urlDomain=safe_domain(items[0]["url"]) if len(items) == 1 else None,
+        items=len(items),
+        found=sum(found),
+        latencyMs=int((time.time() - start) * 1000),
+    )
+    return {"ok": True, "items": len(items), "found": sum(found)}
+
+
+def enrich_title_now(short_id: str, original_url: str) -> str | None:
+    """
+    title을 가져와서 urls 아이템 갱신 (titlePending인 경우에만 -> 사용자가 준 title은 안 덮어씀)
+    못 가져오면 도메인 임시 title 유지하고 titlePending만 제거.
+    """
+    title = fetch_title_safe(original_url)
+    urls = ddb().Table(URLS_TABLE)  # batch 보강은 worker thread에서 호출됨
+    try:
+        if title:
+            urls.update_item(
+                Key={"shortId": short_id},
+                UpdateExpression="SET title = :t REMOVE titlePending",
+                ConditionExpression="titlePending = :p",
+                ExpressionAttributeValues={":t": title, ":p": True},
+            )
+        else:
+            urls.update_item(
+                Key={"shortId": short_id},
+                UpdateExpression="REMOVE titlePending",
+                ConditionExpression="titlePending = :p",
+                ExpressionAttributeValues={":p": True},
+            )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return None
+
+    # dedupe 응답도 보강된 title을 쓰도록 url-index에도 반영 (실패해도 urls가 원본)
+    if title and SHORTEN_DEDUPE_ENABLED:
+        try:
+            ddb().Table(URL_INDEX_TABLE).update_item(
+                Key={"urlHash": canonical_url_hash(original_url)},
+                UpdateExpression="SET title = :t",
+                ConditionExpression="shortId = :sid",
+                ExpressionAttributeValues={":t": title, ":sid": short_id},
+            )
+        except Exception as e:
+            print("url index title update failed:", str(e))
+    return title
+
+
 def fetch_title_safe(url: str) -> str | None:
+    """
+    캐시(메모리 -> title-cache 테이블)에 있으면 그걸 쓰고, 없으면 원본에서 가져와서 캐시에 저장.
+    timeout/non-HTML이면 도메인 단위로 잠깐 negative cache.
+    """
+    hit, title = title_cache_lookup(url)
+    if hit:
+        return title
+
+    title, failure = fetch_title_from_origin(url)
+    try:
+        title_cache_store(url, title, failure)
+    except Exception as e:
+        print("title cache store failed:", str(e))
+    return title
+
+
+def title_url_key(url: str) -> str:
+    """
+    캐시용 URL 정규화: scheme/host 소문자, fragment 제거, 추적용 query 제거 + 정렬.
+    (analyze normalize_url처럼 query 전체를 버리면 ?v=... 같은 페이지가 섞이므로 나머지 query는 유지)
+    """
+    p = urlparse(url.strip())
+    host = (p.hostname or "").lower()
+    if p.port and not ((p.scheme == "http" and p.port == 80) or (p.scheme == "https" and p.port == 443)):
+        host = f"{host}:{p.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    base = f"{p.scheme.lower()}://{host}{p.path or '/'}"
+    return f"{base}?{urlencode(query)}" if query else base
+
+
+def title_cache_keys(url: str):
+    normalized = title_url_key(url)
+    url_key = "U#" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    domain_key = "D#" + ((urlparse(url).hostname or "").lower())
+    return normalized, url_key, domain_key
+
+
+def _title_mem_get(key: str):
+    with _title_cache_lock:
+        entry = _title_cache.get(key)
+        if not entry:
+            return False, None
+        if entry[0] <= time.monotonic():
+            _title_cache.pop(key, None)
+            return False, None
+        _title_cache.move_to_end(key)
+        return True, entry[1]
+
+
+def _title_mem_put(key: str, title: str | None, ttl_sec: float):
+    with _title_cache_lock:
+        _title_cache[key] = (time.monotonic() + ttl_sec, title)
+        _title_cache.move_to_end(key)
+        while len(_title_cache) > TITLE_CACHE_MAX_ENTRIES:
+            _title_cache.popitem(last=False)
+
+
+def title_cache_lookup(url: str):
+    """
+    returns: (hit, title)
+    - URL 캐시 hit: (True, title | None)  (None = 예전에 title 없던 페이지)
+    - 도메인 negative hit: (True, None)
+    - miss: (False, None)
+    """
+    if not TITLE_CACHE_ENABLED:
+        return False, None
+
+    _, url_key, domain_key = title_cache_keys(url)
+    for key in (url_key, domain_key):
+        hit, title = _title_mem_get(key)
+        if hit:
+            return True, title
+
+    # 메모리 miss -> 테이블에서 URL/도메인 키 한 번에 조회
+    try:
+        resp = ddb().batch_get_item(RequestItems={TITLE_CACHE_TABLE: {
+            "Keys": [{"cacheKey": url_key}, {"cacheKey": domain_key}],
+            "ProjectionExpression": "cacheKey, title, expiresAt",
+        }})
+    except Exception as e:
+        print("title cache lookup failed:", str(e))
+        return False, None
+
+    now = int(time.time())
+    found = {}
+    for it in resp.get("Responses", {}).get(TITLE_CACHE_TABLE, []):
+        expires_at = int(it.get("expiresAt", 0))
+        # TTL 삭제는 지연될 수 있어서 만료 시간 직접 확인
+        if expires_at > now:
+            found[it["cacheKey"]] = (it.get("title") or None, expires_at - now)
+
+    for key in (url_key, domain_key):
+        if key in found:
+            title, ttl_left = found[key]
+            _title_mem_put(key, title, ttl_left)
+            return True, title
+    return False, None
+
+
+def title_cache_store(url: str, title: str | None, failure: str | None):
+    if not TITLE_CACHE_ENABLED:
+        return
+
+    normalized, url_key, domain_key = title_cache_keys(url)
+    now = int(time.time())
+    if failure in ("timeout", "non_html"):
+        key, ttl, item = domain_key, TITLE_NEGATIVE_TTL_SEC, {"reason": failure}
+    elif failure:
+        return  # 기타 에러(DNS, 4xx/5xx 등)는 캐시 안 함
+    elif title:
+        key, ttl, item = url_key, TITLE_CACHE_TTL_SEC, {"title": title, "url": normalized}
+    else:
+        key, ttl, item = url_key, TITLE_NEGATIVE_TTL_SEC, {"title": "", "url": normalized}
+
+    _title_mem_put(key, title, ttl)
+    ddb().Table(TITLE_CACHE_TABLE).put_item(Item={"cacheKey": key, "expiresAt": now + ttl, **item})
+
+
+def fetch_title_from_origin(url: str):
     """
     Fetch HTML and extract <title>.
     Fallback to og:title if <title> is missing.
+    응답을 TITLE_READ_CHUNK 단위로 읽으면서 파싱하고, </title> 또는 </head>(<body>)에서 바로 중단.
+    returns: (title | None, failure | None)  failure: "timeout" | "non_html" | "error"
     """
     try:
         req = Request(
@@ -269,34 +1016,98 @@ def fetch_title_safe(url: str) -> str | None:
         with urlopen(req, timeout=TITLE_FETCH_TIMEOUT) as resp:
             content_type = (resp.headers.get("Content-Type") or "").lower()
             if "text/html" not in content_type:
-                return None
-
-            data = resp.read(MAX_HTML_BYTES)
-            html = data.decode("utf-8", errors="ignore")
-
-        # 1) <title> 우선
-        m = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
-        if m:
-            title = re.sub(r"\s+", " ", m.group(1)).strip()
-            if title:
-                return title[:200]
-
-        # 2) og:title fallback (유튜브/미디어 사이트에 자주 있음)
-        m = re.search(
-            r'<meta[^>]+property=["\']og:title["\'][^>]*content=["\']([^"\']+)["\']',
-            html,
-            re.IGNORECASE
-        )
-        if m:
-            og = re.sub(r"\s+", " ", m.group(1)).strip()
-            if og:
-                return og[:200]
+                return None, "non_html"
 
-        return None
+            parser = TitleParser()
+            charset = resp.headers.get_content_charset()
+            decoder = None
+            bytes_read = 0
+
+            while not parser.done and bytes_read < MAX_HTML_BYTES:
+                chunk = resp.read(min(TITLE_READ_CHUNK, MAX_HTML_BYTES - bytes_read))
+                if not chunk:
+                    break
+                if decoder is None:
+                    # 헤더에 charset 없으면 첫 chunk에서 <meta charset> prescan
+                    if not charset:
+                        m = META_CHARSET_RE.search(chunk[:CHARSET_PRESCAN_BYTES])
+                        charset = m.group(1).decode("ascii", errors="ignore") if m else None
+                    decoder = make_decoder(charset)
+                bytes_read += len(chunk)
+                parser.feed(decoder.decode(chunk))
+
+        title = parser.result()
+        print(json.dumps({"type": "TITLE_FETCH", "bytesRead": bytes_read, "charset": charset,
+                          "earlyStop": parser.done, "found": bool(title)}, ensure_ascii=False))
+        return title, None
 
     except Exception as e:
         print("title fetch failed:", str(e))
-        return None
+        if isinstance(e, TimeoutError) or (isinstance(e, URLError) and isinstance(e.reason, TimeoutError)):
+            return None, "timeout"
+        return None, "error"
+
+
+def make_decoder(charset: str | None):
+    try:
+        return codecs.getincrementaldecoder(charset or "utf-8")(errors="ignore")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+
+class TitleParser(HTMLParser):
+    """
+    <head> 안의 <title> / <meta property="og:title">만 본다.
+    - <title>을 찾으면 done (og:title보다 우선)
+    - </head> 또는 <body>를 만나면 done (og:title이 있으면 그걸 사용)
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self.title = None
+        self.og_title = None
+        self._in_title = False
+        self._title_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "title" and self.title is None:
+            self._in_title = True
+            self._title_parts = []
+        elif tag == "meta" and self.og_title is None:
+            a = {k.lower(): (v or "") for k, v in attrs}
+            if (a.get("property") or "").lower() == "og:title":
+                self.og_title = clean_title(a.get("content"))
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            self.title = clean_title("".join(self._title_parts))
+            if self.title:
+                self.done = True
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+
+    def result(self) -> str | None:
+        # 읽다가 끊긴 <title>도 내용이 있으면 사용
+        if not self.title and self._in_title:
+            self.title = clean_title("".join(self._title_parts))
+        return self.title or self.og_title
+
+
+def clean_title(text: str | None) -> str | None:
+    title = re.sub(r"\s+", " ", text or "").strip()
+    return title[:200] if title else None
 
 
 
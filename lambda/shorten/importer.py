@@ -0,0 +1,366 @@
+"""
+기존 단축 URL 대량 이관 (shortId, originalUrl, title -> urls 테이블)
+
+    python lambda/shorten/importer.py old_urls.csv --table url-shortener-urls --region ap-northeast-2
+    python lambda/shorten/importer.py old_urls.jsonl --workers 16 --checkpoint import.ckpt
+
+- 입력은 한 줄씩 스트리밍 (메모리에 전체를 올리지 않음)
+  - CSV : shortId,originalUrl,title[,createdAt] (첫 줄이 "shortId"로 시작하면 헤더로 보고 건너뜀)
+  - JSONL: {"shortId": "...", "originalUrl": "...", "title": "...", "createdAt": "..."} (url 키도 허용)
+- URL 검증/아이템 모양은 handler(validate_url, build_url_item)와 동일, title이 없으면 도메인
+- BatchWriteItem(25개)을 --workers개 thread로 병렬, UnprocessedItems는 지수 백오프로 재시도
+- 쓰기 전에 배치의 shortId를 BatchGetItem으로 확인
+  - 이미 있고 originalUrl도 같으면 이전 실행에서 들어간 행으로 보고 건너뜀 (existing)
+  - 이미 있는데 originalUrl이 다르면 덮어쓰지 않고 rejects로 ("shortId already exists")
+  - --overwrite면 확인 없이 덮어씀 (clickCount 포함, 예전 동작)
+  - 확인과 쓰기 사이에 새로 생긴 shortId는 못 막음 (이관은 서비스 트래픽 적을 때)
+- 체크포인트: 앞에서부터 "빠짐없이" 끝난 행 번호까지 기록 -> 다시 실행하면 그 다음 행부터
+  (체크포인트 이후 일부가 이미 써져 있어도 위 확인에서 existing으로 건너뜀)
+- --dry-run: 검증 + shortId 확인만, 테이블과 체크포인트 파일 모두 건드리지 않음 (체크포인트는 읽기만)
+- url-index(dedupe)는 채우지 않음
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+BATCH_SIZE = 25  # BatchWriteItem 최대 (BatchGetItem은 100이라 배치 하나 = get 한 번)
+MAX_UNPROCESSED_RETRIES = 8
+BACKOFF_BASE_SEC = 0.05
+BACKOFF_MAX_SEC = 5.0
+PROGRESS_EVERY_SEC = 5.0
+CHECKPOINT_EVERY_SEC = 2.0
+
+SHORT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Import shortId/originalUrl/title rows into the urls table")
+    ap.add_argument("input", help="CSV or JSONL file")
+    ap.add_argument("--format", choices=("csv", "jsonl"), help="default: 확장자로 판단 (.jsonl/.ndjson -> jsonl)")
+    ap.add_argument("--table", default=os.environ.get("URLS_TABLE", "url-shortener-urls"))
+    ap.add_argument("--region", default=os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION"))
+    ap.add_argument("--workers", type=int, default=8, help="동시에 BatchWriteItem 보내는 thread 수")
+    ap.add_argument("--checkpoint", help="체크포인트 파일 (있으면 이어서, 없으면 새로 생성)")
+    ap.add_argument("--rejects", help="검증 실패 행을 JSONL로 기록할 파일")
+    ap.add_argument("--limit", type=int, help="최대 처리 행 수 (테스트용)")
+    ap.add_argument("--dry-run", action="store_true", help="검증 + shortId 확인만 하고 쓰지 않음 (체크포인트도 저장 안 함)")
+    ap.add_argument("--overwrite", action="store_true", help="이미 있는 shortId도 확인 없이 덮어씀")
+    return ap.parse_args(argv)
+
+
+def load_handler(args):
+    # handler는 import 시점에 env로 boto3 리소스/테이블 이름을 정함
+    if args.region:
+        os.environ.setdefault("AWS_DEFAULT_REGION", args.region)
+    os.environ["URLS_TABLE"] = args.table
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import handler
+    return handler
+
+
+# ---------------- input ----------------
+
+def iter_rows(path: str, fmt: str):
+    """
+    yields: (rowNo, dict | None, error | None)  rowNo = 1부터, 데이터 행 기준 (CSV 헤더 제외)
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            row_no = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                row_no += 1
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    yield row_no, None, "Invalid JSON"
+                    continue
+                if not isinstance(obj, dict):
+                    yield row_no, None, "Invalid JSON"
+                    continue
+                yield row_no, {
+                    "shortId": obj.get("shortId"),
+                    "originalUrl": obj.get("originalUrl") or obj.get("url"),
+                    "title": obj.get("title"),
+                    "createdAt": obj.get("createdAt"),
+                }, None
+            return
+
+        reader = csv.reader(f)
+        row_no = 0
+        for cols in reader:
+            if not cols or not any(c.strip() for c in cols):
+                continue
+            if reader.line_num == 1 and cols[0].strip().lower() == "shortid":
+                continue
+            row_no += 1
+            cols = cols + [""] * (4 - len(cols))
+            yield row_no, {"shortId": cols[0], "originalUrl": cols[1], "title": cols[2], "createdAt": cols[3]}, None
+
+
+def to_item(handler, row: dict, default_created_at: str):
+    """returns: (item, error)"""
+    short_id = str(row.get("shortId") or "").strip()
+    if not SHORT_ID_RE.match(short_id):
+        return None, "Invalid shortId"
+    url = str(row.get("originalUrl") or "").strip()
+    err = handler.validate_url(url)
+    if err:
+        return None, err
+    title = str(row.get("title") or "").strip() or handler.domain_title(url)
+    created_at = str(row.get("createdAt") or "").strip() or default_created_at
+    return handler.build_url_item(short_id, url, title, created_at), None
+
+
+def iter_batches(rows, handler, default_created_at, on_reject):
+    """
+    yields: (lastRowNo, [(rowNo, row, item), ...])  배치 안 같은 shortId는 마지막 것만 (BatchWriteItem은 중복 키면 ValidationException)
+    """
+    batch = {}
+    last_row = 0
+    for row_no, row, err in rows:
+        last_row = row_no
+        item = None
+        if not err:
+            item, err = to_item(handler, row, default_created_at)
+        if err:
+            on_reject(row_no, row, err)
+            continue
+        batch[item["shortId"]] = (row_no, row, item)
+        if len(batch) >= BATCH_SIZE:
+            yield last_row, list(batch.values())
+            batch = {}
+    if batch or last_row:
+        yield last_row, list(batch.values())
+
+
+# ---------------- write ----------------
+
+def write_batch(client, serializer, table_name: str, items: list, stats) -> int:
+    """BatchWriteItem + UnprocessedItems 재시도. returns: 재시도 횟수"""
+    if not items:
+        return 0
+    request = {table_name: [
+        {"PutRequest": {"Item": {k: serializer.serialize(v) for k, v in item.items()}}}
+        for item in items
+    ]}
+    for attempt in range(MAX_UNPROCESSED_RETRIES + 1):
+        resp = client.batch_write_item(RequestItems=request)
+        request = resp.get("UnprocessedItems") or {}
+        if not request:
+            return attempt
+        if attempt == MAX_UNPROCESSED_RETRIES:
+            break
+        stats.add(unprocessedRetries=1)
+        # full jitter
+        time.sleep(random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt))))
+    left = sum(len(v) for v in request.values())
+    raise RuntimeError(f"{left} items still unprocessed after {MAX_UNPROCESSED_RETRIES} retries")
+
+
+def find_existing(client, table_name: str, short_ids: list) -> dict:
+    """BatchGetItem + UnprocessedKeys 재시도. returns: {shortId: originalUrl} (이미 있는 것만)"""
+    found = {}
+    if not short_ids:
+        return found
+    request = {table_name: {
+        "Keys": [{"shortId": {"S": sid}} for sid in short_ids],
+        "ProjectionExpression": "shortId, originalUrl",
+    }}
+    for attempt in range(MAX_UNPROCESSED_RETRIES + 1):
+        resp = client.batch_get_item(RequestItems=request)
+        for it in resp.get("Responses", {}).get(table_name, []):
+            found[it["shortId"]["S"]] = (it.get("originalUrl") or {}).get("S")
+        request = resp.get("UnprocessedKeys") or {}
+        if not request:
+            return found
+        if attempt == MAX_UNPROCESSED_RETRIES:
+            break
+        time.sleep(random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt))))
+    left = sum(len(v["Keys"]) for v in request.values())
+    raise RuntimeError(f"{left} keys still unprocessed after {MAX_UNPROCESSED_RETRIES} retries")
+
+
+def import_batch(client, serializer, table_name: str, entries: list, stats, dry_run: bool, overwrite: bool):
+    """
+    returns: (written, [(rowNo, row, error), ...])  충돌한 행은 rejects로 (main thread에서 기록)
+    """
+    existing = {} if overwrite else find_existing(client, table_name, [item["shortId"] for _, _, item in entries])
+    items = []
+    collisions = []
+    for row_no, row, item in entries:
+        sid = item["shortId"]
+        if sid not in existing:
+            items.append(item)
+        elif existing[sid] == item["originalUrl"]:
+            stats.add(existing=1)
+        else:
+            collisions.append((row_no, row, "shortId already exists"))
+    if dry_run:
+        return 0, collisions
+    write_batch(client, serializer, table_name, items, stats)
+    return len(items), collisions
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"rows": 0, "written": 0, "rejected": 0, "existing": 0, "unprocessedRetries": 0}
+
+    def add(self, **kwargs):
+        with self.lock:
+            for k, v in kwargs.items():
+                self.counts[k] += v
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+class Checkpoint:
+    """
+    배치는 순서 없이 끝나므로, 앞에서부터 연속으로 끝난 배치의 마지막 행 번호(rowsDone)만 저장.
+    read_only면 (dry-run) 이어서 시작할 위치만 읽고 파일은 만들거나 고치지 않음.
+    """
+
+    def __init__(self, path: str | None, input_path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self.input_path = os.path.abspath(input_path)
+        self.rows_done = 0
+        self.saved_at = 0.0
+        self._done = {}  # seq -> lastRowNo
+        self._next_seq = 0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("input") != self.input_path:
+                raise SystemExit(f"checkpoint {path} is for {data.get('input')}, not {self.input_path}")
+            self.rows_done = int(data.get("rowsDone") or 0)
+
+    def mark_done(self, seq: int, last_row: int):
+        self._done[seq] = last_row
+        while self._next_seq in self._done:
+            self.rows_done = max(self.rows_done, self._done.pop(self._next_seq))
+            self._next_seq += 1
+
+    def save(self, counts: dict, force: bool = False):
+        if not self.path or self.read_only or (not force and time.monotonic() - self.saved_at < CHECKPOINT_EVERY_SEC):
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": self.input_path,
+                "rowsDone": self.rows_done,
+                "updatedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                **counts,
+            }, f)
+        os.replace(tmp, self.path)
+        self.saved_at = time.monotonic()
+
+
+def run(args) -> dict:
+    handler = load_handler(args)
+    fmt = args.format or ("jsonl" if args.input.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    client = handler.dynamodb.meta.client  # low-level client는 thread-safe
+    stats = Stats()
+    ckpt = Checkpoint(args.checkpoint, args.input, read_only=args.dry_run)
+    skip = ckpt.rows_done
+    default_created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+
+    def on_reject(row_no, row, err):
+        stats.add(rejected=1)
+        if rejects:
+            rejects.write(json.dumps({"row": row_no, "error": err, "data": row}, ensure_ascii=False) + "\n")
+
+    rows = itertools.dropwhile(lambda r: r[0] <= skip, iter_rows(args.input, fmt))
+    if args.limit:
+        rows = itertools.takewhile(lambda r: r[0] <= skip + args.limit, rows)
+
+    start = time.monotonic()
+    last_report = start
+    max_in_flight = max(1, args.workers) * 2  # 읽기가 쓰기보다 너무 앞서가지 않게
+    in_flight = {}  # future -> (seq, lastRowNo)
+    failed = None
+
+    def report(final=False):
+        counts = stats.snapshot()
+        elapsed = max(time.monotonic() - start, 1e-9)
+        print(json.dumps({
+            "message": "import finished" if final else "import progress",
+            **counts,
+            "rowsDone": ckpt.rows_done,
+            "elapsedSec": round(elapsed, 1),
+            "rowsPerSec": round(counts["rows"] / elapsed, 1),
+            "writesPerSec": round(counts["written"] / elapsed, 1),
+        }), file=sys.stderr)
+
+    def drain(block_until):
+        nonlocal failed
+        done, _ = wait(list(in_flight), return_when=block_until)
+        for fut in done:
+            seq, last_row = in_flight.pop(fut)
+            exc = fut.exception()
+            if exc:
+                # 실패한 배치 이후로는 체크포인트가 안 넘어감 -> 재실행 시 여기부터
+                failed = failed or exc
+                continue
+            written, collisions = fut.result()
+            stats.add(written=written)
+            for row_no, row, err in collisions:
+                on_reject(row_no, row, err)
+            ckpt.mark_done(seq, last_row)
+        ckpt.save(stats.snapshot())
+
+    print(json.dumps({"message": "import started", "input": args.input, "format": fmt, "table": args.table,
+                      "resumeAfterRow": skip, "workers": args.workers, "dryRun": args.dry_run,
+                      "overwrite": args.overwrite}), file=sys.stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            prev_row = skip
+            for seq, (last_row, entries) in enumerate(iter_batches(rows, handler, default_created_at, on_reject)):
+                stats.add(rows=last_row - prev_row)
+                prev_row = last_row
+                if failed:
+                    break
+                while len(in_flight) >= max_in_flight:
+                    drain(FIRST_COMPLETED)
+                fut = pool.submit(import_batch, client, handler._serializer, args.table, entries, stats,
+                                  args.dry_run, args.overwrite)
+                in_flight[fut] = (seq, last_row)
+
+                if time.monotonic() - last_report >= PROGRESS_EVERY_SEC:
+                    report()
+                    last_report = time.monotonic()
+            while in_flight:
+                drain(FIRST_COMPLETED)
+    finally:
+        ckpt.save(stats.snapshot(), force=True)
+        if rejects:
+            rejects.close()
+
+    report(final=True)
+    if failed:
+        raise SystemExit(f"import stopped: {failed} (resume with --checkpoint from row {ckpt.rows_done + 1})")
+    return stats.snapshot()
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
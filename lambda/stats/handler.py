@@ -1,9 +1,10 @@
 # lambda/stats/handler.py
+import hashlib
 import json
 import os
 import time
-from datetime import datetime, timedelta, timezone
-from collections import defaultdict, Counter
+from datetime import date, datetime, timedelta, timezone
+from collections import Counter, OrderedDict
 from urllib.parse import urlparse
 
 import boto3
@@ -13,13 +14,53 @@ from boto3.dynamodb.conditions import Key
 dynamodb = boto3.resource("dynamodb")
 URLS_TABLE = os.environ.get("URLS_TABLE", "url-shortener-urls")
 CLICKS_TABLE = os.environ.get("CLICKS_TABLE", "url-shortener-clicks")
+COUNTERS_TABLE = os.environ.get("COUNTERS_TABLE", "url-shortener-counters")
+INSIGHTS_TABLE = os.environ.get("INSIGHTS_TABLE", "url-shortener-insights")
 
 urls_table = dynamodb.Table(URLS_TABLE)
 clicks_table = dynamodb.Table(CLICKS_TABLE)
+insights_table = dynamodb.Table(INSIGHTS_TABLE)
 
 # ---- Config ----
 TOP_REFERERS = int(os.environ.get("TOP_REFERERS", "5"))
 
+# ---- 통계 소스 ----
+# - clicks  : 기간 내 raw 클릭 전체 Query 후 계산 (클릭 수에 비례해서 느려짐)
+# - insights: analyze가 만든 insights 아이템 + 그 이후(endAt~now) raw 클릭 tail만 Query
+#             응답 window는 insight.startAt ~ now 라서 기간보다 insight 나이만큼 길어짐
+#             -> 나이가 min(STATS_INSIGHT_MAX_AGE_SEC, 기간 x STATS_INSIGHT_MAX_AGE_RATIO) 이하일 때만 사용
+#             (insight가 없거나 그보다 오래됐으면 clicks로 fallback)
+STATS_SOURCE = os.environ.get("STATS_SOURCE", "clicks").lower()
+STATS_INSIGHT_MAX_AGE_SEC = int(os.environ.get("STATS_INSIGHT_MAX_AGE_SEC", "3600"))
+STATS_INSIGHT_MAX_AGE_RATIO = float(os.environ.get("STATS_INSIGHT_MAX_AGE_RATIO", "0.1"))
+
+# stats period -> insights periodKey (analyze 집계 주기가 있는 것만. 1min은 항상 raw)
+PERIOD_TO_INSIGHT_KEY = {
+    "1h": "P#1H",
+    "24h": "P#24H",
+    "1d": "P#24H",
+    "7d": "P#7D",
+}
+
+# insights의 clicksByHour/clicksByDay는 KST 기준 (stats 응답은 UTC 시각)
+KST_OFFSET_HOURS = 9
+
+# 클릭 timestamp 고정 형식 파싱용 캐시 (analyze click_epoch와 같은 방식)
+_DAY_EPOCH_CACHE = {}  # "YYYY-MM-DD" -> 그 날 00:00:00Z epoch (잘못된 날짜면 None)
+_MINUTE_CACHE = {}     # "YYYY-MM-DDTHH:MM:" -> (UTC 시, 날짜) (형식이 다르면 None)
+TS_DAY_CACHE_MAX = 4096
+TS_MINUTE_CACHE_MAX = 50000  # 1분 단위 약 34일치
+
+# ---- 응답 캐시 ----
+# (shortId, period) -> 응답 body. warm container 안에서만 유지
+# Cache-Control/ETag도 같이 내려서 브라우저/CloudFront가 재요청 자체를 줄이게 함 (If-None-Match -> 304)
+STATS_CACHE_ENABLED = os.environ.get("STATS_CACHE_ENABLED", "true").lower() == "true"
+STATS_CACHE_TTL_SEC = int(os.environ.get("STATS_CACHE_TTL_SEC", "60"))
+STATS_CACHE_MAX_ENTRIES = int(os.environ.get("STATS_CACHE_MAX_ENTRIES", "1000"))
+
+# (shortId, period) -> (expiresAtMonotonic, bodyJson, etag), 오래된 순서 -> 최근 사용 순서
+_stats_cache = OrderedDict()
+
 # period → timedelta 매핑
 PERIOD_MAP = {
     "1min": timedelta(minutes=1),
@@ -85,6 +126,29 @@ def lambda_handler(event, context):
                 userAgent=user_agent,
             )
             return create_response(400, {"Invalid period (use 1min/1m, 1h, 24h/1d, 7d)"})
+        # 2-1) 응답 캐시
+        if_none_match = get_header(headers, "if-none-match")
+        cached = stats_cache_get((short_id, period))
+        if cached:
+            body_json, etag, max_age = cached
+            resp = cacheable_response(body_json, etag, max_age, if_none_match)
+            latency_ms = int((time.time() - start) * 1000)
+            log_json(
+                "INFO",
+                "stats fetched",
+                requestId=request_id,
+                shortId=short_id,
+                period=period,
+                statusCode=resp["statusCode"],
+                latencyMs=latency_ms,
+                route=route,
+                method=method,
+                path=path,
+                userAgent=user_agent,
+                cacheHit=True,
+            )
+            return resp
+
         now = datetime.now(timezone.utc)
         start_at = now - delta
 
@@ -107,17 +171,37 @@ def lambda_handler(event, context):
             )
             return create_response(404, {"error": "URL not found"})
 
-        # 4) clicks 조회 (timestamp는 ISO string, SK)
-        # DynamoDB query 조건: timestamp >= start_at_iso
+        # 4) 통계 계산
+        # - insights 소스: insight 아이템 + endAt 이후 클릭 tail
+        # - clicks 소스(또는 fallback): timestamp >= start_at_iso 전체 Query
         start_iso = start_at.isoformat(timespec="seconds").replace("+00:00", "Z")
 
-        clicks = query_clicks_since(short_id, start_iso)
-
-        # 5) 통계 계산
-        stats = calculate_stats(clicks)
-
-        # totalClicks: urls 테이블의 clickCount를 우선 사용(없으면 clicks count)
-        total_clicks = int(url_item.get("clickCount", len(clicks)))
+        source = "clicks"
+        acc = None
+        tail_clicks = 0
+        if STATS_SOURCE == "insights" and period in PERIOD_TO_INSIGHT_KEY:
+            max_age_sec = min(STATS_INSIGHT_MAX_AGE_SEC, delta.total_seconds() * STATS_INSIGHT_MAX_AGE_RATIO)
+            insight = get_fresh_insight(short_id, PERIOD_TO_INSIGHT_KEY[period], now, max_age_sec)
+            if insight:
+                source = "insights"
+                acc = insight_to_stats_acc(insight)
+                # 실제 window (insight 시작 ~ now)
+                start_iso = insight.get("startAt") or start_iso
+                # insight window는 끝(endAt)을 포함하므로 tail은 1초 뒤부터
+                tail_start = parse_iso(insight["endAt"]) + timedelta(seconds=1)
+                tail = query_clicks_since(short_id, tail_start.isoformat(timespec="seconds").replace("+00:00", "Z"))
+                # insight clicksByDay가 KST 날짜라서 tail도 KST 날짜로 합침
+                count_clicks(acc, tail, day_offset_hours=KST_OFFSET_HOURS)
+                tail_clicks = len(tail)
+
+        if acc is None:
+            acc = new_stats_acc()
+            count_clicks(acc, query_clicks_since(short_id, start_iso))
+
+        stats = finalize_stats(acc)
+
+        # totalClicks: urls 테이블의 clickCount(+ sharded counter 합계)를 우선 사용(없으면 기간 내 클릭 수)
+        total_clicks = resolve_click_count(short_id, url_item, acc["total"])
 
         latency_ms = int((time.time() - start) * 1000)
         log_json(
@@ -132,11 +216,14 @@ def lambda_handler(event, context):
             method=method,
             path=path,
             userAgent=user_agent,
-            resultClicks=len(clicks),   # 기간 내 클릭 수
+            resultClicks=acc["total"],  # 기간 내 클릭 수
             totalClicks=total_clicks,   # 누적 클릭 수
+            source=source,
+            tailClicks=tail_clicks,
+            cacheHit=False,
         )
 
-        return create_response(200, {
+        body_json, etag = stats_cache_put((short_id, period), {
             "shortId": short_id,
             "originalUrl": url_item.get("originalUrl", ""),
             "title": url_item.get("title", ""),
@@ -146,6 +233,7 @@ def lambda_handler(event, context):
             "totalClicks": total_clicks,
             **stats
         })
+        return cacheable_response(body_json, etag, STATS_CACHE_TTL_SEC, if_none_match)
 
     except Exception as e:
         print("Error:", str(e))
@@ -193,40 +281,137 @@ def query_clicks_since(short_id: str, start_iso: str):
     return items
 
 
-def calculate_stats(clicks: list):
+def resolve_click_count(short_id: str, url_item: dict, fallback: int) -> int:
     """
-    clicksByHour: {"0":1, "1":0, ..., "23":2} (문자열 키로 통일)
-    clicksByDay: {"YYYY-MM-DD": n, ...}
-    clicksByReferer: Top N + other
-    peakHour / topReferer: 선택 편의 필드
+    누적 클릭 수 = urls.clickCount + counters 테이블 shard 합계
+    (hot shortId는 analyze가 counterShards를 늘려서 쓰기를 "{shortId}#{n}" 아이템들로 분산시킴)
     """
-    clicks_by_hour = {str(h): 0 for h in range(24)}
-    clicks_by_day = defaultdict(int)
-    referer_counter = Counter()
+    shards = int(url_item.get("counterShards", 1) or 1)
+    if shards <= 1:
+        return int(url_item.get("clickCount", fallback))
+
+    total = int(url_item.get("clickCount", 0))
+    keys = [{"counterKey": f"{short_id}#{i}"} for i in range(shards)]
+
+    # BatchGetItem은 요청당 최대 100키
+    for start in range(0, len(keys), 100):
+        request = {COUNTERS_TABLE: {"Keys": keys[start:start + 100], "ProjectionExpression": "clickCount"}}
+        for attempt in range(5):
+            resp = dynamodb.batch_get_item(RequestItems=request)
+            for it in resp.get("Responses", {}).get(COUNTERS_TABLE, []):
+                total += int(it.get("clickCount", 0))
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            time.sleep(0.05 * (2 ** attempt))
+
+    return total
+
+
+def get_fresh_insight(short_id: str, period_key: str, now: datetime, max_age_sec: float):
+    """insights 아이템 (없거나 endAt이 max_age_sec보다 오래됐으면 None)"""
+    item = insights_table.get_item(Key={"shortId": short_id, "periodKey": period_key}).get("Item")
+    if not item or not item.get("endAt"):
+        return None
+    end_at = parse_iso(item["endAt"])
+    if not end_at or (now - end_at).total_seconds() > max_age_sec:
+        return None
+    return item
 
+
+def new_stats_acc():
+    return {
+        "total": 0,
+        "byHour": Counter(),     # "0"~"23" (UTC)
+        "byDay": Counter(),      # "YYYY-MM-DD"
+        "byReferer": Counter(),  # referer 도메인
+    }
+
+
+def count_clicks(acc: dict, clicks: list, day_offset_hours: int = 0):
+    """
+    byHour는 항상 UTC 시각, byDay는 UTC + day_offset_hours 기준 날짜 (insights와 합칠 때 KST=9)
+    """
     for click in clicks:
         ts = click.get("timestamp") or ""
         ref = click.get("referer") or "direct"
-        ref_domain = extract_domain(ref)
-        referer_counter[ref_domain] += 1
+        acc["byReferer"][extract_domain(ref)] += 1
+        acc["total"] += 1
+
+        hour_day = click_hour_day(ts)
+        if hour_day:
+            hour, day = hour_day
+            acc["byHour"][hour] += 1
+            days = (int(hour) + day_offset_hours) // 24
+            if days:
+                day = (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+            acc["byDay"][day] += 1
+            continue
 
         dt = parse_iso(ts)
         if dt:
-            clicks_by_hour[str(dt.hour)] += 1
-            clicks_by_day[dt.date().isoformat()] += 1
+            acc["byHour"][str(dt.hour)] += 1
+            acc["byDay"][(dt + timedelta(hours=day_offset_hours)).date().isoformat()] += 1
+
+
+def insight_to_stats_acc(item: dict) -> dict:
+    """
+    analyze insights 아이템 -> stats 누적값
+    - clicksByHour: KST "HH" -> UTC 시각 키
+    - clicksByDay: insights의 KST 날짜 그대로 (시간 정보가 없어서 UTC로 못 나눔)
+    - clicksByReferer: raw referer(TopN + other) -> 도메인 기준으로 다시 합산
+    """
+    acc = new_stats_acc()
+    acc["total"] = int(item.get("totalClicks", 0))
 
-    # referer topN + other
+    for hh, c in (item.get("clicksByHour") or {}).items():
+        try:
+            acc["byHour"][str((int(hh) - KST_OFFSET_HOURS) % 24)] += int(c)
+        except (TypeError, ValueError):
+            continue
+
+    for day, c in (item.get("clicksByDay") or {}).items():
+        acc["byDay"][str(day)] += int(c)
+
+    for ref, c in (item.get("clicksByReferer") or {}).items():
+        key = "other" if ref == "other" else extract_domain(ref)
+        acc["byReferer"][key] += int(c)
+
+    return acc
+
+
+def calculate_stats(clicks: list):
+    acc = new_stats_acc()
+    count_clicks(acc, clicks)
+    return finalize_stats(acc)
+
+
+def finalize_stats(acc: dict):
+    """
+    clicksByHour: {"0":1, "1":0, ..., "23":2} (문자열 키로 통일)
+    clicksByDay: {"YYYY-MM-DD": n, ...}
+    clicksByReferer: Top N + other
+    peakHour / topReferer: 선택 편의 필드
+    """
+    clicks_by_hour = {str(h): 0 for h in range(24)}
+    for h, c in acc["byHour"].items():
+        clicks_by_hour[h] += c
+    clicks_by_day = acc["byDay"]
+    total = acc["total"]
+
+    # referer topN + other ("other"는 insights에서 이미 묶여 온 나머지라 순위에서 제외)
+    referer_counter = Counter({k: v for k, v in acc["byReferer"].items() if k != "other"})
     top = referer_counter.most_common(TOP_REFERERS)
     clicks_by_referer = {}
     used = 0
     for k, v in top:
         clicks_by_referer[k] = v
         used += v
-    other = len(clicks) - used
+    other = total - used
     if other > 0:
         clicks_by_referer["other"] = other
 
-    peak_hour = max(clicks_by_hour, key=lambda k: clicks_by_hour[k]) if clicks else None
+    peak_hour = max(clicks_by_hour, key=lambda k: clicks_by_hour[k]) if total else None
     top_ref = top[0][0] if top else None
 
     return {
@@ -249,6 +434,52 @@ def extract_domain(url: str) -> str:
         return "unknown"
 
 
+def _day_epoch(day: str) -> int | None:
+    epoch = _DAY_EPOCH_CACHE.get(day, -1)
+    if epoch != -1:
+        return epoch
+    try:
+        epoch = int(datetime(int(day[:4]), int(day[5:7]), int(day[8:10]), tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        epoch = None
+    if len(_DAY_EPOCH_CACHE) >= TS_DAY_CACHE_MAX:
+        _DAY_EPOCH_CACHE.clear()
+    _DAY_EPOCH_CACHE[day] = epoch
+    return epoch
+
+
+def _minute_hour_day(prefix: str) -> tuple[str, str] | None:
+    if not (
+        prefix.isascii() and prefix[4] == "-" and prefix[7] == "-" and prefix[10] == "T"
+        and prefix[13] == ":" and prefix[16] == ":"
+        and (prefix[:4] + prefix[5:7] + prefix[8:10] + prefix[11:13] + prefix[14:16]).isdigit()
+    ):
+        return None
+    hh, mm = int(prefix[11:13]), int(prefix[14:16])
+    if _day_epoch(prefix[:10]) is None or hh > 23 or mm > 59:
+        return None
+    return str(hh), prefix[:10]
+
+
+def click_hour_day(ts) -> tuple[str, str] | None:
+    """
+    "YYYY-MM-DDTHH:MM:SSZ"(redirect click_timestamp 형식) -> (UTC 시 "0"~"23", "YYYY-MM-DD").
+    다른 모양이면 None (-> parse_iso). 분 단위 앞부분별로 결과 캐시, 클릭마다는 초 자리만 검사.
+    """
+    if type(ts) is not str or len(ts) != 20 or ts[19] != "Z":
+        return None
+    prefix = ts[:17]
+    hour_day = _MINUTE_CACHE.get(prefix, -1)
+    if hour_day == -1:
+        if len(_MINUTE_CACHE) >= TS_MINUTE_CACHE_MAX:
+            _MINUTE_CACHE.clear()
+        hour_day = _MINUTE_CACHE[prefix] = _minute_hour_day(prefix)
+    ss = ts[17:19]
+    if hour_day is None or not (ss.isascii() and ss.isdigit()) or int(ss) > 59:
+        return None
+    return hour_day
+
+
 def parse_iso(ts: str):
     try:
         if ts.endswith("Z"):
@@ -269,6 +500,70 @@ def create_response(status_code: int, body: dict):
     }
 
 
+def stats_cache_get(key):
+    """returns: (bodyJson, etag, 남은 TTL초) | None"""
+    if not STATS_CACHE_ENABLED:
+        return None
+    entry = _stats_cache.get(key)
+    if not entry:
+        return None
+    remaining = entry[0] - time.monotonic()
+    if remaining <= 0:
+        _stats_cache.pop(key, None)
+        return None
+    _stats_cache.move_to_end(key)
+    return entry[1], entry[2], int(remaining)
+
+
+def stats_cache_put(key, body: dict) -> tuple[str, str]:
+    """returns: (bodyJson, etag)"""
+    body_json = json.dumps(body, ensure_ascii=False)
+    etag = make_etag(body)
+    if not STATS_CACHE_ENABLED:
+        return body_json, etag
+    _stats_cache[key] = (time.monotonic() + STATS_CACHE_TTL_SEC, body_json, etag)
+    _stats_cache.move_to_end(key)
+    while len(_stats_cache) > STATS_CACHE_MAX_ENTRIES:
+        _stats_cache.popitem(last=False)
+    return body_json, etag
+
+
+def make_etag(body: dict) -> str:
+    """
+    window(startAt/endAt)는 요청 시각마다 바뀌므로 빼고 데이터만 해시 -> 클릭이 그대로면 같은 ETag.
+    바이트가 같다는 보장은 없어서 weak ETag
+    """
+    data = {k: v for k, v in body.items() if k not in ("startAt", "endAt")}
+    digest = hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return 'W/"' + digest[:32] + '"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match는 weak 비교 (W/ 떼고 비교)
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == opaque:
+            return True
+    return False
+
+
+def cacheable_response(body_json: str, etag: str, max_age: int, if_none_match=None):
+    headers = {
+        "Content-Type": "application/json",
+        "Access-Control-Allow-Origin": "*",
+        "Cache-Control": f"public, max-age={max(0, int(max_age))}",
+        "ETag": etag,
+    }
+    if etag_matches(if_none_match, etag):
+        return {"statusCode": 304, "headers": headers, "body": ""}
+    return {"statusCode": 200, "headers": headers, "body": body_json}
+
+
 def log_json(level, message, **kwargs):
     log_obj = {
         "level": level,